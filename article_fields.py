@@ -0,0 +1,164 @@
+from scraper.lxml_soup import LxmlDocument, LxmlSoup
+from scraper.stream_soup import StreamSoup
+
+
+class ArticleFields(object):
+    # The nodes of an article that the scrape functions read, found in one
+    # walk of the article instead of a find over the same subtree for
+    # each. A rule is (field, tag name, class, scope, direct): the field is
+    # the first tag in document order with that name and class (None for
+    # any class) inside the node found for scope, or anywhere when scope is
+    # None, and a direct child of it when direct is set. That is what the
+    # chained finds it replaces return, e.g. the rule for 'price_text' is
+    # property_stats.find('p', {'class': 'priceText'}, recursive=False).
+    #
+    # Works on bs4 tags and on LxmlSoup, whose nodes it returns wrapped.
+    # The walk stops once every field has been found. A StreamSoup article
+    # had its fields found while it was streamed, see StreamExtractor.
+
+    def __init__(self, wanted):
+        self.nodes = {}
+        self.wanted = wanted
+        self.visits = 0
+
+    def __getitem__(self, field):
+        return self.nodes.get(field)
+
+    def index_rules(rules):
+        by_name = {}
+        for field, name, cls, scope, direct in rules:
+            by_name.setdefault(name, []).append((field, cls, scope, direct))
+        return by_name
+
+    def for_rules(rules):
+        return ArticleFields(sum(len(x) for x in rules.values()))
+
+    def extract(article, rules):
+        if isinstance(article, StreamSoup):
+            return article.fields(rules)
+
+        fields = ArticleFields.for_rules(rules)
+        if isinstance(article, LxmlDocument):
+            fields.iter_lxml(article.element.iter(*rules), rules)
+        elif isinstance(article, LxmlSoup):
+            fields.iter_lxml(article.element.iterdescendants(*rules), rules)
+        else:
+            fields.walk_bs4(article.contents, rules, frozenset(), ())
+        return fields
+
+    def walk_bs4(self, children, rules, scopes, parent_fields):
+        for child in children:
+            if len(self.nodes) == self.wanted:
+                return
+            name = child.name
+            if name is None:
+                # A string, comment or doctype.
+                continue
+            self.visits += 1
+
+            found = ()
+            candidates = rules.get(name)
+            if candidates is not None:
+                found = self.match(
+                    child.get('class'), candidates, scopes, parent_fields)
+                for field in found:
+                    self.nodes[field] = child
+
+            if child.contents:
+                self.walk_bs4(
+                    child.contents, rules,
+                    scopes.union(found) if found else scopes, found)
+
+    def match(self, classes, candidates, scopes, parent_fields):
+        # The fields not yet found that a tag with these classes, inside
+        # the scopes, is the node of.
+        if classes is not None and not isinstance(classes, str):
+            classes = ' '.join(classes)
+        found = ()
+        for field, cls, scope, direct in candidates:
+            if field in self.nodes:
+                continue
+            if scope is not None and scope not in (
+                    parent_fields if direct else scopes):
+                continue
+            if cls is not None and not ArticleFields.class_match(
+                    classes, cls):
+                continue
+            found += (field,)
+        return found
+
+    def iter_lxml(self, elements, rules):
+        # libxml2 steps over the tags no rule names, so the scope of a
+        # match is checked through its parents instead of being carried
+        # down the walk.
+        found = {}
+        for element in elements:
+            if len(self.nodes) == self.wanted:
+                return
+            self.visits += 1
+
+            classes = element.get('class')
+            for field, cls, scope, direct in rules[element.tag]:
+                if field in self.nodes:
+                    continue
+                if cls is not None and not ArticleFields.class_match(
+                        classes, cls):
+                    continue
+                if scope is not None and not ArticleFields.lxml_within(
+                        element, found.get(scope), direct):
+                    continue
+                found[field] = element
+                self.nodes[field] = LxmlSoup(element)
+
+    def lxml_within(element, scope_element, direct):
+        if scope_element is None:
+            return False
+        parent = element.getparent()
+        if direct:
+            return parent is scope_element
+        while parent is not None:
+            if parent is scope_element:
+                return True
+            parent = parent.getparent()
+        return False
+
+    def class_match(classes, cls):
+        # As bs4 and LxmlSoup.attrs_match match a class attribute.
+        return classes is not None and cls in classes and (
+            classes == cls or cls in classes.split())
+
+
+ArticleFields.ADDRESS_RULES = (
+    ('photoviewer', 'div', 'photoviewer', None, False),
+    ('photoviewer_link', 'a', None, 'photoviewer', False),
+    ('photoviewer_img', 'img', None, 'photoviewer_link', True),
+    ('property_image', 'div', 'propertyImage', None, False),
+    ('property_image_img', 'img', None, 'property_image', True),
+)
+
+ArticleFields.LISTING = ArticleFields.index_rules((
+    ('listing_info', 'div', 'listingInfo rui-clearfix', None, False),
+    ('property_stats', 'div', 'propertyStats', 'listing_info', False),
+    ('price_text', 'p', 'priceText', 'property_stats', True),
+    ('contact_agent', 'p', 'contactAgent', 'property_stats', True),
+    ('type_text', 'p', 'type', 'property_stats', True),
+    ('any_type_text', 'p', 'type', 'property_stats', False),
+    ('vcard', 'div', 'vcard', 'listing_info', False),
+    ('vcard_name', 'a', 'name', 'vcard', False),
+    ('features', 'dl', 'rui-property-features rui-clearfix', 'listing_info',
+     False),
+) + ArticleFields.ADDRESS_RULES)
+
+ArticleFields.PROJECT = ArticleFields.index_rules((
+    ('child_listings', 'div', 'project-child-listings', None, False),
+))
+
+ArticleFields.PROJECT_CHILD = ArticleFields.index_rules((
+    ('child', 'div', 'child', None, False),
+    ('price_container', 'div', 'priceAndPropertyTypeContainer', 'child',
+     False),
+    ('price', 'span', 'price rui-truncate', 'price_container', False),
+    ('features_container', 'div', 'features', 'child', False),
+    ('features', 'dl', 'rui-property-features rui-clearfix',
+     'features_container', False),
+) + ArticleFields.ADDRESS_RULES)
@@ -0,0 +1,65 @@
+import collections
+import hashlib
+
+
+class DuplicateListing(object):
+    # Stands in for the properties of an article that was already scraped
+    # in this run, properties are the ones from the first occurrence.
+    def __init__(self, listing_key, properties):
+        self.listing_key = listing_key
+        self.properties = properties
+
+    def summarise(self):
+        return 'Duplicate of listing %s, %i properties' % (
+            '/'.join(self.listing_key), len(self.properties))
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.listing_key == other.listing_key)
+
+
+class ArticleMemo(object):
+    # A bounded, least recently used, memo of scraped articles. Articles are
+    # keyed by their listing id, or by a hash of their markup when they
+    # have no id, and a repeat is returned as a DuplicateListing instead of
+    # being scraped again.
+    MAX_ENTRIES = 100000
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def listing_key(article):
+        listing_id = article.get('id')
+        if listing_id:
+            return (article['data-content-type'], listing_id)
+        else:
+            digest = hashlib.sha1(str(article).encode('utf-8')).hexdigest()
+            return ('markup', digest)
+
+    def scrape_article(self, article, scrape):
+        key = ArticleMemo.listing_key(article)
+        properties = self.entries.get(key)
+        if properties is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return [DuplicateListing(key, properties)]
+
+        properties = scrape(article)
+        self.misses += 1
+        self.entries[key] = properties
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return properties
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+        }
@@ -0,0 +1,234 @@
+import time
+import bs4
+from scraper.article_fields import ArticleFields
+from scraper.page_scraper import PageScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.type_registry import TypeRegistry
+from scraper.benchmark.synthetic import SyntheticPages
+import real_estate.real_estate_property as rep
+
+
+class LegacyArticleScrape(object):
+    # The scrape functions as they were before ArticleFields, a find over
+    # the article for each node, kept here as the baseline.
+
+    def scrape_residential_property(article):
+        listing_info = PageScraper.get_listing_info(article)
+
+        sale_type = PageScraper.residential_sale_type(listing_info, False)
+        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
+        property_type = PageScraper.extract_property_type(vcard_name_soup)
+        features = PageScraper.extract_property_features(listing_info)
+        details = PageScraper.create_property_details(
+            property_type, features)
+        address_text = PageScraper.get_address_text(article)
+        return rep.Property(sale_type, details, address_text)
+
+    def scrape_residential_land(article):
+        listing_info = PageScraper.get_listing_info(article)
+
+        sale_type = PageScraper.residential_sale_type(listing_info, False)
+        features = PageScraper.maybe_extract_property_features(listing_info)
+        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
+        property_type = PageScraper.extract_property_type(vcard_name_soup)
+        details = PageScraper.create_property_details(property_type, features)
+        address_text = PageScraper.get_address_text(article)
+        return rep.Property(sale_type, details, address_text)
+
+    def scrape_new_apartment_project(article):
+        article.find(
+            'div', {'class': 'resultBodyWrapper projectWrapper rui-clearfix'}
+        )
+        children = article.find(
+            'div', {'class': 'project-child-listings'}
+        ).find_all(
+            'a', recursive=False
+        )
+
+        child_properties = []
+        for child in children:
+            sale_type = PageScraper.new_project_sale_type(child)
+            features_soup = child.find(
+                'div', {'class': 'child'}
+            ).find(
+                'div', {'class': 'features'}
+            )
+            property_type = PageScraper.extract_property_type(child)
+            features = PageScraper.extract_property_features(features_soup)
+            details = PageScraper.create_property_details(
+                property_type, features)
+            address_text = PageScraper.get_address_text(child)
+            child_properties.append(
+                rep.Property(sale_type, details, address_text))
+        return child_properties
+
+    def scrape_house_land_package(article):
+        listing_info = PageScraper.get_listing_info(article)
+
+        sale_type = PageScraper.residential_sale_type(listing_info, True)
+        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
+        property_type = PageScraper.extract_property_type(vcard_name_soup)
+        features = PageScraper.extract_property_features(listing_info)
+        details = PageScraper.create_property_details(
+            property_type, features)
+        address_text = PageScraper.get_address_text(article)
+        return rep.Property(sale_type, details, address_text)
+
+    def scrape_rural_property(article):
+        listing_info = PageScraper.get_listing_info(article)
+
+        sale_type = PageScraper.residential_sale_type(listing_info, False)
+        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
+        property_type_text = PageScraper.get_property_type_text(
+            vcard_name_soup)
+        rural_type = PageScraper.RURAL_PROPERTY_TYPES.lookup(
+            property_type_text)
+        if rural_type is not None:
+            property_type = rural_type()
+        else:
+            property_type = rep.PropertyTypeNotSupported(
+                property_type_text, str(vcard_name_soup))
+        features = PageScraper.maybe_extract_property_features(listing_info)
+        details = PageScraper.create_property_details(
+            property_type, features)
+        address_text = PageScraper.get_address_text(article)
+        return rep.Property(sale_type, details, address_text)
+
+    def scrape_rental_property(article):
+        listing_info = PageScraper.get_listing_info(article)
+        sale_type = RentalsScraper.rental_sale_type(listing_info)
+        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
+        property_type = PageScraper.extract_property_type(vcard_name_soup)
+        features = PageScraper.extract_property_features(listing_info)
+        details = PageScraper.create_property_details(
+            property_type, features)
+        address_text = PageScraper.get_address_text(article)
+        return rep.Property(sale_type, details, address_text)
+
+
+LegacyArticleScrape.CONTENT_TYPES = TypeRegistry({
+    'residential': (LegacyArticleScrape.scrape_residential_property, False),
+    'new apartment project': (
+        LegacyArticleScrape.scrape_new_apartment_project, True),
+    'residential land': (LegacyArticleScrape.scrape_residential_land, False),
+    'house land package': (
+        LegacyArticleScrape.scrape_house_land_package, False),
+    'rural': (LegacyArticleScrape.scrape_rural_property, False),
+    'rental': (LegacyArticleScrape.scrape_rental_property, False),
+})
+
+
+class ArticleFieldsBenchmark(object):
+    # Run with: python -m scraper.benchmark.article_fields
+    # Node visits are counted on html.parser trees, where every step of a
+    # find is made in Python, times are for both engines.
+    MIX = {
+        'residential_property': 6, 'residential_land': 1,
+        'house_land_package': 1, 'rural_property': 1,
+        'new_apartment_project': 1, 'rental_property': 2,
+    }
+    NUM_ARTICLES = 20
+    NUM_PAGES = 10
+    REPEATS = 3
+
+    def articles(parser, mix=MIX, num_articles=NUM_ARTICLES,
+                 num_pages=NUM_PAGES):
+        htmls = SyntheticPages().pages(mix, num_articles, num_pages)
+        return [
+            article
+            for html in htmls
+            for article in PageScraper.find_articles(
+                PageScraper.html_to_soup(html, parser))
+        ]
+
+    def scrape(articles, content_types):
+        return PageScraper.create_properties_with(articles, content_types)
+
+    def check_agreement(articles):
+        legacy = ArticleFieldsBenchmark.scrape(
+            articles, LegacyArticleScrape.CONTENT_TYPES)
+        fields = ArticleFieldsBenchmark.scrape(
+            articles, ArticleFieldsBenchmark.content_types())
+        if legacy != fields:
+            raise RuntimeError('Scrapes disagree.')
+
+    def content_types():
+        content_types = dict(PageScraper.CONTENT_TYPES.entries)
+        content_types.update(RentalsScraper.CONTENT_TYPES.entries)
+        return TypeRegistry(content_types)
+
+    def count_visits(articles, content_types):
+        # Counts the tags stepped over by finds, through bs4's descendants
+        # and children, and by ArticleFields walks.
+        visits = [0]
+        descendants = bs4.Tag.descendants
+        children = bs4.Tag.children
+        extract = ArticleFields.extract
+
+        def counted(elements):
+            for element in elements:
+                if isinstance(element, bs4.Tag):
+                    visits[0] += 1
+                yield element
+
+        def counting_extract(article, rules):
+            fields = extract(article, rules)
+            visits[0] += fields.visits
+            return fields
+
+        bs4.Tag.descendants = property(
+            lambda self: counted(descendants.fget(self)))
+        bs4.Tag.children = property(
+            lambda self: counted(children.fget(self)))
+        ArticleFields.extract = counting_extract
+        try:
+            ArticleFieldsBenchmark.scrape(articles, content_types)
+        finally:
+            bs4.Tag.descendants = descendants
+            bs4.Tag.children = children
+            ArticleFields.extract = extract
+        return visits[0]
+
+    def best_time(articles, content_types, repeats):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ArticleFieldsBenchmark.scrape(articles, content_types)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def run(parsers=('html.parser', 'lxml.html'), repeats=REPEATS):
+        content_types = ArticleFieldsBenchmark.content_types()
+        bs4_articles = ArticleFieldsBenchmark.articles('html.parser')
+        result = {
+            'articles': len(bs4_articles),
+            'legacy_visits': ArticleFieldsBenchmark.count_visits(
+                bs4_articles, LegacyArticleScrape.CONTENT_TYPES),
+            'fields_visits': ArticleFieldsBenchmark.count_visits(
+                bs4_articles, content_types),
+        }
+        for parser in parsers:
+            articles = ArticleFieldsBenchmark.articles(parser)
+            ArticleFieldsBenchmark.check_agreement(articles)
+            result[parser] = {
+                'legacy_seconds': ArticleFieldsBenchmark.best_time(
+                    articles, LegacyArticleScrape.CONTENT_TYPES, repeats),
+                'fields_seconds': ArticleFieldsBenchmark.best_time(
+                    articles, content_types, repeats),
+            }
+        return result
+
+    def report(result):
+        print('%i articles, node visits: legacy %i, fields %i (%.1fx)' % (
+            result['articles'], result['legacy_visits'],
+            result['fields_visits'],
+            result['legacy_visits'] / result['fields_visits']))
+        for parser in ('html.parser', 'lxml.html'):
+            if parser in result:
+                print('%-12s legacy %.1fms, fields %.1fms' % (
+                    parser, result[parser]['legacy_seconds'] * 1e3,
+                    result[parser]['fields_seconds'] * 1e3))
+
+
+if __name__ == '__main__':
+    ArticleFieldsBenchmark.report(ArticleFieldsBenchmark.run())
@@ -0,0 +1,52 @@
+import gc
+import sys
+import tracemalloc
+from scraper.sales_scraper import SalesScraper
+
+
+class MemoryBenchmark(object):
+    # Run with: python -m scraper.benchmark.memory [html file] [copies]
+    # Reports the bytes still allocated per listing once a scrape of
+    # `copies` copies of the page is held in a list, for rep.Property
+    # output and for compact records.
+    DEFAULT_PAGE = 'scraper/test/data/test_has_results.html'
+    COPIES = 50
+
+    def run(file_path=DEFAULT_PAGE, copies=COPIES):
+        with open(file_path, 'r') as f:
+            html = f.read()
+        return {
+            'rep_bytes_per_listing': MemoryBenchmark.bytes_per_listing(
+                html, copies, False),
+            'compact_bytes_per_listing': MemoryBenchmark.bytes_per_listing(
+                html, copies, True),
+        }
+
+    def bytes_per_listing(html, copies, compact):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            properties = SalesScraper.populate_state_and_postcode(
+                SalesScraper.scrape_pages(
+                    [html] * copies, quiet=True, compact=compact),
+                'act', 2600
+            )
+            gc.collect()
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return (after - before) / len(properties)
+
+    def report(result):
+        print('rep.Property: %.0f bytes per listing' %
+              result['rep_bytes_per_listing'])
+        print('compact:      %.0f bytes per listing' %
+              result['compact_bytes_per_listing'])
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    file_path = args[0] if args else MemoryBenchmark.DEFAULT_PAGE
+    copies = int(args[1]) if len(args) > 1 else MemoryBenchmark.COPIES
+    MemoryBenchmark.report(MemoryBenchmark.run(file_path, copies))
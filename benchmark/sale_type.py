@@ -0,0 +1,124 @@
+import re
+import timeit
+from scraper.page_scraper import PageScraper
+
+
+class LegacySaleType(object):
+    # The per-call regex path deduce_sale_type used before the patterns
+    # were compiled, kept here as the baseline. The inline flags are moved
+    # to the front of each pattern, newer Pythons reject them elsewhere.
+
+    def classify_sale_text(sale_text, min_price):
+        prices = LegacySaleType.extract_prices(sale_text, min_price)
+        if re.match('(?i)^auction', sale_text) is not None:
+            return 'auction', prices
+        elif re.match('(?i)^tender', sale_text) is not None:
+            return 'tender', prices
+        elif LegacySaleType.check_for_sale_by_negotiation(sale_text):
+            return 'negotiation', prices
+        elif re.match('(?i)^contact agent', sale_text) is not None:
+            return 'contact_agent', prices
+        else:
+            return None, prices
+
+    def check_for_sale_by_negotiation(sale_text):
+        return (
+            re.match('(?i)(price )?by negotiation', sale_text) is not None or
+            re.match('(?i)by negotiaton', sale_text) is not None or
+            re.match('(?i)by negotation', sale_text) is not None
+        )
+
+    def extract_prices(price_text, min_price):
+        dollar_price_regex = r'(\$\d+(,\d+)*)'
+        dollarless_price_regex = r'(\d+(,\d+)*)'
+
+        if re.search(dollar_price_regex, price_text) is not None:
+            return LegacySaleType.text_to_prices(
+                dollar_price_regex, price_text)
+        elif re.search(dollarless_price_regex, price_text) is not None:
+            prices = LegacySaleType.text_to_prices(
+                dollarless_price_regex, price_text)
+            prices = [x for x in prices if x >= min_price]
+            if len(prices) != 0:
+                return prices
+            else:
+                return None
+        else:
+            return None
+
+    def text_to_prices(regex, price_text):
+        price_strings = re.findall(regex, price_text)
+        return [
+            int(x.replace('$', '').replace(',', ''))
+            for x, _ in price_strings
+        ]
+
+
+class SaleTypeBenchmark(object):
+    # Run with: python -m scraper.benchmark.sale_type
+    SALE_TEXTS = [
+        'Auction 10am Sat 10 Sep 2016 (On Site)', 'Tenders close 1st Sep',
+        'By Negotiation', 'by Negotiaton', 'Price by negotiation',
+        'Contact Agent', '$415,000', 'Offers Over $429,000+',
+        'Price guide $340,000 - $380,000', '995,000', 'Under Contract',
+        'PENTHOUSE', '...22/9/2016 @12:30pm', '$300 per week', '400', '20',
+        'UnableToFindSaleTypeText', '',
+    ]
+    NUMBER = 2000
+
+    def check_agreement(min_prices=(PageScraper.MIN_PRICE, 50)):
+        for min_price in min_prices:
+            for text in SaleTypeBenchmark.SALE_TEXTS:
+                legacy = LegacySaleType.classify_sale_text(text, min_price)
+                compiled = PageScraper.classify_sale_text(text, min_price)
+                if legacy != compiled:
+                    raise RuntimeError(
+                        'Classifiers disagree on %r: %r v. %r' %
+                        (text, legacy, compiled))
+            categories, prices = PageScraper.classify_sale_texts(
+                SaleTypeBenchmark.SALE_TEXTS, min_price)
+            for text, category, text_prices in zip(
+                    SaleTypeBenchmark.SALE_TEXTS, categories, prices):
+                expected_category, expected_prices = (
+                    PageScraper.classify_sale_text(text, min_price))
+                if (category != PageScraper.SALE_TEXT_CATEGORY_CODES[
+                        expected_category] or text_prices != expected_prices):
+                    raise RuntimeError(
+                        'Batch classifier disagrees on %r' % text)
+
+    def time_classifier(classify, number=NUMBER):
+        def run():
+            for text in SaleTypeBenchmark.SALE_TEXTS:
+                classify(text, PageScraper.MIN_PRICE)
+        seconds = timeit.timeit(run, number=number)
+        return seconds / (number * len(SaleTypeBenchmark.SALE_TEXTS))
+
+    def time_batch(number=NUMBER):
+        # All the texts of number passes classified as one batch.
+        texts = SaleTypeBenchmark.SALE_TEXTS * number
+        seconds = timeit.timeit(
+            lambda: PageScraper.classify_sale_texts(
+                texts, PageScraper.MIN_PRICE),
+            number=1)
+        return seconds / len(texts)
+
+    def run(number=NUMBER):
+        SaleTypeBenchmark.check_agreement()
+        legacy = SaleTypeBenchmark.time_classifier(
+            LegacySaleType.classify_sale_text, number)
+        compiled = SaleTypeBenchmark.time_classifier(
+            PageScraper.classify_sale_text, number)
+        batch = SaleTypeBenchmark.time_batch(number)
+        return {'legacy_seconds': legacy, 'compiled_seconds': compiled,
+                'batch_seconds': batch}
+
+    def report(result):
+        print('legacy: %.2fus per text, compiled: %.2fus per text, '
+              'batch: %.2fus per text' % (
+                  result['legacy_seconds'] * 1e6,
+                  result['compiled_seconds'] * 1e6,
+                  result['batch_seconds'] * 1e6))
+
+
+if __name__ == '__main__':
+    SaleTypeBenchmark.report(SaleTypeBenchmark.run())
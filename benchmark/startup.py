@@ -0,0 +1,73 @@
+import subprocess
+import sys
+
+
+class StartupBenchmark(object):
+    # Run with: python -m scraper.benchmark.startup
+    # Imports each module in a new interpreter with python -X importtime,
+    # and reports its cumulative import time, the best of the repeats, and
+    # the modules that took the most of it. Only modules that are executed
+    # are listed by -X importtime, so those of DEFERRED that are loaded
+    # lazily are left out until first used.
+    MODULES = ('scraper.sales_scraper', 'scraper.rentals_scraper')
+    # Modules importing MODULES must not load.
+    DEFERRED = (
+        'bs4', 'lxml.html', 'multiprocessing',
+        'real_estate.real_estate_property', 'scraper.compact',
+    )
+    # Seconds, the budget for each of MODULES that test_startup enforces.
+    BUDGET = 0.09
+    REPEATS = 3
+    TOP = 8
+
+    def import_times(module):
+        # Module name to (self, cumulative) seconds, for each module
+        # executed by importing module.
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True)
+        times = {}
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            self_us, cumulative_us, name = line[12:].split('|')
+            if not self_us.strip().isdigit():
+                continue
+            times[name.strip()] = (
+                int(self_us) / 1e6, int(cumulative_us) / 1e6)
+        return times
+
+    def measure(module, repeats=REPEATS):
+        # The import times of the repeat that was fastest for module.
+        runs = [StartupBenchmark.import_times(module) for _ in range(repeats)]
+        return min(runs, key=lambda times: times[module][1])
+
+    def run(modules=MODULES, repeats=REPEATS, top=TOP):
+        rows = []
+        for module in modules:
+            times = StartupBenchmark.measure(module, repeats)
+            heaviest = sorted(
+                times.items(), key=lambda item: item[1][0], reverse=True)
+            rows.append({
+                'module': module,
+                'seconds': times[module][1],
+                'heaviest': [(name, x[0]) for name, x in heaviest[:top]],
+                'loaded_deferred': [
+                    x for x in StartupBenchmark.DEFERRED if x in times],
+            })
+        return rows
+
+    def report(rows):
+        for row in rows:
+            print('%-28s %6.1fms (budget %.0fms)' % (
+                row['module'], row['seconds'] * 1e3,
+                StartupBenchmark.BUDGET * 1e3))
+            for name, seconds in row['heaviest']:
+                print('    %-40s %6.1fms' % (name, seconds * 1e3))
+            if row['loaded_deferred']:
+                print('    loaded: %s' % ', '.join(row['loaded_deferred']))
+
+
+if __name__ == '__main__':
+    StartupBenchmark.report(StartupBenchmark.run())
@@ -0,0 +1,70 @@
+import time
+import tracemalloc
+from scraper.benchmark.suite import BenchmarkSuite
+
+
+class StreamBenchmark(object):
+    # Run with: python -m scraper.benchmark.stream
+    # Times scrape_pages over the suite's scenarios for the stream parsers
+    # and the tree parsers they stand in for, and the peak memory of
+    # scraping one page, after checking that every parser scrapes the
+    # same properties. tracemalloc only sees Python allocations, so the
+    # trees libxml2 builds for 'lxml.html' are left out of its peak.
+    PAIRS = (('html.parser', 'stream'), ('lxml.html', 'stream.lxml'))
+    REPEATS = 3
+
+    def available_pairs():
+        parsers = BenchmarkSuite.available_parsers()
+        return [x for x in StreamBenchmark.PAIRS if x[0] in parsers]
+
+    def check_agreement(scenario, htmls, parsers):
+        expected = scenario.scraper.scrape_pages(htmls, quiet=True)
+        for parser in parsers:
+            if scenario.scraper.scrape_pages(
+                    htmls, quiet=True, parser=parser) != expected:
+                raise RuntimeError('%s disagrees on %s.' % (
+                    parser, scenario.name))
+
+    def best_time(scenario, htmls, parser, repeats):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            scenario.scraper.scrape_pages(htmls, quiet=True, parser=parser)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def peak_bytes(scenario, html, parser):
+        tracemalloc.start()
+        try:
+            scenario.scraper.scrape_pages([html], quiet=True, parser=parser)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def run(scenarios=BenchmarkSuite.SCENARIOS, repeats=REPEATS):
+        pairs = StreamBenchmark.available_pairs()
+        parsers = [parser for pair in pairs for parser in pair]
+        rows = []
+        for scenario in scenarios:
+            htmls = scenario.pages()
+            StreamBenchmark.check_agreement(scenario, htmls, parsers)
+            for parser in parsers:
+                rows.append({
+                    'scenario': scenario.name,
+                    'parser': parser,
+                    'seconds': StreamBenchmark.best_time(
+                        scenario, htmls, parser, repeats),
+                    'peak_bytes': StreamBenchmark.peak_bytes(
+                        scenario, htmls[0], parser),
+                })
+        return rows
+
+    def report(rows):
+        for row in rows:
+            print('%-18s %-12s %8.1fms %8.0fKiB peak' % (
+                row['scenario'], row['parser'], row['seconds'] * 1e3,
+                row['peak_bytes'] / 1024))
+
+
+if __name__ == '__main__':
+    StreamBenchmark.report(StreamBenchmark.run())
@@ -0,0 +1,161 @@
+import argparse
+import json
+import platform
+import time
+import bs4
+from scraper.page_scraper import PageScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.benchmark.synthetic import SyntheticPages
+
+
+class Scenario(object):
+    def __init__(self, name, scraper, mix, num_articles, num_pages,
+                 project_children=5):
+        self.name = name
+        self.scraper = scraper
+        self.mix = mix
+        self.num_articles = num_articles
+        self.num_pages = num_pages
+        self.project_children = project_children
+
+    def pages(self):
+        return SyntheticPages(self.project_children).pages(
+            self.mix, self.num_articles, self.num_pages)
+
+
+class BenchmarkSuite(object):
+    # Run with: python -m scraper.benchmark.suite --output results.json
+    # and compare two runs with --compare old.json new.json
+    SCENARIOS = [
+        Scenario('sales_mixed', SalesScraper, {
+            'residential_property': 6, 'residential_land': 1,
+            'house_land_package': 1, 'rural_property': 1,
+            'new_apartment_project': 1,
+        }, 20, 10),
+        Scenario('sales_large_pages', SalesScraper,
+                 {'residential_property': 1}, 200, 2),
+        Scenario('projects', SalesScraper,
+                 {'new_apartment_project': 1}, 20, 5, project_children=20),
+        Scenario('rentals', RentalsScraper,
+                 {'rental_property': 1}, 20, 10),
+    ]
+    STAGES = ('html_to_soup', 'find_articles', 'create_properties',
+              'scrape_pages')
+
+    def available_parsers():
+        parsers = ['html.parser']
+        try:
+            import lxml
+            parsers.extend(['lxml', 'lxml.html'])
+        except ImportError:
+            pass
+        return parsers
+
+    def run(scenarios=SCENARIOS, parsers=None, repeats=3):
+        results = []
+        for scenario in scenarios:
+            htmls = scenario.pages()
+            for parser in parsers or BenchmarkSuite.available_parsers():
+                results.extend(BenchmarkSuite.run_scenario(
+                    scenario, htmls, parser, repeats))
+        return {
+            'meta': {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'bs4': bs4.__version__,
+                'repeats': repeats,
+            },
+            'results': results,
+        }
+
+    def run_scenario(scenario, htmls, parser, repeats):
+        scraper = scenario.scraper
+        soups = [PageScraper.html_to_soup(html, parser) for html in htmls]
+        articles = [PageScraper.find_articles(soup) for soup in soups]
+        num_articles = sum(len(x) for x in articles)
+
+        stages = {
+            'html_to_soup': lambda: [
+                PageScraper.html_to_soup(html, parser) for html in htmls],
+            'find_articles': lambda: [
+                PageScraper.find_articles(soup) for soup in soups],
+            'create_properties': lambda: [
+                scraper.create_properties(x) for x in articles],
+            'scrape_pages': lambda: scraper.scrape_pages(
+                htmls, quiet=True, parser=parser),
+        }
+
+        results = []
+        for stage in BenchmarkSuite.STAGES:
+            seconds = BenchmarkSuite.best_time(stages[stage], repeats)
+            results.append({
+                'scenario': scenario.name,
+                'parser': parser,
+                'stage': stage,
+                'seconds': seconds,
+                'pages': len(htmls),
+                'articles': num_articles,
+                'pages_per_second': len(htmls) / seconds,
+                'articles_per_second': num_articles / seconds,
+            })
+        return results
+
+    def best_time(f, repeats):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            f()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def write(run, file_path):
+        with open(file_path, 'w') as f:
+            json.dump(run, f, indent=2)
+
+    def read(file_path):
+        with open(file_path, 'r') as f:
+            return json.load(f)
+
+    def compare(old, new):
+        # Ratios above 1 mean new is slower.
+        old_seconds = dict(
+            ((r['scenario'], r['parser'], r['stage']), r['seconds'])
+            for r in old['results']
+        )
+        return [
+            (r['scenario'], r['parser'], r['stage'],
+             r['seconds'] / old_seconds[(r['scenario'], r['parser'],
+                                         r['stage'])])
+            for r in new['results']
+            if (r['scenario'], r['parser'], r['stage']) in old_seconds
+        ]
+
+    def report(run):
+        for r in run['results']:
+            print('%-18s %-12s %-18s %9.1f pages/s %10.1f articles/s' % (
+                r['scenario'], r['parser'], r['stage'],
+                r['pages_per_second'], r['articles_per_second']))
+
+    def report_comparison(comparison):
+        for scenario, parser, stage, ratio in comparison:
+            print('%-18s %-12s %-18s %6.2fx' % (
+                scenario, parser, stage, ratio))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--output', default='benchmark_results.json')
+    arg_parser.add_argument('--parsers', nargs='+')
+    arg_parser.add_argument('--repeats', type=int, default=3)
+    arg_parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = arg_parser.parse_args()
+
+    if args.compare:
+        BenchmarkSuite.report_comparison(BenchmarkSuite.compare(
+            BenchmarkSuite.read(args.compare[0]),
+            BenchmarkSuite.read(args.compare[1])))
+    else:
+        run = BenchmarkSuite.run(parsers=args.parsers, repeats=args.repeats)
+        BenchmarkSuite.write(run, args.output)
+        BenchmarkSuite.report(run)
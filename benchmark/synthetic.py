@@ -0,0 +1,78 @@
+import copy
+import json
+import random
+import re
+import bs4
+
+
+class SyntheticPages(object):
+    # Builds result pages of any size and mix of listing types from the
+    # fixtures in test/data. The page around the articles comes from
+    # test_has_results.html and the articles from test_html.json, each
+    # given a fresh listing id.
+    TEST_DATA_DIR = 'scraper/test/data'
+    PAGE_FILE = TEST_DATA_DIR + '/test_has_results.html'
+    ARTICLES_FILE = TEST_DATA_DIR + '/test_html.json'
+
+    ARTICLE_TYPES = (
+        'residential_property', 'new_apartment_project', 'residential_land',
+        'house_land_package', 'rural_property', 'rental_property',
+    )
+    RESULTS_INFO = re.compile(r'Showing \d+ - \d+ of [^<]*total results')
+    ARTICLE_ID = re.compile(r'\bid="t\d+"')
+
+    def __init__(self, project_children=5, seed=0,
+                 page_file=PAGE_FILE, articles_file=ARTICLES_FILE):
+        with open(page_file, 'r') as f:
+            page = f.read()
+        with open(articles_file, 'r') as f:
+            articles = json.load(f)
+
+        first = page.index('<article')
+        last = page.rindex('</article>') + len('</article>')
+        self.page_head = page[:first]
+        self.page_tail = page[last:]
+        self.articles = dict(
+            (name, articles[name]) for name in SyntheticPages.ARTICLE_TYPES)
+        self.articles['new_apartment_project'] = (
+            SyntheticPages.with_project_children(
+                self.articles['new_apartment_project'], project_children))
+        self.random = random.Random(seed)
+        self.next_id = 1
+
+    def with_project_children(article, n):
+        soup = bs4.BeautifulSoup(article, 'html.parser')
+        listings = soup.find('div', {'class': 'project-child-listings'})
+        children = listings.find_all('a', recursive=False)
+        listings.clear()
+        for i in range(n):
+            listings.append(copy.copy(children[i % len(children)]))
+        return str(soup)
+
+    def page(self, mix, num_articles, page_num=1):
+        # mix maps article types to weights, e.g. {'residential_property': 3,
+        # 'residential_land': 1}.
+        names = sorted(mix.keys())
+        weights = [mix[name] for name in names]
+        chosen = self.random.choices(names, weights, k=num_articles)
+
+        first = (page_num - 1) * num_articles + 1
+        head = SyntheticPages.RESULTS_INFO.sub(
+            'Showing %i - %i of %i total results' % (
+                first, first + num_articles - 1, first + num_articles - 1),
+            self.page_head, count=1
+        )
+        return head + ' '.join(
+            self.article(name) for name in chosen) + self.page_tail
+
+    def pages(self, mix, num_articles, num_pages):
+        return [
+            self.page(mix, num_articles, page_num)
+            for page_num in range(1, num_pages + 1)
+        ]
+
+    def article(self, name):
+        listing_id = self.next_id
+        self.next_id += 1
+        return SyntheticPages.ARTICLE_ID.sub(
+            'id="t%i"' % listing_id, self.articles[name], count=1)
@@ -0,0 +1,132 @@
+import itertools
+from scraper.lazy_import import LazyImport
+
+rep = LazyImport.module('real_estate.real_estate_property')
+
+
+class ColumnarExport(object):
+    # Flattens scraped properties into typed columns. Rows that are not a
+    # rep.Property, e.g. DataContentTypeNotSupported or PageScrapeFailed,
+    # keep their record_type and have nulls everywhere else. pyarrow is
+    # only needed for to_table and the writers.
+    BATCH_SIZE = 65536
+    COLUMNS = (
+        'record_type', 'sale_type', 'under_contract', 'prices',
+        'property_type', 'bedrooms', 'bathrooms', 'garage_spaces',
+        'address_text', 'state', 'postcode',
+    )
+    INTS = ('bedrooms', 'bathrooms', 'garage_spaces')
+
+    def to_columns(properties):
+        columns = dict((name, []) for name in ColumnarExport.COLUMNS)
+        for p in properties:
+            ColumnarExport.append_row(columns, p)
+        return columns
+
+    def append_row(columns, p):
+        details = getattr(p, 'details', None)
+        sale_type = getattr(p, 'sale_type', None)
+        state_and_postcode = getattr(p, 'state_and_postcode', None)
+
+        if isinstance(p, rep.Property):
+            columns['record_type'].append('Property')
+        else:
+            columns['record_type'].append(type(p).__name__)
+        columns['sale_type'].append(ColumnarExport.type_name(sale_type))
+        columns['under_contract'].append(
+            ColumnarExport.under_contract(sale_type))
+        columns['prices'].append(getattr(sale_type, 'prices', None))
+        columns['property_type'].append(ColumnarExport.type_name(
+            getattr(details, 'property_type', None)))
+        for name in ColumnarExport.INTS:
+            columns[name].append(getattr(details, name, None))
+        columns['address_text'].append(ColumnarExport.only_value(
+            getattr(p, 'address_text', None)))
+        columns['state'].append(getattr(state_and_postcode, 'state', None))
+        columns['postcode'].append(
+            ColumnarExport.postcode(state_and_postcode))
+
+    def type_name(x):
+        if x is None:
+            return None
+        else:
+            return type(x).__name__
+
+    def under_contract(sale_type):
+        # Sale types carry under_contract, rental types under_application.
+        under_contract = getattr(sale_type, 'under_contract', None)
+        if under_contract is None:
+            under_contract = getattr(sale_type, 'under_application', None)
+        return under_contract
+
+    def only_value(x):
+        # rep.AddressText wraps a single string.
+        if x is None:
+            return None
+        values = list(vars(x).values())
+        if len(values) == 1:
+            return values[0]
+        else:
+            return str(x)
+
+    def postcode(state_and_postcode):
+        postcode = getattr(state_and_postcode, 'postcode', None)
+        if postcode is None:
+            return None
+        else:
+            return str(postcode)
+
+    def schema():
+        import pyarrow as pa
+        categorical = pa.dictionary(pa.int32(), pa.string())
+        return pa.schema([
+            ('record_type', categorical),
+            ('sale_type', categorical),
+            ('under_contract', pa.bool_()),
+            ('prices', pa.list_(pa.int64())),
+            ('property_type', categorical),
+            ('bedrooms', pa.int32()),
+            ('bathrooms', pa.int32()),
+            ('garage_spaces', pa.int32()),
+            ('address_text', pa.string()),
+            ('state', categorical),
+            ('postcode', pa.string()),
+        ])
+
+    def to_table(properties):
+        import pyarrow as pa
+        return pa.Table.from_pydict(
+            ColumnarExport.to_columns(properties),
+            schema=ColumnarExport.schema()
+        )
+
+    def iter_batches(properties, batch_size=BATCH_SIZE):
+        properties = iter(properties)
+        while True:
+            batch = list(itertools.islice(properties, batch_size))
+            if not batch:
+                return
+            yield ColumnarExport.to_table(batch)
+
+    def write_parquet(properties, file_path, batch_size=BATCH_SIZE):
+        # Each batch of properties becomes one row group.
+        import pyarrow.parquet as pq
+        rows = 0
+        with pq.ParquetWriter(file_path, ColumnarExport.schema()) as writer:
+            for table in ColumnarExport.iter_batches(properties, batch_size):
+                writer.write_table(table, row_group_size=batch_size)
+                rows += table.num_rows
+        return rows
+
+    def write_arrow(properties, file_path, batch_size=BATCH_SIZE):
+        # The IPC stream format, as unlike the file format it allows the
+        # categorical dictionaries to change from batch to batch.
+        import pyarrow as pa
+        rows = 0
+        with pa.OSFile(file_path, 'wb') as sink:
+            with pa.ipc.new_stream(sink, ColumnarExport.schema()) as writer:
+                for table in ColumnarExport.iter_batches(
+                        properties, batch_size):
+                    writer.write_table(table)
+                    rows += table.num_rows
+        return rows
@@ -0,0 +1,158 @@
+import sys
+import real_estate.real_estate_property as rep
+
+
+class CompactProperty(rep.Property):
+    # A rep.Property that keeps its fields in slots and never fills an
+    # instance __dict__. details and address_text are rebuilt on access, so
+    # code written against rep.Property keeps working. Being a subclass,
+    # its __eq__ is used whichever side of == it is on. A StateAndPostcode
+    # set on it is shared with the records set an equal one, see
+    # CompactRecords.share.
+    __slots__ = (
+        'sale_type', 'property_type', 'bedrooms', 'bathrooms',
+        'garage_spaces', 'land_area', 'floor_area', 'street', 'locality',
+        'shared_state_and_postcode',
+    )
+
+    def __init__(self, sale_type, property_type, bedrooms, bathrooms,
+                 garage_spaces, land_area, floor_area, street, locality,
+                 state_and_postcode=None):
+        self.sale_type = sale_type
+        self.property_type = property_type
+        self.bedrooms = bedrooms
+        self.bathrooms = bathrooms
+        self.garage_spaces = garage_spaces
+        self.land_area = land_area
+        self.floor_area = floor_area
+        self.street = street
+        self.locality = locality
+        self.state_and_postcode = state_and_postcode
+
+    @property
+    def state_and_postcode(self):
+        return self.shared_state_and_postcode
+
+    @state_and_postcode.setter
+    def state_and_postcode(self, state_and_postcode):
+        self.shared_state_and_postcode = CompactRecords.share(
+            state_and_postcode)
+
+    @property
+    def details(self):
+        return rep.Details(
+            property_type=self.property_type,
+            bedrooms=self.bedrooms,
+            bathrooms=self.bathrooms,
+            garage_spaces=self.garage_spaces,
+            land_area=self.land_area,
+            floor_area=self.floor_area
+        )
+
+    @property
+    def address_text(self):
+        return rep.AddressText(self.address_string())
+
+    def address_string(self):
+        if self.locality is None:
+            return self.street
+        else:
+            return self.street + ', ' + self.locality
+
+    def fields(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_property(self):
+        p = rep.Property(self.sale_type, self.details, self.address_text)
+        p.state_and_postcode = self.state_and_postcode
+        return p
+
+    def summarise(self):
+        return self.to_property().summarise()
+
+    def __eq__(self, other):
+        if type(other) is CompactProperty:
+            return self.fields() == other.fields()
+        elif isinstance(other, rep.Property):
+            return self.to_property() == other
+        else:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        else:
+            return not equal
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (CompactProperty, self.fields())
+
+
+class CompactRecords(object):
+    # Converts scraper output to CompactProperty records. Sale and property
+    # types that only hold flags are shared between records, as is the
+    # locality part of addresses ('Gordon, ACT 2906'). StateAndPostcode
+    # objects are shared by all the records of the process, there are only
+    # as many as postcodes. Anything that is not a rep.Property, such as
+    # DataContentTypeNotSupported, is passed through.
+    SHARED = {}
+
+    def __init__(self):
+        self.interned = {}
+
+    def iter_compact(self, properties):
+        for p in properties:
+            yield self.compact(p)
+
+    def compact(self, p):
+        if type(p) is not rep.Property:
+            return p
+
+        details = p.details
+        street, locality = CompactRecords.split_address(
+            CompactRecords.address_string(p.address_text))
+        return CompactProperty(
+            self.intern(p.sale_type),
+            self.intern(details.property_type),
+            details.bedrooms,
+            details.bathrooms,
+            details.garage_spaces,
+            details.land_area,
+            details.floor_area,
+            street,
+            None if locality is None else sys.intern(locality),
+            getattr(p, 'state_and_postcode', None)
+        )
+
+    def intern(self, x):
+        return CompactRecords.intern_in(self.interned, x)
+
+    def share(x):
+        return CompactRecords.intern_in(CompactRecords.SHARED, x)
+
+    def intern_in(interned, x):
+        # Objects are shared when all their attributes are hashable, which
+        # leaves out e.g. sale types holding a list of prices.
+        try:
+            key = (type(x), tuple(sorted(vars(x).items())))
+            return interned.setdefault(key, x)
+        except TypeError:
+            return x
+
+    def address_string(address_text):
+        values = list(vars(address_text).values())
+        if len(values) == 1 and isinstance(values[0], str):
+            return values[0]
+        else:
+            raise ValueError(
+                'Address text not understood: %s' % address_text.summarise())
+
+    def split_address(address):
+        street, comma, locality = address.partition(', ')
+        if comma:
+            return street, locality
+        else:
+            return address, None
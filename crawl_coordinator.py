@@ -0,0 +1,375 @@
+import argparse
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+from scraper.fetch_pipeline import FetchPipeline, Search
+from scraper.page_pool import PageScrapeFailed
+from scraper.rentals_scraper import RentalsScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.sqlite_file import SqliteFile
+
+
+class Shard(object):
+    def __init__(self, shard_id, state, postcode, scraper, attempts=0,
+                 lease=None):
+        self.shard_id = shard_id
+        self.state = state
+        self.postcode = postcode
+        self.scraper = scraper
+        self.attempts = attempts
+        self.lease = lease
+
+    def summarise(self):
+        return 'Shard %i, %s for %s %s' % (
+            self.shard_id, self.scraper, self.state, self.postcode)
+
+
+class LeaseTable(object):
+    # The shards of a crawl plan, one per (state, postcode, scraper), in
+    # SQLite, so that workers on any number of processes or machines
+    # sharing the file can split the crawl. A shard is leased to one worker
+    # at a time for lease_seconds, which the worker's heartbeat renews. A
+    # lease that expired, its worker presumably dead, is given to the next
+    # worker asking, up to max_attempts leases, after which the shard is
+    # failed.
+    #
+    # A shard's output is written in the transaction that ends its lease,
+    # and only while the lease is still held, so each shard has exactly one
+    # output however often it was reassigned.
+    SCRAPERS = ('sales', 'rentals')
+    STATUSES = ('pending', 'leased', 'done', 'failed')
+    LEASE_SECONDS = 60
+    MAX_ATTEMPTS = 3
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS shards ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, state TEXT, '
+        'postcode INTEGER, scraper TEXT, '
+        "status TEXT DEFAULT 'pending', attempts INTEGER "
+        'DEFAULT 0, lease TEXT, expires REAL, error TEXT, '
+        'UNIQUE (state, postcode, scraper))',
+        'CREATE TABLE IF NOT EXISTS outputs ('
+        'shard_id INTEGER PRIMARY KEY, properties BLOB)',
+    )
+
+    def __init__(self, file_path, lease_seconds=LEASE_SECONDS,
+                 max_attempts=MAX_ATTEMPTS):
+        self.file_path = file_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = SqliteFile.connect(
+                self.file_path, LeaseTable.SCHEMA, wal=True)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def copy(self):
+        # The same table on a connection of its own, for another thread.
+        return LeaseTable(
+            self.file_path, self.lease_seconds, self.max_attempts)
+
+    def plan(states_and_postcodes, scrapers=SCRAPERS):
+        # The (state, postcode, scraper) shards of a crawl plan.
+        for scraper in scrapers:
+            if scraper not in LeaseTable.SCRAPERS:
+                raise ValueError(
+                    'Scraper not supported: %s, use one of: %s' % (
+                        scraper, ', '.join(LeaseTable.SCRAPERS)))
+        return [
+            (state, postcode, scraper)
+            for state, postcode in states_and_postcodes
+            for scraper in scrapers
+        ]
+
+    def add_shards(self, shards):
+        # Shards already in the table are left as they are, so a plan can
+        # be added again to resume it. Returns the number added.
+        connection = self.connect()
+        with connection:
+            before = connection.total_changes
+            connection.executemany(
+                'INSERT OR IGNORE INTO shards (state, postcode, scraper) '
+                'VALUES (?, ?, ?)', shards)
+            return connection.total_changes - before
+
+    def lease(self, worker_id):
+        # The next pending or expired shard, leased to worker_id, or None.
+        # The lease is unique, even between tables and runs that share
+        # worker ids.
+        connection = self.connect()
+        lease = '%s/%s' % (worker_id, uuid.uuid4().hex)
+        now = time.time()
+        with connection:
+            connection.execute(
+                "UPDATE shards SET status = 'failed', lease = NULL, "
+                "expires = NULL, error = 'Lease expired on attempt %i.' "
+                "WHERE status = 'leased' AND expires < ? "
+                'AND attempts >= ?' % self.max_attempts,
+                (now, self.max_attempts)
+            )
+            connection.execute(
+                "UPDATE shards SET status = 'leased', lease = ?, "
+                'expires = ?, attempts = attempts + 1 WHERE id = ('
+                "SELECT id FROM shards WHERE status = 'pending' OR "
+                "(status = 'leased' AND expires < ?) ORDER BY id LIMIT 1)",
+                (lease, now + self.lease_seconds, now)
+            )
+            row = connection.execute(
+                'SELECT id, state, postcode, scraper, attempts '
+                'FROM shards WHERE lease = ?', (lease,)
+            ).fetchone()
+        return None if row is None else Shard(*row, lease=lease)
+
+    def heartbeat(self, shard):
+        # Renews the lease, False when it was lost to another worker.
+        connection = self.connect()
+        with connection:
+            cursor = connection.execute(
+                "UPDATE shards SET expires = ? WHERE id = ? AND lease = ? "
+                "AND status = 'leased'",
+                (time.time() + self.lease_seconds, shard.shard_id,
+                 shard.lease)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, shard, properties):
+        # False, and the properties dropped, when the lease was lost.
+        blob = pickle.dumps(properties, pickle.HIGHEST_PROTOCOL)
+        connection = self.connect()
+        with connection:
+            cursor = connection.execute(
+                "UPDATE shards SET status = 'done', lease = NULL, "
+                "expires = NULL, error = NULL WHERE id = ? AND lease = ? "
+                "AND status = 'leased'", (shard.shard_id, shard.lease)
+            )
+            if cursor.rowcount != 1:
+                return False
+            connection.execute(
+                'INSERT OR REPLACE INTO outputs VALUES (?, ?)',
+                (shard.shard_id, blob)
+            )
+        return True
+
+    def fail(self, shard, error):
+        # Gives the shard back for another attempt, or fails it for good
+        # after max_attempts.
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? "
+                "THEN 'failed' ELSE 'pending' END, lease = NULL, "
+                "expires = NULL, error = ? WHERE id = ? AND lease = ? "
+                "AND status = 'leased'",
+                (self.max_attempts, error, shard.shard_id, shard.lease)
+            )
+
+    def counts(self):
+        counts = dict((status, 0) for status in LeaseTable.STATUSES)
+        counts.update(self.connect().execute(
+            'SELECT status, COUNT(*) FROM shards GROUP BY status'))
+        return counts
+
+    def failures(self):
+        # (shard, error) for the failed shards.
+        rows = self.connect().execute(
+            'SELECT id, state, postcode, scraper, attempts, error '
+            "FROM shards WHERE status = 'failed' ORDER BY id"
+        ).fetchall()
+        return [(Shard(*row[:5]), row[5]) for row in rows]
+
+    def merge(self, scraper=None):
+        # The properties of the done shards, in the order of the plan.
+        query = (
+            'SELECT outputs.properties FROM outputs JOIN shards '
+            'ON shards.id = outputs.shard_id'
+        )
+        args = ()
+        if scraper is not None:
+            query += ' WHERE shards.scraper = ?'
+            args = (scraper,)
+        rows = self.connect().execute(query + ' ORDER BY shards.id', args)
+        return [p for row in rows for p in pickle.loads(row[0])]
+
+
+class Heartbeat(object):
+    # Renews a shard's lease every interval seconds on a thread of its
+    # own, until stopped or the lease is lost.
+    def __init__(self, table, shard, interval):
+        self.table = table.copy()
+        self.shard = shard
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lost = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                if not self.table.heartbeat(self.shard):
+                    self.lost = True
+                    break
+        finally:
+            self.table.close()
+
+
+class ShardFetch(object):
+    # Crawls a shard with a FetchPipeline. url_templates are per scraper,
+    # formatted with the shard's state and postcode and the page_num, e.g.
+    # 'https://www.realestate.com.au/buy/in-{state}+{postcode}/list-{page_num}'
+    # The other arguments are passed on to FetchPipeline. A shard with a
+    # failed page raises, so that it is crawled again.
+    SCRAPERS = {'sales': SalesScraper, 'rentals': RentalsScraper}
+
+    def __init__(self, url_templates, **pipeline_args):
+        self.url_templates = url_templates
+        self.pipeline_args = pipeline_args
+
+    def search(self, shard):
+        url_template = self.url_templates[shard.scraper].format(
+            state=shard.state, postcode=shard.postcode,
+            page_num='{page_num}')
+        return Search(url_template, shard.state, shard.postcode)
+
+    def crawl(self, shard):
+        pipeline = FetchPipeline(
+            ShardFetch.SCRAPERS[shard.scraper], quiet=True,
+            **self.pipeline_args)
+        properties = pipeline.scrape([self.search(shard)])
+        for p in properties:
+            if type(p) is PageScrapeFailed:
+                raise RuntimeError(p.summarise())
+        return properties
+
+
+class CrawlWorker(object):
+    # Leases shards and crawls them with crawl(shard), which returns the
+    # shard's properties, until no shard is pending or leased. While
+    # others hold leases it polls, since their workers may die and their
+    # leases expire. A shard whose crawl raises is given back with fail.
+    HEARTBEAT_INTERVAL = 10
+    POLL_INTERVAL = 1
+
+    def __init__(self, table, crawl, worker_id=None,
+                 heartbeat_interval=HEARTBEAT_INTERVAL,
+                 poll_interval=POLL_INTERVAL):
+        self.table = table
+        self.crawl = crawl
+        self.worker_id = worker_id or '%s:%i' % (
+            socket.gethostname(), os.getpid())
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.stopping = False
+
+    def stop(self, *signal_args):
+        self.stopping = True
+
+    def run(self):
+        # Returns the number of shards this worker completed.
+        completed = 0
+        while not self.stopping:
+            shard = self.table.lease(self.worker_id)
+            if shard is not None:
+                completed += self.crawl_shard(shard)
+                continue
+            counts = self.table.counts()
+            if counts['pending'] == 0 and counts['leased'] == 0:
+                break
+            time.sleep(self.poll_interval)
+        return completed
+
+    def crawl_shard(self, shard):
+        # Completed inside the try, so that properties which can't be
+        # pickled fail the shard with their error, not an expired lease.
+        heartbeat = Heartbeat(self.table, shard, self.heartbeat_interval)
+        heartbeat.start()
+        try:
+            properties = self.crawl(shard)
+            heartbeat.stop()
+            return self.table.complete(shard, properties)
+        except Exception as e:
+            heartbeat.stop()
+            self.table.fail(shard, '%s: %s' % (type(e).__name__, e))
+            return False
+
+
+class CrawlCoordinator(object):
+    # Runs a crawl plan on local worker processes sharing one lease table,
+    # the way workers on several machines would share it on a network
+    # file system, then merges the shards' outputs.
+    def run_local(table, shards, crawl, workers, **worker_args):
+        # Imported here, it is slow to import and only run_local needs it.
+        import multiprocessing
+        table.add_shards(shards)
+        table.close()
+        processes = [
+            multiprocessing.Process(
+                target=CrawlCoordinator.run_worker,
+                args=(table.copy(), crawl, '%s:%i/local-%i' % (
+                    socket.gethostname(), os.getpid(), i)),
+                kwargs=worker_args)
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return table.merge()
+
+    def run_worker(table, crawl, worker_id, **worker_args):
+        try:
+            CrawlWorker(table, crawl, worker_id, **worker_args).run()
+        finally:
+            table.close()
+
+    def read_plan(file_path):
+        # A plan file has a state and a postcode on each line.
+        with open(file_path) as f:
+            return [
+                (state.lower(), int(postcode))
+                for state, postcode in (line.split() for line in f
+                                        if line.strip())
+            ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Crawl the shards of a plan on local worker processes.')
+    parser.add_argument('table', help='The lease table SQLite file.')
+    parser.add_argument('--plan', help='A file of state and postcode lines.')
+    parser.add_argument('--scrapers', default=','.join(LeaseTable.SCRAPERS))
+    parser.add_argument('--sales-url', help='The sales url template.')
+    parser.add_argument('--rentals-url', help='The rentals url template.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', help='Pickle the merged properties.')
+    args = parser.parse_args()
+
+    table = LeaseTable(args.table)
+    shards = []
+    if args.plan:
+        shards = LeaseTable.plan(
+            CrawlCoordinator.read_plan(args.plan), args.scrapers.split(','))
+    fetch = ShardFetch({'sales': args.sales_url, 'rentals': args.rentals_url})
+    properties = CrawlCoordinator.run_local(
+        table, shards, fetch.crawl, args.workers)
+    print(table.counts())
+    for shard, error in table.failures():
+        print('%s: %s' % (shard.summarise(), error))
+    if args.output:
+        with open(args.output, 'wb') as f:
+            pickle.dump(properties, f, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,103 @@
+import collections
+import contextlib
+import logging
+import time
+
+
+class EventSink(object):
+    # Collects the notes made while scraping, such as possible missed
+    # prices, and logs each kind once per batch as a count and a few
+    # samples instead of one line per listing. Events are dropped when the
+    # batch is quiet or the logger is not enabled for their level, so
+    # nothing is formatted for them.
+    #
+    # Each process has its own sink, so pool workers log their events at
+    # the end of every chunk rather than with the batch. As chunks, and
+    # the batches of a long running worker, can be small, summaries are
+    # also rate limited to max_lines per interval seconds. The events of
+    # the summaries held back are counted, and the count is logged with
+    # the next summary let through.
+    SUMMARIES = {
+        'missed_price': '%i possible missed prices in this batch, e.g. %s',
+        'no_results': "%i 'no results' pages in this batch, "
+                      "final page numbers %s",
+        'fetch_retry': '%i fetches retried in this batch, e.g. %s',
+    }
+    SUPPRESSED = '%i events were left out of the log by its rate limit'
+    MAX_LINES = 20
+    INTERVAL = 60.0
+
+    def __init__(self, logger=None, max_samples=3, max_lines=MAX_LINES,
+                 interval=INTERVAL):
+        self.logger = logger or logging.getLogger('scraper')
+        self.max_samples = max_samples
+        self.max_lines = max_lines
+        self.interval = interval
+        self.quiet = False
+        self.counts = collections.OrderedDict()
+        self.samples = collections.defaultdict(list)
+        self.interval_start = None
+        self.lines = 0
+        self.suppressed = 0
+
+    def enabled(self, level):
+        return not self.quiet and self.logger.isEnabledFor(level)
+
+    def log(self, level, message, *args):
+        if self.enabled(level):
+            self.logger.log(level, message, *args)
+
+    def event(self, name, level, sample):
+        if not self.enabled(level):
+            return
+        _, count = self.counts.get(name, (level, 0))
+        self.counts[name] = (level, count + 1)
+        if len(self.samples[name]) < self.max_samples:
+            self.samples[name].append(sample)
+
+    def summary(self):
+        return dict(
+            (name, (count, list(self.samples[name])))
+            for name, (_, count) in self.counts.items()
+        )
+
+    def allow_line(self):
+        now = time.monotonic()
+        if (self.interval_start is None or
+                now - self.interval_start >= self.interval):
+            self.interval_start = now
+            self.lines = 0
+        if self.lines >= self.max_lines:
+            return False
+        self.lines += 1
+        return True
+
+    def flush(self):
+        for name, (level, count) in self.counts.items():
+            if not self.allow_line():
+                self.suppressed += count
+                continue
+            if self.suppressed:
+                self.logger.warning(
+                    EventSink.SUPPRESSED, self.suppressed,
+                    extra={'event': 'suppressed', 'count': self.suppressed})
+                self.suppressed = 0
+            samples = self.samples[name]
+            self.logger.log(
+                level,
+                EventSink.SUMMARIES.get(name, name + ': %i, e.g. %s'),
+                count, ', '.join(repr(x) for x in samples),
+                extra={'event': name, 'count': count, 'samples': samples}
+            )
+        self.counts.clear()
+        self.samples.clear()
+
+    @contextlib.contextmanager
+    def batch(self, quiet=False):
+        was_quiet = self.quiet
+        self.quiet = was_quiet or quiet
+        try:
+            yield self
+        finally:
+            self.flush()
+            self.quiet = was_quiet
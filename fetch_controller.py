@@ -0,0 +1,248 @@
+import asyncio
+import collections
+import logging
+import random
+import socket
+import time
+import urllib.error
+import urllib.parse
+from scraper.instrumentation import Instrumentation
+from scraper.page_scraper import PageScraper
+
+
+class TokenBuckets(object):
+    # A token bucket per host, refilled at requests_per_second up to burst
+    # tokens, and a fetch takes a token. A host can also be paused, e.g.
+    # after a 429, which holds its fetches until then. All callers run on
+    # the one event loop, so no lock is needed. Times are the loop's time,
+    # unless now is given.
+    def __init__(self, requests_per_second=None, burst=1):
+        self.rate = requests_per_second
+        self.burst = burst
+        self.buckets = {}
+        self.paused_until = {}
+
+    async def wait(self, host):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self.take(host, loop.time())
+            if delay == 0:
+                return
+            await asyncio.sleep(delay)
+
+    def take(self, host, now):
+        # Takes a token and returns 0, or returns the seconds to wait
+        # before trying again.
+        pause = self.paused_until.get(host, now) - now
+        if pause > 0:
+            return pause
+        if not self.rate:
+            return 0
+        tokens, last = self.buckets.get(host, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens >= 1:
+            self.buckets[host] = (tokens - 1, now)
+            return 0
+        self.buckets[host] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def pause(self, host, seconds, now=None):
+        if now is None:
+            now = asyncio.get_running_loop().time()
+        until = now + seconds
+        self.paused_until[host] = max(
+            until, self.paused_until.get(host, until))
+
+    def backoff_seconds(self, host, now=None):
+        if now is None:
+            now = asyncio.get_running_loop().time()
+        return max(0.0, self.paused_until.get(host, now) - now)
+
+
+class AdaptiveConcurrency(object):
+    # AIMD on the number of fetches in flight. The limit grows by one for
+    # every limit fetches that succeed within target_latency, and is cut
+    # by decrease_factor on an overloaded fetch: a 429, a 5xx, a
+    # connection error or one slower than target_latency. Only fetches
+    # started after the last cut can cut it again, so one burst of
+    # failures cuts it once. Other errors, such as a 404, leave the limit
+    # as it is.
+    TARGET_LATENCY = 5.0
+    DECREASE_FACTOR = 0.5
+
+    def __init__(self, max_limit, min_limit=1, initial=None,
+                 target_latency=TARGET_LATENCY,
+                 decrease_factor=DECREASE_FACTOR):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, min(
+            max_limit, initial or (max_limit + 1) // 2)))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.last_decrease = float('-inf')
+        self.changed = None
+
+    def start(self):
+        # A Condition is bound to the event loop that first waits on it, so
+        # each asyncio.run needs its own.
+        self.in_flight = 0
+        self.changed = asyncio.Condition()
+
+    async def acquire(self):
+        # Returns the start time to pass to release.
+        if self.changed is None:
+            self.start()
+        async with self.changed:
+            await self.changed.wait_for(
+                lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return asyncio.get_running_loop().time()
+
+    async def release(self, started, overloaded):
+        # overloaded is None for a fetch that says nothing of the load.
+        if overloaded is not None:
+            self.update(
+                started, overloaded, asyncio.get_running_loop().time())
+        async with self.changed:
+            self.in_flight -= 1
+            self.changed.notify_all()
+
+    def update(self, started, overloaded, now):
+        if overloaded or now - started > self.target_latency:
+            if started >= self.last_decrease:
+                self.limit = max(
+                    self.min_limit, self.limit * self.decrease_factor)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class RetryBackoff(object):
+    # Exponential backoff with full jitter: retry n, from 0, waits a
+    # uniformly random time up to min(max_delay, base_delay * 2 ** n), or
+    # the server's Retry-After when that is longer.
+    RETRIES = 3
+    BASE_DELAY = 0.5
+    MAX_DELAY = 30.0
+
+    def __init__(self, retries=RETRIES, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, random=random.random):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random
+
+    def delay(self, retry, retry_after=None):
+        delay = self.random() * min(
+            self.max_delay, self.base_delay * 2 ** retry)
+        if retry_after is not None:
+            delay = max(delay, min(self.max_delay, retry_after))
+        return delay
+
+
+class FetchController(object):
+    # Decides when FetchPipeline fetches: each fetch waits for its host's
+    # TokenBuckets and an AdaptiveConcurrency slot, and a throttled, 5xx
+    # or failed fetch is retried after a RetryBackoff delay, with the
+    # whole host paused for a 429.
+    #
+    # Each response is recorded as a 'fetch:<status>' stage and the state
+    # as gauges in the Instrumentation stats while collecting: the
+    # concurrency limit, the fetches in flight, the pages per second over
+    # the last THROUGHPUT_WINDOW seconds, and each host's remaining pause.
+    # Retries are also 'fetch_retry' events.
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+    THROUGHPUT_WINDOW = 10.0
+
+    def __init__(self, max_connections=8, requests_per_second=None,
+                 burst=1, min_connections=1, initial_connections=None,
+                 target_latency=AdaptiveConcurrency.TARGET_LATENCY,
+                 retries=RetryBackoff.RETRIES,
+                 base_delay=RetryBackoff.BASE_DELAY,
+                 max_delay=RetryBackoff.MAX_DELAY):
+        self.buckets = TokenBuckets(requests_per_second, burst)
+        self.concurrency = AdaptiveConcurrency(
+            max_connections, min_connections, initial_connections,
+            target_latency)
+        self.backoff = RetryBackoff(retries, base_delay, max_delay)
+        self.completed = collections.deque()
+
+    def start(self):
+        # Called at the start of each event loop run.
+        self.concurrency.start()
+
+    async def fetch(self, fetch_html, url, executor=None):
+        # Runs fetch_html(url) in executor until it succeeds, or raises
+        # its last error once out of retries or when it can't be retried.
+        host = urllib.parse.urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        for retry in range(self.backoff.retries + 1):
+            await self.buckets.wait(host)
+            started = await self.concurrency.acquire()
+            status = 'error'
+            retry_after = None
+            try:
+                html = await loop.run_in_executor(executor, fetch_html, url)
+                status = 200
+            except urllib.error.HTTPError as e:
+                status = e.code
+                retry_after = FetchController.retry_after(e)
+                error = e
+            except (urllib.error.URLError, socket.timeout,
+                    ConnectionError) as e:
+                error = e
+            finally:
+                seconds = loop.time() - started
+                retryable = status == 'error' or (
+                    status in FetchController.RETRY_STATUSES)
+                overloaded = (
+                    retryable if retryable or status == 200 else None)
+                await self.concurrency.release(started, overloaded)
+
+            if status == 200 or not retryable or (
+                    retry == self.backoff.retries):
+                self.report(status, host, seconds)
+                if status == 200:
+                    return html
+                raise error
+            delay = self.backoff.delay(retry, retry_after)
+            if status == 429:
+                self.buckets.pause(host, delay)
+            self.report(status, host, seconds)
+            PageScraper.EVENTS.event(
+                'fetch_retry', logging.WARNING, '%s %s' % (status, url))
+            start = time.perf_counter()
+            await asyncio.sleep(delay)
+            stats = Instrumentation.stats
+            if stats is not None:
+                stats.record('fetch_retry', time.perf_counter() - start)
+
+    def retry_after(error):
+        # Seconds, only the delay form of the header is understood.
+        try:
+            return float(error.headers.get('Retry-After'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+    def pages_per_second(self, now):
+        window = FetchController.THROUGHPUT_WINDOW
+        while self.completed and self.completed[0] < now - window:
+            self.completed.popleft()
+        if len(self.completed) < 2:
+            return 0.0
+        return len(self.completed) / max(now - self.completed[0], 1e-3)
+
+    def report(self, status, host, seconds):
+        now = time.monotonic()
+        if status == 200:
+            self.completed.append(now)
+        stats = Instrumentation.stats
+        if stats is None:
+            return
+        stats.record('fetch:%s' % status, seconds)
+        stats.set_gauge('fetch_concurrency_limit', self.concurrency.limit)
+        stats.set_gauge('fetch_in_flight', self.concurrency.in_flight)
+        stats.set_gauge('fetch_pages_per_second', self.pages_per_second(now))
+        stats.set_gauge('fetch_backoff_seconds:' + host,
+                        self.buckets.backoff_seconds(host))
@@ -0,0 +1,146 @@
+import asyncio
+import concurrent.futures
+import functools
+import urllib.request
+from scraper.fetch_controller import FetchController
+from scraper.page_pool import PageScrapeFailed
+from scraper.page_scraper import PageScraper, PaginationInfo
+
+
+class Search(object):
+    # url_template is formatted with page_num, e.g.
+    # 'https://www.realestate.com.au/buy/in-act+2914/list-{page_num}'
+    def __init__(self, url_template, state, postcode):
+        self.url_template = url_template
+        self.state = state
+        self.postcode = postcode
+
+    def url(self, page_num):
+        return self.url_template.format(page_num=page_num)
+
+
+class FetchPipeline(object):
+    # Fetches the pages of each search concurrently, up to max_connections
+    # at a time as the FetchController allows, and scrapes them as they
+    # arrive. controller_args are passed on to the FetchController. When
+    # the first page of a search gives the total number of results, the
+    # remaining pages are fetched together. Otherwise the search is paged
+    # in order until PageScraper.no_results_check finds the 'no results'
+    # page. With parse_workers set the pages are parsed in a process pool,
+    # otherwise in the event loop's default thread pool. quiet drops the
+    # scraping notes, as it does for scrape_pages.
+    #
+    # As in iter_scrape_pages, a page that can't be fetched or scraped is
+    # replaced by a PageScrapeFailed, with the search's page number, and
+    # the other searches carry on. A search whose number of pages is
+    # unknown stops at its first failed page.
+    MAX_PAGES = 1000
+    TIMEOUT = 30
+
+    def __init__(self, scraper, max_connections=8, requests_per_second=None,
+                 parse_workers=None, parser=None, restrict=None,
+                 max_pages=MAX_PAGES, timeout=TIMEOUT, quiet=False,
+                 **controller_args):
+        self.scraper = scraper
+        self.max_connections = max_connections
+        self.controller = FetchController(
+            max_connections, requests_per_second, **controller_args)
+        self.parse_workers = parse_workers
+        self.parser = parser or scraper.PARSER
+        self.restrict = restrict
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.quiet = quiet
+
+    def scrape(self, searches):
+        with PageScraper.EVENTS.batch(self.quiet):
+            return asyncio.run(self.scrape_searches(searches))
+
+    async def scrape_searches(self, searches):
+        self.controller.start()
+        self.fetch_executor = concurrent.futures.ThreadPoolExecutor(
+            self.max_connections)
+        self.parse_executor = None
+        if self.parse_workers is not None:
+            self.parse_executor = concurrent.futures.ProcessPoolExecutor(
+                self.parse_workers)
+
+        try:
+            scrapings = await asyncio.gather(*[
+                self.scrape_search(search) for search in searches
+            ])
+        finally:
+            self.fetch_executor.shutdown()
+            if self.parse_executor is not None:
+                self.parse_executor.shutdown()
+
+        return [p for properties in scrapings for p in properties]
+
+    async def scrape_search(self, search):
+        pagination, properties = await self.scrape_search_page(search, 1)
+        # A failed first page ends the search, its pages being unknown.
+        num_pages = 1 if pagination is None else pagination.num_pages()
+
+        if num_pages is None:
+            for page_num in range(2, self.max_pages + 1):
+                pagination, page_properties = await self.scrape_search_page(
+                    search, page_num)
+                properties.extend(page_properties)
+                if pagination is None or pagination.total == 0:
+                    break
+        else:
+            pages = await asyncio.gather(*[
+                self.scrape_search_page(search, page_num)
+                for page_num in range(2, min(num_pages, self.max_pages) + 1)
+            ])
+            for _, page_properties in pages:
+                properties.extend(page_properties)
+
+        return self.scraper.populate_state_and_postcode(
+            properties, search.state, search.postcode)
+
+    async def scrape_search_page(self, search, page_num):
+        # The pagination is None when the page failed.
+        try:
+            return await self.fetch_and_scrape(search, page_num)
+        except Exception as e:
+            return None, [PageScrapeFailed.from_exception(page_num, e)]
+
+    async def fetch_and_scrape(self, search, page_num):
+        html = await self.fetch(search.url(page_num))
+        loop = asyncio.get_running_loop()
+        if self.parse_executor is None:
+            return await loop.run_in_executor(
+                None, FetchPipeline.scrape_html, html, page_num,
+                self.scraper.scrape_page, self.parser, self.restrict)
+
+        scraping, stats = await loop.run_in_executor(
+            self.parse_executor, FetchPipeline.scrape_html_in_worker,
+            html, page_num, self.scraper.scrape_page, self.parser,
+            self.restrict, PageScraper.worker_settings())
+        PageScraper.merge_worker_stats(stats)
+        return scraping
+
+    async def fetch(self, url):
+        return await self.controller.fetch(
+            functools.partial(FetchPipeline.fetch_html, timeout=self.timeout),
+            url, self.fetch_executor)
+
+    def fetch_html(url, timeout):
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            charset = response.headers.get_content_charset() or 'utf-8'
+            return response.read().decode(charset)
+
+    def scrape_html(html, page_num, scrape_page, parser, restrict):
+        soup = PageScraper.html_to_soup(html, parser, restrict)
+        if PageScraper.no_results_check(soup, page_num):
+            return PaginationInfo(0, 0, 0), []
+        else:
+            return PageScraper.pagination_info(soup), scrape_page(soup)
+
+    def scrape_html_in_worker(html, page_num, scrape_page, parser, restrict,
+                              worker_settings):
+        with PageScraper.worker_batch(*worker_settings) as stats:
+            scraping = FetchPipeline.scrape_html(
+                html, page_num, scrape_page, parser, restrict)
+        return scraping, stats
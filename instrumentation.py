@@ -0,0 +1,190 @@
+import collections
+import contextlib
+import time
+from scraper.article_fields import ArticleFields
+from scraper.page_scraper import PageScraper
+from scraper.rentals_scraper import RentalsScraper
+
+
+class ScrapeStats(object):
+    # Wall time and call counts per scrape stage, and counts of the
+    # outcomes that mean a listing was not fully understood. Stage times
+    # are inclusive, e.g. 'scrape:residential' includes the
+    # 'article_fields', 'sale_type', 'features' and 'address' time of those
+    # listings. Gauges hold the last value set, e.g. the FetchController's
+    # concurrency limit, and are only in the snapshot once one is set.
+    OUTCOMES = (
+        'DataContentTypeNotSupported', 'PropertyTypeNotSupported',
+        'SaleTypeParseFailed', 'UnableToFindSaleTypeText',
+        'RentalTypeParseFailed',
+    )
+
+    def __init__(self):
+        self.seconds = collections.Counter()
+        self.calls = collections.Counter()
+        self.outcomes = collections.Counter()
+        self.gauges = {}
+
+    def record(self, stage, seconds):
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def count(self, outcome, n=1):
+        self.outcomes[outcome] += n
+
+    def set_gauge(self, gauge, value):
+        self.gauges[gauge] = value
+
+    def count_outcomes(self, p):
+        name = type(p).__name__
+        if name in ScrapeStats.OUTCOMES:
+            self.count(name)
+
+        details = getattr(p, 'details', None)
+        for x in (getattr(p, 'sale_type', None),
+                  getattr(details, 'property_type', None)):
+            name = type(x).__name__
+            if name in ScrapeStats.OUTCOMES:
+                self.count(name)
+
+    def merge(self, other):
+        self.seconds.update(other.seconds)
+        self.calls.update(other.calls)
+        self.outcomes.update(other.outcomes)
+        self.gauges.update(other.gauges)
+
+    def snapshot(self):
+        snapshot = {
+            'stages': dict(
+                (stage, {'seconds': self.seconds[stage],
+                         'calls': self.calls[stage]})
+                for stage in sorted(self.calls)
+            ),
+            'outcomes': dict(self.outcomes),
+        }
+        if self.gauges:
+            snapshot['gauges'] = dict(self.gauges)
+        return snapshot
+
+    def to_prometheus(self, prefix='scraper'):
+        lines = [
+            '# TYPE %s_stage_seconds_total counter' % prefix,
+        ]
+        lines.extend(
+            '%s_stage_seconds_total{stage="%s"} %f' % (
+                prefix, stage, self.seconds[stage])
+            for stage in sorted(self.calls)
+        )
+        lines.append('# TYPE %s_stage_calls_total counter' % prefix)
+        lines.extend(
+            '%s_stage_calls_total{stage="%s"} %i' % (
+                prefix, stage, self.calls[stage])
+            for stage in sorted(self.calls)
+        )
+        lines.append('# TYPE %s_outcomes_total counter' % prefix)
+        lines.extend(
+            '%s_outcomes_total{outcome="%s"} %i' % (
+                prefix, outcome, self.outcomes[outcome])
+            for outcome in sorted(self.outcomes)
+        )
+        if self.gauges:
+            lines.append('# TYPE %s_gauge gauge' % prefix)
+            lines.extend(
+                '%s_gauge{gauge="%s"} %f' % (prefix, gauge, self.gauges[gauge])
+                for gauge in sorted(self.gauges)
+            )
+        return '\n'.join(lines) + '\n'
+
+
+class Instrumentation(object):
+    # While enabled, the stage functions below are replaced on their
+    # classes by timed wrappers, and put back on disable, so there is no
+    # cost at all when instrumentation is off. Stats are per process, so
+    # pool workers collect their own for each chunk, see
+    # PageScraper.worker_batch, and the parent merges them into its own.
+    TIMED = (
+        (PageScraper, 'html_to_soup', 'parse'),
+        (PageScraper, 'find_articles', 'find_articles'),
+        (ArticleFields, 'extract', 'article_fields'),
+        (PageScraper, 'sale_type_from_fields', 'sale_type'),
+        (PageScraper, 'project_sale_type_from_fields', 'sale_type'),
+        (RentalsScraper, 'rental_type_from_fields', 'sale_type'),
+        (PageScraper, 'parse_property_features', 'features'),
+        (PageScraper, 'address_text_from_fields', 'address'),
+    )
+
+    stats = None
+    originals = []
+
+    def enable(stats=None):
+        if Instrumentation.stats is not None:
+            raise RuntimeError('Instrumentation is already enabled.')
+        stats = stats or ScrapeStats()
+
+        for cls, name, stage in Instrumentation.TIMED:
+            Instrumentation.replace(cls, name, Instrumentation.timed(
+                getattr(cls, name), stage, stats))
+        Instrumentation.replace(
+            PageScraper, 'scrape_article',
+            Instrumentation.timed_scrape_article(
+                PageScraper.scrape_article, stats)
+        )
+
+        Instrumentation.stats = stats
+        return stats
+
+    def disable():
+        for cls, name, original in reversed(Instrumentation.originals):
+            setattr(cls, name, original)
+        Instrumentation.originals = []
+        stats = Instrumentation.stats
+        Instrumentation.stats = None
+        return stats
+
+    @contextlib.contextmanager
+    def collect(stats=None, callback=None):
+        stats = Instrumentation.enable(stats)
+        try:
+            yield stats
+        finally:
+            Instrumentation.disable()
+            if callback is not None:
+                callback(stats)
+
+    @contextlib.contextmanager
+    def collect_in_worker():
+        # Instrumentation a forked worker inherited records into a copy of
+        # the parent's stats, so it is replaced.
+        Instrumentation.disable()
+        with Instrumentation.collect() as stats:
+            yield stats
+
+    def merge(stats):
+        if stats is not None and Instrumentation.stats is not None:
+            Instrumentation.stats.merge(stats)
+
+    def replace(cls, name, f):
+        Instrumentation.originals.append((cls, name, getattr(cls, name)))
+        setattr(cls, name, f)
+
+    def timed(f, stage, stats):
+        def timed_f(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                stats.record(stage, time.perf_counter() - start)
+        return timed_f
+
+    def timed_scrape_article(scrape_article, stats):
+        def timed_scrape_article(article, content_types):
+            start = time.perf_counter()
+            properties = scrape_article(article, content_types)
+            stats.record(
+                'scrape:' + article['data-content-type'],
+                time.perf_counter() - start
+            )
+            for p in properties:
+                stats.count_outcomes(p)
+            return properties
+        return timed_scrape_article
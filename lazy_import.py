@@ -0,0 +1,29 @@
+import importlib.util
+import sys
+
+
+class LazyImport(object):
+    # A module that is only loaded once one of its attributes is first
+    # used, see importlib.util.LazyLoader, so that importing the scrapers
+    # does not pay for bs4 or the rep models before a page is scraped. A
+    # module that was already imported is returned as it is, and a missing
+    # one still raises at import.
+
+    def module(name):
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError('No module named %r' % name, name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+
+        parent, _, child = name.rpartition('.')
+        if parent:
+            setattr(sys.modules[parent], child, module)
+        return module
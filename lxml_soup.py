@@ -0,0 +1,78 @@
+class LxmlSoup(object):
+    # A thin wrapper around an lxml.html element that provides the small
+    # part of the bs4.Tag API used by PageScraper, so that the scraping
+    # functions can run unchanged on a tree built by libxml2.
+
+    def __init__(self, element):
+        self.element = element
+
+    def from_html(html):
+        import lxml.html
+        return LxmlDocument(lxml.html.document_fromstring(html))
+
+    def find(self, name, attrs={}, recursive=True):
+        for element in self.candidates(name, recursive):
+            if LxmlSoup.attrs_match(element, attrs):
+                return LxmlSoup(element)
+        return None
+
+    def find_all(self, name, attrs={}, recursive=True):
+        return [
+            LxmlSoup(element)
+            for element in self.candidates(name, recursive)
+            if LxmlSoup.attrs_match(element, attrs)
+        ]
+
+    def candidates(self, name, recursive):
+        if recursive:
+            return self.element.iterdescendants(name)
+        else:
+            return self.element.iterchildren(name)
+
+    def attrs_match(element, attrs):
+        for key, value in attrs.items():
+            actual = element.get(key)
+            if actual is None:
+                return False
+            elif key == 'class':
+                if actual != value and value not in actual.split():
+                    return False
+            elif actual != value:
+                return False
+        return True
+
+    def get_text(self):
+        return ''.join(self.element.itertext())
+
+    def get(self, key, default=None):
+        return self.element.get(key, default)
+
+    def has_attr(self, key):
+        return key in self.element.attrib
+
+    def __getitem__(self, key):
+        return self.element.attrib[key]
+
+    def __eq__(self, other):
+        return (isinstance(other, LxmlSoup) and
+                self.element is other.element)
+
+    def __hash__(self):
+        return hash(self.element)
+
+    def __str__(self):
+        import lxml.html
+        return lxml.html.tostring(
+            self.element, encoding='unicode', with_tail=False)
+
+
+class LxmlDocument(LxmlSoup):
+    # Like bs4.BeautifulSoup, the document is a parent of the root element.
+
+    def candidates(self, name, recursive):
+        if recursive:
+            return self.element.iter(name)
+        elif name is None or self.element.tag == name:
+            return iter([self.element])
+        else:
+            return iter([])
@@ -0,0 +1,240 @@
+import mmap
+import os
+import struct
+import zlib
+
+
+class ArchiveEntry(object):
+    def __init__(self, search, date, page_num, offset, length):
+        self.search = search
+        self.date = date
+        self.page_num = page_num
+        self.offset = offset
+        self.length = length
+
+    def summarise(self):
+        return 'Page %i of %s on %s' % (self.page_num, self.search, self.date)
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.search == other.search and
+                self.date == other.date and
+                self.page_num == other.page_num and
+                self.offset == other.offset and
+                self.length == other.length)
+
+
+class ArchivePages(object):
+    # The pages of some archive entries as a sequence, each page read and
+    # decompressed only when it is got, so scrape_pages and
+    # iter_scrape_pages can take it without the pages being loaded
+    # together.
+    def __init__(self, archive, entries):
+        self.archive = archive
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        return self.archive.read(self.entries[i])
+
+    def __iter__(self):
+        for entry in self.entries:
+            yield self.archive.read(entry)
+
+
+class PageArchive(object):
+    # An append only file of raw result pages, kept for scraping them again
+    # when the scraping changes. Each record is a header, the page's search
+    # key, e.g. 'sales/act/2600', date and page number, then its html
+    # compressed on its own, so any one page can be read without the
+    # others. The offset index is built on open from the headers alone,
+    # stepping over the compressed blocks of a memory map of the file, and
+    # a record left torn by an interrupted append is cut off by the next
+    # append. Anything else that is not a whole record, such as a header
+    # corrupted on disk, is skipped up to the next whole record, and its
+    # (offset, length) kept in skipped.
+    #
+    # There should be one writer at a time, load picks up the records
+    # another process has appended since, as does each append.
+    MAGIC = b'SPA1'
+    # Magic, key length and block length.
+    HEADER = struct.Struct('<4sHI')
+    KEY_SEPARATOR = '\t'
+    LEVEL = 6
+
+    def __init__(self, file_path, level=LEVEL):
+        self.file_path = file_path
+        self.level = level
+        self.file = None
+        self.map = None
+        # The end of the last whole record.
+        self.end = 0
+        self.entries = []
+        self.index = {}
+        self.skipped = []
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        if self.file is None:
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(self.file_path, 'a+b')
+            self.load()
+        return self
+
+    def close(self):
+        self.unmap()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.end = 0
+        self.entries = []
+        self.index = {}
+        self.skipped = []
+
+    def unmap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def mapped(self):
+        if self.map is None:
+            self.open()
+            size = os.fstat(self.file.fileno()).st_size
+            if size == 0:
+                # An empty file can not be mapped.
+                return b''
+            self.map = mmap.mmap(
+                self.file.fileno(), size, access=mmap.ACCESS_READ)
+        return self.map
+
+    def load(self):
+        # Index the records after the last one indexed.
+        self.unmap()
+        data = self.mapped()
+        offset = self.end
+        while offset + PageArchive.HEADER.size <= len(data):
+            entry = PageArchive.entry_at(data, offset)
+            if entry is None:
+                next_offset = PageArchive.next_entry_offset(data, offset + 1)
+                if next_offset is None:
+                    # A torn tail.
+                    break
+                self.skipped.append((offset, next_offset - offset))
+                offset = next_offset
+                continue
+            self.add_entry(entry)
+            offset = entry.offset + entry.length
+        self.end = offset
+
+    def entry_at(data, offset):
+        # The entry of the whole record at offset, or None.
+        if offset + PageArchive.HEADER.size > len(data):
+            return None
+        magic, key_length, length = PageArchive.HEADER.unpack_from(
+            data, offset)
+        key_offset = offset + PageArchive.HEADER.size
+        block_offset = key_offset + key_length
+        if magic != PageArchive.MAGIC or block_offset + length > len(data):
+            return None
+        try:
+            search, date, page_num = bytes(
+                data[key_offset:block_offset]
+            ).decode('utf-8').split(PageArchive.KEY_SEPARATOR)
+            return ArchiveEntry(
+                search, date, int(page_num), block_offset, length)
+        except ValueError:
+            return None
+
+    def next_entry_offset(data, start):
+        offset = data.find(PageArchive.MAGIC, start)
+        while offset != -1:
+            if PageArchive.entry_at(data, offset) is not None:
+                return offset
+            offset = data.find(PageArchive.MAGIC, offset + 1)
+        return None
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+        self.index[(entry.search, entry.date, entry.page_num)] = entry
+
+    def date_text(date):
+        # Dates are kept as ISO text, which sorts in date order.
+        return date.isoformat() if hasattr(date, 'isoformat') else date
+
+    def append(self, search, date, html, page_num):
+        self.open()
+        date = PageArchive.date_text(date)
+        key = PageArchive.KEY_SEPARATOR.join((search, date, str(page_num)))
+        if key.count(PageArchive.KEY_SEPARATOR) != 2:
+            raise ValueError(
+                'A search key or date can not contain %r.' %
+                PageArchive.KEY_SEPARATOR)
+
+        key = key.encode('utf-8')
+        block = zlib.compress(html.encode('utf-8'), self.level)
+        # Index what other writers appended since, so that only a torn
+        # tail after the last whole record is cut off.
+        self.load()
+        self.unmap()
+        if os.fstat(self.file.fileno()).st_size != self.end:
+            self.file.truncate(self.end)
+        self.file.write(
+            PageArchive.HEADER.pack(PageArchive.MAGIC, len(key), len(block)) +
+            key + block)
+        self.file.flush()
+
+        entry = ArchiveEntry(
+            search, date, page_num,
+            self.end + PageArchive.HEADER.size + len(key), len(block))
+        self.add_entry(entry)
+        self.end = entry.offset + entry.length
+        return entry
+
+    def append_pages(self, search, date, htmls, first_page_num=1):
+        return [
+            self.append(search, date, html, page_num)
+            for page_num, html in enumerate(htmls, first_page_num)
+        ]
+
+    def read(self, entry):
+        data = self.mapped()
+        return zlib.decompress(
+            data[entry.offset:entry.offset + entry.length]
+        ).decode('utf-8')
+
+    def page(self, search, date, page_num):
+        self.open()
+        return self.read(
+            self.index[(search, PageArchive.date_text(date), page_num)])
+
+    def select(self, search=None, since=None, until=None):
+        # Entries in the order they were appended, since and until are
+        # inclusive.
+        self.open()
+        since = PageArchive.date_text(since)
+        until = PageArchive.date_text(until)
+        return [
+            x for x in self.entries
+            if (search is None or x.search == search) and
+            (since is None or x.date >= since) and
+            (until is None or x.date <= until)
+        ]
+
+    def pages(self, search=None, since=None, until=None):
+        return ArchivePages(self, self.select(search, since, until))
+
+    def searches(self):
+        self.open()
+        return sorted(set(x.search for x in self.entries))
+
+    def dates(self, search=None):
+        return sorted(set(x.date for x in self.select(search)))
@@ -0,0 +1,179 @@
+import hashlib
+import pickle
+import re
+import time
+from scraper.page_pool import PagePool
+from scraper.page_scraper import PageScraper
+from scraper.sqlite_file import SqliteFile
+
+
+class PageCache(object):
+    # An on disk cache of scraped pages, keyed by a hash of the page's
+    # div#searchResultsTbl markup. The markup is cut out of the raw html
+    # with a div balancing scan and normalised (scripts, comments and
+    # whitespace removed), so a hit skips parsing altogether. Entries are
+    # evicted least recently used first once the cache is over max_bytes,
+    # and the whole cache is cleared when PageScraper.PARSER_VERSION
+    # changes. Hit and miss counts are kept in the database, so they add
+    # up across runs and worker processes.
+    MAX_BYTES = 256 * 1024 ** 2
+    STATS = ('hits', 'misses', 'stores', 'evictions', 'unkeyed')
+
+    RESULTS_TABLE_START = re.compile(
+        r'<div\b[^>]*\bid=["\']searchResultsTbl["\']', re.IGNORECASE)
+    DIV_TAG = re.compile(r'<div\b|</div\s*>', re.IGNORECASE)
+    NOISE = re.compile(
+        r'<script\b.*?</script\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+    WHITESPACE = re.compile(r'\s+')
+    BETWEEN_TAGS = re.compile(r'>\s+<')
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS pages ('
+        'key TEXT PRIMARY KEY, properties BLOB, size INTEGER, '
+        'last_used REAL)',
+        'CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)',
+        'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)',
+        'CREATE TABLE IF NOT EXISTS stats '
+        '(name TEXT PRIMARY KEY, value INTEGER)',
+    )
+
+    def __init__(self, file_path, max_bytes=MAX_BYTES):
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.connection = None
+
+    def __getstate__(self):
+        # Pickled for the worker pool by path, each process connects itself.
+        return {'file_path': self.file_path, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['file_path'], state['max_bytes'])
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = SqliteFile.connect(
+                self.file_path, PageCache.SCHEMA)
+            with self.connection:
+                self.check_version()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def check_version(self):
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'parser_version'"
+        ).fetchone()
+        if row is None or row[0] != PageScraper.PARSER_VERSION:
+            self.connection.execute('DELETE FROM pages')
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('parser_version', ?)",
+                (PageScraper.PARSER_VERSION,)
+            )
+
+    def results_table_html(html):
+        start = PageCache.RESULTS_TABLE_START.search(html)
+        if start is None:
+            return None
+
+        depth = 0
+        for tag in PageCache.DIV_TAG.finditer(html, start.start()):
+            if tag.group().startswith('</'):
+                depth -= 1
+                if depth == 0:
+                    return html[start.start():tag.end()]
+            else:
+                depth += 1
+        return None
+
+    def normalise(results_table_html):
+        html = PageCache.NOISE.sub('', results_table_html)
+        html = PageCache.BETWEEN_TAGS.sub('><', html)
+        return PageCache.WHITESPACE.sub(' ', html).strip()
+
+    def page_key(namespace, html):
+        results_table_html = PageCache.results_table_html(html)
+        if results_table_html is None:
+            return None
+
+        digest = hashlib.sha256(namespace.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(
+            PageCache.normalise(results_table_html).encode('utf-8'))
+        return digest.hexdigest()
+
+    def lookup(self, namespace, html):
+        # Returns (key, properties), properties is None on a miss and key is
+        # None when the page has no results table to key on.
+        key = PageCache.page_key(namespace, html)
+        connection = self.connect()
+        with connection:
+            if key is None:
+                self.count('unkeyed')
+                return None, None
+
+            row = connection.execute(
+                'SELECT properties FROM pages WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.count('misses')
+                return key, None
+
+            connection.execute(
+                'UPDATE pages SET last_used = ? WHERE key = ?',
+                (time.time(), key)
+            )
+            self.count('hits')
+        return key, pickle.loads(row[0])
+
+    def store(self, key, properties):
+        blob = PagePool.dumps(properties)
+        if blob is None:
+            return False
+
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                (key, blob, len(blob), time.time())
+            )
+            self.count('stores')
+            self.evict()
+        return True
+
+    def evict(self):
+        total = self.connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = []
+        for key, size in self.connection.execute(
+                'SELECT key, size FROM pages ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany('DELETE FROM pages WHERE key = ?', evicted)
+        self.count('evictions', len(evicted))
+
+    def count(self, name, n=1):
+        self.connection.execute(
+            'INSERT OR IGNORE INTO stats VALUES (?, 0)', (name,))
+        self.connection.execute(
+            'UPDATE stats SET value = value + ? WHERE name = ?', (n, name))
+
+    def stats(self):
+        connection = self.connect()
+        stats = dict.fromkeys(PageCache.STATS, 0)
+        stats.update(connection.execute('SELECT name, value FROM stats'))
+        stats['entries'], stats['bytes'] = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+        return stats
+
+    def reset_stats(self):
+        connection = self.connect()
+        with connection:
+            connection.execute('DELETE FROM stats')
@@ -0,0 +1,123 @@
+import collections
+import contextlib
+import itertools
+import pickle
+import traceback
+
+
+class PageScrapeFailed(object):
+    def __init__(self, page_num, error_type, message, trace):
+        self.page_num = page_num
+        self.error_type = error_type
+        self.message = message
+        self.trace = trace
+
+    def from_exception(page_num, error):
+        return PageScrapeFailed(
+            page_num, type(error).__name__, str(error),
+            traceback.format_exc()
+        )
+
+    def summarise(self):
+        return 'Page %i failed with %s: %s' % (
+            self.page_num, self.error_type, self.message)
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.page_num == other.page_num and
+                self.error_type == other.error_type and
+                self.message == other.message)
+
+
+class PagePool(object):
+    # Parses and scrapes pages in worker processes. Only the scraped
+    # properties are sent back, soups never leave the worker. A page that
+    # raises is replaced by a single PageScrapeFailed entry.
+    #
+    # Pool.imap reads its whole input up front, so instead chunks are
+    # submitted through a window of at most 2 * workers pending chunks,
+    # which keeps memory bounded when htmls is a long running iterator.
+    #
+    # chunk_batch, when given, is called in the worker for the context each
+    # chunk is scraped in, and what the context yields is sent back and
+    # passed to chunk_done in the parent. page_failed(page_num, html, error)
+    # makes the failure entry in place of PageScrapeFailed.from_exception.
+    #
+    # Each page's properties are pickled in the worker with dumps_page, so
+    # a property that can't be pickled fails on its own instead of the
+    # whole call.
+
+    def iter_scrape_pages(htmls, scrape_html, workers, chunksize=1,
+                          chunk_batch=None, page_failed=None,
+                          chunk_done=None):
+        pending = collections.deque()
+        # Imported here, it is slow to import and only the pool needs it.
+        import multiprocessing
+        with multiprocessing.Pool(workers) as pool:
+            for chunk in PagePool.chunk_pages(htmls, chunksize):
+                pending.append(pool.apply_async(
+                    PagePool.scrape_chunk,
+                    (chunk, scrape_html, chunk_batch, page_failed)
+                ))
+                if len(pending) >= workers * 2:
+                    yield from PagePool.finish_chunk(
+                        pending.popleft().get(), chunk_done)
+            while pending:
+                yield from PagePool.finish_chunk(
+                    pending.popleft().get(), chunk_done)
+
+    def chunk_pages(htmls, chunksize):
+        pages = enumerate(htmls)
+        while True:
+            chunk = list(itertools.islice(pages, chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    def scrape_chunk(chunk, scrape_html, chunk_batch=None,
+                     page_failed=None):
+        pages = []
+        with (contextlib.nullcontext() if chunk_batch is None
+              else chunk_batch()) as batch:
+            for page_num, html in chunk:
+                try:
+                    properties = scrape_html(html)
+                except Exception as e:
+                    if page_failed is None:
+                        properties = [
+                            PageScrapeFailed.from_exception(page_num, e)]
+                    else:
+                        properties = [page_failed(page_num, html, e)]
+                pages.append(PagePool.dumps_page(page_num, properties))
+        return pages, batch
+
+    def finish_chunk(chunk, chunk_done):
+        pages, batch = chunk
+        if chunk_done is not None:
+            chunk_done(batch)
+        for page in pages:
+            yield from pickle.loads(page)
+
+    def dumps(properties):
+        # None when properties can't be pickled.
+        try:
+            return pickle.dumps(properties, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+
+    def dumps_page(page_num, properties):
+        # Each property that can't be pickled is replaced by a
+        # PageScrapeFailed, keeping the rest of the page.
+        page = PagePool.dumps(properties)
+        if page is None:
+            page = pickle.dumps(
+                [PagePool.picklable(page_num, p) for p in properties],
+                pickle.HIGHEST_PROTOCOL)
+        return page
+
+    def picklable(page_num, p):
+        try:
+            pickle.dumps(p, pickle.HIGHEST_PROTOCOL)
+            return p
+        except Exception as e:
+            return PageScrapeFailed.from_exception(page_num, e)
@@ -1,26 +1,324 @@
+import array
+import contextlib
+import functools
+import logging
 import re
-import bs4
-import real_estate.real_estate_property as rep
+from scraper.article_fields import ArticleFields
+from scraper.events import EventSink
+from scraper.lazy_import import LazyImport
+from scraper.lxml_soup import LxmlSoup
+from scraper.page_pool import PagePool
+from scraper.stream_extractor import StreamExtractor, StreamPage
+from scraper.type_registry import TypeRegistry
+
+bs4 = LazyImport.module('bs4')
+rep = LazyImport.module('real_estate.real_estate_property')
+
+
+class PaginationInfo(object):
+    # From the '#resultsInfo' text, e.g. 'Showing 21 - 40 of 345 total
+    # results'. The site sometimes leaves the total out, in which case the
+    # number of pages is unknown and a crawler has to probe for the 'no
+    # results' page. page_size is only the search's page size when read
+    # from a page that is not the last one, such as the first page.
+    def __init__(self, first, last, total):
+        self.first = first
+        self.last = last
+        self.total = total
+
+    def num_articles(self):
+        if self.total == 0:
+            return 0
+        else:
+            return self.last - self.first + 1
+
+    def page_size(self):
+        return self.num_articles()
+
+    def page_num(self):
+        if self.total == 0:
+            return 1
+        else:
+            return (self.first - 1) // self.page_size() + 1
+
+    def num_pages(self):
+        if self.total is None:
+            return None
+        elif self.total == 0:
+            return 0
+        else:
+            return -(-self.total // self.page_size())
+
+    def summarise(self):
+        return 'Showing %s - %s of %s, %s pages' % (
+            self.first, self.last, self.total, self.num_pages())
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                (self.first, self.last, self.total) ==
+                (other.first, other.last, other.total))
 
 
 class PageScraper(object):
     MIN_PRICE = 10000
-    UNDER_CONTRACT_REGEX = '.*(under contract|under offer)(?i)'
+    # Bump whenever a change to the scraping changes its output, this
+    # invalidates cached scrapes, see PageCache.
+    PARSER_VERSION = 1
+    # Where notes made while scraping go, see EventSink.
+    EVENTS = EventSink()
+    UNDER_CONTRACT_REGEX = re.compile(
+        '.*(under contract|under offer)', re.IGNORECASE)
+
+    # href property type slugs, see get_property_type_text.
+    PROPERTY_TYPES = TypeRegistry(lambda: {
+        'house': rep.House,
+        'townhouse': rep.TownHouse,
+        'villa': rep.TownHouse,
+        'terrace': rep.TownHouse,
+        'unit': rep.Unit,
+        'apartment': rep.Unit,
+        'flat': rep.Unit,
+        'serviced+apartment': rep.ServicedApartment,
+        'studio': rep.Studio,
+        'residential+land': rep.Land,
+        'duplex+semi+detached': rep.Duplex,
+        'retirement+living': rep.RetirementLiving,
+        'unitblock': rep.UnitBlock,
+        'acreage+semi+rural': rep.SemiRural,
+        'other': rep.NotSpecified,
+    })
+    RURAL_PROPERTY_TYPES = TypeRegistry(lambda: {
+        'other': rep.Rural,
+        'mixed+farming': rep.Rural,
+        'cropping': rep.Rural,
+        'horticulture': rep.Rural,
+        'dairy': rep.Rural,
+        'livestock': rep.Rural,
+        'farmlet': rep.Rural,
+        'viticulture': rep.Rural,
+    })
+    RURAL_NOT_SUPPORTED = ('lifestyle',)
 
     DIGITS_ONLY = re.compile(r'\A(\d+)\Z')
+    RESULTS_INFO = re.compile(r'(\d+) - (\d+)(?: of\s+(\d[\d,]*))?')
     APPROX_LAND_AREA = re.compile(r'\A(\d+) m² \(approx\)')
+    PROPERTY_TYPE_HREF = re.compile(r'^\/property-(\w+\+?\w*\+?\w*\+?\w*)')
+
+    # Sale text is classified with one match against the alternation of
+    # every keyword, the name of the group that matched is the category.
+    # The negotiation typos were found when scraping from the website.
+    SALE_TEXT_CATEGORIES = re.compile(
+        r'(?P<auction>auction)|'
+        r'(?P<tender>tender)|'
+        r'(?P<negotiation>(price )?by negotiation|by negotiaton|'
+        r'by negotation)|'
+        r'(?P<contact_agent>contact agent)',
+        re.IGNORECASE
+    )
+    # Finds dollar and dollarless prices in one scan, if any of the prices
+    # has a dollar sign the dollarless ones are ignored.
+    PRICE = re.compile(r'\$?\d+(?:,\d+)*')
+    POSSIBLE_PRICE = re.compile(r'\d+,?\d*')
+
+    # Batches of sale text are joined with a separator that can not be in
+    # the text, one scan then classifies them all, see classify_sale_texts.
+    BATCH_SEPARATOR = '\x00'
+    BATCH_SALE_TEXT_CATEGORIES = re.compile(
+        BATCH_SEPARATOR + '(?:' + SALE_TEXT_CATEGORIES.pattern + ')',
+        re.IGNORECASE
+    )
+    # The lookahead lets the scan skip straight to a separator, '$' or
+    # digit.
+    BATCH_PRICE = re.compile(
+        '(?=[' + BATCH_SEPARATOR + r'$\d])(?:' + BATCH_SEPARATOR + '|' +
+        PRICE.pattern + ')'
+    )
+    SALE_TEXT_CATEGORY_CODES = {
+        None: -1, 'auction': 0, 'tender': 1, 'negotiation': 2,
+        'contact_agent': 3,
+    }
+    # Codes of deduce_sale_types, with UNDER_CONTRACT_CODE added when the
+    # listing is under contract.
+    SALE_TYPE_CODES = (
+        'off_plan', 'auction', 'tender', 'negotiation', 'private_treaty',
+        'contact_agent', 'unable_to_find_sale_type_text',
+        'sale_type_parse_failed',
+    )
+    UNDER_CONTRACT_CODE = 0x80
+
+    # 'html.parser' and 'lxml' are bs4 tree builders, 'lxml.html' skips bs4
+    # and wraps the lxml tree directly, see LxmlSoup. 'stream' and
+    # 'stream.lxml' build no tree, see StreamExtractor.
+    PARSERS = ('html.parser', 'lxml', 'lxml.html', 'stream', 'stream.lxml')
+    STREAM_PARSERS = ('stream', 'stream.lxml')
+    PARSER = 'html.parser'
+
+    # In restricted mode only the two subtrees the scrapers read are built,
+    # they are then put back in a bare body#searchResults > div#DSContents
+    # skeleton so that get_ds_contents and friends work unchanged. It only
+    # pays with 'html.parser'. lxml tokenises the whole page in C either
+    # way, so skipping bs4's tree building for the rest saves nothing on a
+    # full results page, see benchmark/restricted_parse.py.
+    RESTRICT = False
+    RESTRICTED_IDS = ['results', 'searchResultsForm']
+    RESTRICTED_SKELETON = (
+        '<body id="searchResults"><div id="DSContents"></div></body>'
+    )
+
+    def html_to_soup(html, parser=None, restrict=None):
+        parser = PageScraper.choose_parser(parser)
+        if restrict is None:
+            restrict = PageScraper.RESTRICT
+
+        if restrict:
+            return PageScraper.restricted_html_to_soup(html, parser)
+        elif parser == 'lxml.html':
+            return LxmlSoup.from_html(html)
+        elif parser in PageScraper.STREAM_PARSERS:
+            return StreamExtractor.parse(html, parser)
+        else:
+            return bs4.BeautifulSoup(html, parser)
+
+    def restricted_html_to_soup(html, parser):
+        if parser == 'lxml.html' or parser in PageScraper.STREAM_PARSERS:
+            raise ValueError(
+                'Restricted parsing needs a bs4 parser, not: %s' % parser)
+
+        strainer = bs4.SoupStrainer(id=PageScraper.RESTRICTED_IDS)
+        subtrees = bs4.BeautifulSoup(html, parser, parse_only=strainer)
+
+        soup = bs4.BeautifulSoup(PageScraper.RESTRICTED_SKELETON, parser)
+        ds_contents = soup.find('div', {'id': 'DSContents'})
+        for subtree in subtrees.find_all(True, recursive=False):
+            ds_contents.append(subtree.extract())
+        return soup
+
+    def choose_parser(parser):
+        if parser is None:
+            parser = PageScraper.PARSER
+        if parser not in PageScraper.PARSERS:
+            raise ValueError(
+                'Parser not supported: %s, use one of: %s' %
+                (parser, ', '.join(PageScraper.PARSERS))
+            )
+        return parser
+
+    def iter_scrape_pages(htmls, scrape_page, parser=None, workers=None,
+                          chunksize=1, restrict=None, cache=None, memo=None,
+                          compact=False, quarantine=None):
+        # With a quarantine, see Quarantine, a page or article that raises
+        # is quarantined and replaced by a failure entry instead of ending
+        # the batch.
+        if memo is not None and (workers is not None or cache is not None):
+            # A memo is per process, and cached pages would skip it.
+            raise ValueError(
+                'An article memo can not be used with workers or a cache.')
+
+        scrape_html = functools.partial(
+            PageScraper.scrape_html, scrape_page=scrape_page, parser=parser,
+            restrict=restrict, cache=cache, memo=memo, quarantine=quarantine
+        )
+        page_failed = None if quarantine is None else quarantine.page_failed
+
+        if workers is not None:
+            chunk_batch = functools.partial(
+                PageScraper.worker_batch, *PageScraper.worker_settings())
+            properties = PagePool.iter_scrape_pages(
+                htmls, scrape_html, workers, chunksize, chunk_batch,
+                page_failed, PageScraper.merge_worker_stats)
+        elif quarantine is not None:
+            properties = PageScraper.iter_flushed(
+                PageScraper.iter_isolated_pages(
+                    htmls, scrape_html, page_failed))
+        else:
+            properties = PageScraper.iter_flushed(
+                p for html in htmls for p in scrape_html(html))
 
-    def html_to_soup(html):
-        return bs4.BeautifulSoup(html, "html.parser")
+        if compact:
+            from scraper.compact import CompactRecords
+            return CompactRecords().iter_compact(properties)
+        else:
+            return properties
+
+    def iter_isolated_pages(htmls, scrape_html, page_failed):
+        for page_num, html in enumerate(htmls):
+            try:
+                properties = scrape_html(html)
+            except Exception as e:
+                properties = [page_failed(page_num, html, e)]
+            yield from properties
+
+    def scrape_html(html, scrape_page, parser=None, restrict=None,
+                    cache=None, memo=None, quarantine=None):
+        key = None
+        if cache is not None:
+            key, properties = cache.lookup(scrape_page.__qualname__, html)
+            if properties is not None:
+                return properties
+
+        soup = PageScraper.html_to_soup(html, parser, restrict)
+        if memo is None and quarantine is None:
+            properties = scrape_page(soup)
+        else:
+            failures = None if quarantine is None else quarantine.failures
+            properties = scrape_page(soup, memo, quarantine)
+            if quarantine is not None and quarantine.failures != failures:
+                # Not cached with its failure entries, a later run has to
+                # raise or quarantine the articles itself.
+                key = None
+
+        if key is not None:
+            cache.store(key, properties)
+        return properties
+
+    def flush_events():
+        PageScraper.EVENTS.flush()
+
+    def events_batch(quiet=False):
+        return PageScraper.EVENTS.batch(quiet)
+
+    def worker_settings():
+        # The arguments of worker_batch in this process. Workers are passed
+        # them, not left to inherit them through fork. Instrumentation is
+        # imported here, as it imports this module.
+        from scraper.instrumentation import Instrumentation
+        return PageScraper.EVENTS.quiet, Instrumentation.stats is not None
+
+    @contextlib.contextmanager
+    def worker_batch(quiet=False, instrumented=False):
+        # The context a worker process scrapes in, yielding its ScrapeStats
+        # when instrumented, for merge_worker_stats in the parent.
+        with PageScraper.events_batch(quiet):
+            if not instrumented:
+                yield None
+                return
+            from scraper.instrumentation import Instrumentation
+            with Instrumentation.collect_in_worker() as stats:
+                yield stats
+
+    def merge_worker_stats(stats):
+        from scraper.instrumentation import Instrumentation
+        Instrumentation.merge(stats)
+
+    def iter_flushed(properties):
+        # The events of a serial scrape are logged when it ends, as the
+        # workers' are after each chunk, so callers iterating outside a
+        # batch still see them.
+        try:
+            yield from properties
+        finally:
+            PageScraper.flush_events()
 
     def no_results_check(soup, page_num):
         no_results = PageScraper.check_for_no_results(soup)
         if no_results:
-            print("Found the 'no results' page, final page is number %i" %
-                  (page_num - 1))
+            PageScraper.EVENTS.event('no_results', logging.INFO, page_num - 1)
         return no_results
 
     def check_for_no_results(soup):
+        if isinstance(soup, StreamPage):
+            return PageScraper.check_stream_for_no_results(soup)
+
         ds_contents = PageScraper.get_ds_contents(soup)
         search_results = ds_contents.find(
             'form', {'id': 'searchResultsForm'}, recursive=False
@@ -43,7 +341,19 @@ class PageScraper(object):
             else:
                 raise(err)
 
+    def check_stream_for_no_results(page):
+        if 'search_results_form' in page.seen:
+            if 'no_results' in page.seen:
+                return True
+        elif 'results' in page.seen:
+            return False
+        raise RuntimeError('HTML not understood.')
+
     def find_articles(soup):
+        if isinstance(soup, StreamPage):
+            PageScraper.num_articles_check(soup, len(soup.articles))
+            return soup.articles
+
         ds_contents = PageScraper.get_ds_contents(soup)
         results = PageScraper.get_results(ds_contents)
 
@@ -67,16 +377,9 @@ class PageScraper(object):
         return ds_contents.find('div', {'id': 'results'}, recursive=False)
 
     def num_articles_check(results, articles_len):
-        results_info_text = results.find(
-            'div', {'id': 'resultsInfo'}
-        ).find(
-            'p'
-        ).get_text()
-
-        results_on_page_search = re.search('(\d+) - (\d+)', results_info_text)
-        num_articles_lower = int(results_on_page_search.group(1))
-        num_articles_upper = int(results_on_page_search.group(2))
-        num_articles_on_page = num_articles_upper - num_articles_lower + 1
+        # results is a StreamPage for the stream parsers.
+        num_articles_on_page = PageScraper.parse_results_info(
+            results).num_articles()
 
         if num_articles_on_page != articles_len:
             raise(RuntimeError(
@@ -84,90 +387,134 @@ class PageScraper(object):
                 '%i v. %i' % (num_articles_on_page, articles_len)
             ))
 
-    def create_properties(articles):
+    def pagination_info(soup):
+        if PageScraper.check_for_no_results(soup):
+            return PaginationInfo(0, 0, 0)
+        elif isinstance(soup, StreamPage):
+            return PageScraper.parse_results_info(soup)
+        else:
+            ds_contents = PageScraper.get_ds_contents(soup)
+            results = PageScraper.get_results(ds_contents)
+            return PageScraper.parse_results_info(results)
+
+    def parse_results_info(results):
+        if isinstance(results, StreamPage):
+            results_info_text = results.results_info_text()
+        else:
+            results_info_text = results.find(
+                'div', {'id': 'resultsInfo'}
+            ).find(
+                'p'
+            ).get_text()
+
+        results_on_page_search = PageScraper.RESULTS_INFO.search(
+            results_info_text)
+        total = results_on_page_search.group(3)
+        return PaginationInfo(
+            int(results_on_page_search.group(1)),
+            int(results_on_page_search.group(2)),
+            None if total is None else int(total.replace(',', ''))
+        )
+
+    def create_properties(articles, memo=None, quarantine=None):
+        return PageScraper.create_properties_with(
+            articles, PageScraper.CONTENT_TYPES, memo, quarantine)
+
+    def create_properties_with(articles, content_types, memo=None,
+                               quarantine=None):
+        scrape = functools.partial(
+            PageScraper.scrape_article, content_types=content_types)
+        if quarantine is not None:
+            scrape = functools.partial(
+                quarantine.scrape_article, scrape=scrape)
+
         properties = []
         for article in articles:
-            data_content_type = article['data-content-type']
-
-            if data_content_type == 'residential':
-                p = PageScraper.scrape_residential_property(article)
-                properties.append(p)
-            elif data_content_type == 'new apartment project':
-                child_properties = PageScraper.scrape_new_apartment_project(
-                    article)
-                for p in child_properties:
-                    properties.append(p)
-            elif data_content_type == 'residential land':
-                p = PageScraper.scrape_residential_land(article)
-                properties.append(p)
-            elif data_content_type == 'house land package':
-                p = PageScraper.scrape_house_land_package(article)
-                properties.append(p)
-            elif data_content_type == 'rural':
-                p = PageScraper.scrape_rural_property(article)
-                properties.append(p)
+            if memo is None:
+                properties.extend(scrape(article))
             else:
-                p = rep.DataContentTypeNotSupported(data_content_type)
-                properties.append(p)
+                properties.extend(memo.scrape_article(article, scrape))
         return properties
 
+    def scrape_article(article, content_types):
+        data_content_type = article['data-content-type']
+        handler = content_types.lookup(data_content_type)
+
+        if handler is None:
+            return [rep.DataContentTypeNotSupported(data_content_type)]
+        else:
+            scrape, many = handler
+            if many:
+                return scrape(article)
+            else:
+                return [scrape(article)]
+
+    def register_content_type(data_content_type, scrape, many=False):
+        # scrape(article) returns one property, or a list when many is set.
+        PageScraper.CONTENT_TYPES.register(data_content_type, (scrape, many))
+
+    def register_property_type(property_type_text, property_type):
+        PageScraper.PROPERTY_TYPES.register(property_type_text, property_type)
+
+    def unsupported_counts():
+        return {
+            'data-content-type':
+                PageScraper.CONTENT_TYPES.unsupported_counts(),
+            'property-type': PageScraper.PROPERTY_TYPES.unsupported_counts(),
+            'rural-property-type':
+                PageScraper.RURAL_PROPERTY_TYPES.unsupported_counts(),
+        }
+
     def populate_state_and_postcode(properties, state, postcode):
         for p in properties:
             p.state_and_postcode = rep.StateAndPostcode(state, postcode)
         return properties
 
     def scrape_residential_property(article):
-        listing_info = PageScraper.get_listing_info(article)
+        fields = ArticleFields.extract(article, ArticleFields.LISTING)
 
-        sale_type = PageScraper.residential_sale_type(listing_info, False)
-        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
-        property_type = PageScraper.extract_property_type(vcard_name_soup)
-        features = PageScraper.extract_property_features(listing_info)
+        sale_type = PageScraper.sale_type_from_fields(fields, False)
+        property_type = PageScraper.extract_property_type(
+            fields['vcard_name'])
+        features = PageScraper.parse_property_features(fields['features'])
         details = PageScraper.create_property_details(
             property_type, features)
-        address_text = PageScraper.get_address_text(article)
+        address_text = PageScraper.address_text_from_fields(fields)
         residential_property = rep.Property(sale_type, details, address_text)
         return residential_property
 
     def scrape_residential_land(article):
-        listing_info = PageScraper.get_listing_info(article)
+        fields = ArticleFields.extract(article, ArticleFields.LISTING)
 
-        sale_type = PageScraper.residential_sale_type(listing_info, False)
-        features = PageScraper.maybe_extract_property_features(listing_info)
-        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
-        property_type = PageScraper.extract_property_type(vcard_name_soup)
+        sale_type = PageScraper.sale_type_from_fields(fields, False)
+        features = PageScraper.maybe_parse_property_features(
+            fields['features'])
+        property_type = PageScraper.extract_property_type(
+            fields['vcard_name'])
         details = PageScraper.create_property_details(property_type, features)
-        address_text = PageScraper.get_address_text(article)
+        address_text = PageScraper.address_text_from_fields(fields)
         residential_land = rep.Property(sale_type, details, address_text)
         return residential_land
 
     def scrape_new_apartment_project(article):
-        project_wrapper = article.find(
-            'div', {'class': 'resultBodyWrapper projectWrapper rui-clearfix'}
-        )
-
-        children = article.find(
-            'div', {'class': 'project-child-listings'}
-        ).find_all(
+        children = ArticleFields.extract(
+            article, ArticleFields.PROJECT
+        )['child_listings'].find_all(
             'a', recursive=False
         )
 
         child_properties = []
         for child in children:
-            sale_type = PageScraper.new_project_sale_type(child)
-
-            features_soup = child.find(
-                'div', {'class': 'child'}
-            ).find(
-                'div', {'class': 'features'}
-            )
+            fields = ArticleFields.extract(
+                child, ArticleFields.PROJECT_CHILD)
+            sale_type = PageScraper.project_sale_type_from_fields(fields)
 
             property_type = PageScraper.extract_property_type(child)
-            features = PageScraper.extract_property_features(
-                features_soup)
+            features = PageScraper.parse_property_features(
+                fields['features'])
             details = PageScraper.create_property_details(
                 property_type, features)
-            address_text = PageScraper.get_address_text(child)
+            address_text = PageScraper.address_text_from_fields(fields)
 
             child_properties.append(
                 rep.Property(sale_type, details, address_text)
@@ -176,34 +523,33 @@ class PageScraper(object):
         return child_properties
 
     def scrape_house_land_package(article):
-        listing_info = PageScraper.get_listing_info(article)
+        fields = ArticleFields.extract(article, ArticleFields.LISTING)
 
-        sale_type = PageScraper.residential_sale_type(listing_info, True)
-        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
-        property_type = PageScraper.extract_property_type(vcard_name_soup)
-        features = PageScraper.extract_property_features(listing_info)
+        sale_type = PageScraper.sale_type_from_fields(fields, True)
+        property_type = PageScraper.extract_property_type(
+            fields['vcard_name'])
+        features = PageScraper.parse_property_features(fields['features'])
         details = PageScraper.create_property_details(
             property_type, features)
-        address_text = PageScraper.get_address_text(article)
+        address_text = PageScraper.address_text_from_fields(fields)
         residential_property = rep.Property(sale_type, details, address_text)
         return residential_property
 
     def scrape_rural_property(article):
-        listing_info = PageScraper.get_listing_info(article)
+        fields = ArticleFields.extract(article, ArticleFields.LISTING)
 
-        sale_type = PageScraper.residential_sale_type(listing_info, False)
-        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
+        sale_type = PageScraper.sale_type_from_fields(fields, False)
+        vcard_name_soup = fields['vcard_name']
 
         property_type_text = PageScraper.get_property_type_text(
             vcard_name_soup)
-        if property_type_text in (
-            'other', 'mixed+farming', 'cropping', 'horticulture', 'dairy',
-            'livestock', 'farmlet', 'viticulture'
-        ):
-            property_type = rep.Rural()
-        elif property_type_text in ('lifestyle',):
+        rural_type = PageScraper.RURAL_PROPERTY_TYPES.lookup(
+            property_type_text)
+        if rural_type is not None:
+            property_type = rural_type()
+        elif property_type_text in PageScraper.RURAL_NOT_SUPPORTED:
             property_type = rep.PropertyTypeNotSupported(
-                property_type_text, vcard_name_soup
+                property_type_text, str(vcard_name_soup)
             )
         else:
             raise ValueError(
@@ -211,10 +557,11 @@ class PageScraper(object):
                 property_type_text
             )
 
-        features = PageScraper.maybe_extract_property_features(listing_info)
+        features = PageScraper.maybe_parse_property_features(
+            fields['features'])
         details = PageScraper.create_property_details(
             property_type, features)
-        address_text = PageScraper.get_address_text(article)
+        address_text = PageScraper.address_text_from_fields(fields)
 
         residential_property = rep.Property(sale_type, details, address_text)
         return residential_property
@@ -226,41 +573,17 @@ class PageScraper(object):
 
     def extract_property_type(soup_with_href):
         property_type_text = PageScraper.get_property_type_text(soup_with_href)
+        property_type = PageScraper.PROPERTY_TYPES.lookup(property_type_text)
 
-        if property_type_text == 'house':
-            return rep.House()
-        elif (property_type_text == 'townhouse' or
-                property_type_text == 'villa' or
-                property_type_text == 'terrace'):
-            return rep.TownHouse()
-        elif (property_type_text == 'unit' or
-                property_type_text == 'apartment' or
-                property_type_text == 'flat'):
-            return rep.Unit()
-        elif property_type_text == 'serviced+apartment':
-            return rep.ServicedApartment()
-        elif property_type_text == 'studio':
-            return rep.Studio()
-        elif property_type_text == 'residential+land':
-            return rep.Land()
-        elif property_type_text == 'duplex+semi+detached':
-            return rep.Duplex()
-        elif property_type_text == 'retirement+living':
-            return rep.RetirementLiving()
-        elif property_type_text == 'unitblock':
-            return rep.UnitBlock()
-        elif property_type_text == 'acreage+semi+rural':
-            return rep.SemiRural()
-        elif property_type_text == 'other':
-            return rep.NotSpecified()
+        if property_type is not None:
+            return property_type()
         else:
+            # The markup rather than the tag, which can't be pickled.
             return rep.PropertyTypeNotSupported(
-                property_type_text, soup_with_href)
+                property_type_text, str(soup_with_href))
 
     def get_property_type_text(soup):
-        return re.search(
-            '^\/property-(\w+\+?\w*\+?\w*\+?\w*)', soup['href']
-        ).group(1)
+        return PageScraper.PROPERTY_TYPE_HREF.search(soup['href']).group(1)
 
     def find_vcard_name_soup(listing_info):
         return listing_info.find(
@@ -270,11 +593,14 @@ class PageScraper(object):
         )
 
     def maybe_extract_property_features(soup):
-        property_features = PageScraper.get_property_features_soup(soup)
-        if property_features is None:
+        return PageScraper.maybe_parse_property_features(
+            PageScraper.get_property_features_soup(soup))
+
+    def maybe_parse_property_features(features_soup):
+        if features_soup is None:
             return {}
         else:
-            return PageScraper.parse_property_features(property_features)
+            return PageScraper.parse_property_features(features_soup)
 
     def get_property_features_soup(soup):
         return soup.find(
@@ -298,8 +624,10 @@ class PageScraper(object):
     def feature_value_to_int(x, names, soup):
         if PageScraper.DIGITS_ONLY.match(x) is not None:
             return int(x)
-        elif PageScraper.APPROX_LAND_AREA.match(x) is not None:
-                return int(PageScraper.APPROX_LAND_AREA.match(x).group(1))
+
+        land_area_search = PageScraper.APPROX_LAND_AREA.match(x)
+        if land_area_search is not None:
+            return int(land_area_search.group(1))
         else:
             raise ValueError(
                 ('Feature value string not parsable, value: %s' % x) +
@@ -331,6 +659,17 @@ class PageScraper(object):
             sale_type_text, under_contract, off_plan)
         return sale_type
 
+    def sale_type_from_fields(fields, off_plan):
+        under_contract = PageScraper.check_searches_for_match(
+            [fields['any_type_text'], fields['price_text']],
+            PageScraper.UNDER_CONTRACT_REGEX
+        )
+        sale_type_text = PageScraper.choose_sale_type_text(
+            fields['price_text'], fields['type_text'],
+            fields['contact_agent'])
+        return PageScraper.deduce_sale_type(
+            sale_type_text, under_contract, off_plan)
+
     def search_for_price_text(property_stats):
         return property_stats.find(
             'p', {'class': 'priceText'}, recursive=False
@@ -349,7 +688,11 @@ class PageScraper(object):
         type_search = property_stats.find(
             'p', {'class': 'type'}, recursive=False
         )
+        return PageScraper.choose_sale_type_text(
+            price_search, type_search, contact_agent_search)
 
+    def choose_sale_type_text(price_search, type_search,
+                              contact_agent_search):
         if price_search is not None and price_search.has_attr("title"):
             return price_search['title']
         elif price_search is not None:
@@ -373,67 +716,175 @@ class PageScraper(object):
         sale_type = PageScraper.deduce_sale_type(price_text, False, False)
         return sale_type
 
+    def project_sale_type_from_fields(fields):
+        return PageScraper.deduce_sale_type(
+            fields['price'].get_text(), False, False)
+
     def deduce_sale_type(sale_text, under_contract, off_plan):
-        prices = PageScraper.extract_prices(sale_text, PageScraper.MIN_PRICE)
+        category, prices = PageScraper.classify_sale_text(
+            sale_text, PageScraper.MIN_PRICE)
 
         if off_plan:
             return rep.OffPlan(prices, under_contract=under_contract)
-        elif re.match('^(?i)auction', sale_text) is not None:
+        elif category == 'auction':
             return rep.Auction(under_contract=under_contract)
-        elif re.match('^(?i)tender', sale_text) is not None:
+        elif category == 'tender':
             return rep.Tender(under_contract=under_contract)
-        elif PageScraper.check_for_sale_by_negotiation(sale_text):
+        elif category == 'negotiation':
             return rep.Negotiation(under_contract=under_contract)
         elif prices is not None:
             return rep.PrivateTreaty(prices, under_contract=under_contract)
-        elif re.match('^(?i)contact agent', sale_text) is not None:
+        elif category == 'contact_agent':
             return rep.ContactAgent(under_contract)
         elif sale_text == 'UnableToFindSaleTypeText':
             return rep.UnableToFindSaleTypeText()
         else:
             return rep.SaleTypeParseFailed()
 
-    def check_for_sale_by_negotiation(sale_text):
-        if (re.match('(?i)(price )?by negotiation', sale_text) is not None or
-                re.match('(?i)by negotiaton', sale_text) is not None or
-                re.match('(?i)by negotation', sale_text) is not None):
-            # Found typos when scraping from the website
-            return True
+    def classify_sale_text(sale_text, min_price):
+        category_match = PageScraper.SALE_TEXT_CATEGORIES.match(sale_text)
+        if category_match is not None:
+            category = category_match.lastgroup
         else:
-            return False
+            category = None
+        return category, PageScraper.extract_prices(sale_text, min_price)
+
+    def classify_sale_texts(texts, min_price):
+        # classify_sale_text over every text, as parallel lists of category
+        # codes, see SALE_TEXT_CATEGORY_CODES, and prices.
+        texts = list(texts)
+        separator = PageScraper.BATCH_SEPARATOR
+        buffer = separator + separator.join(texts)
+        if not texts or buffer.count(separator) != len(texts):
+            classified = [
+                PageScraper.classify_sale_text(x, min_price) for x in texts]
+            return (
+                array.array('b', [
+                    PageScraper.SALE_TEXT_CATEGORY_CODES[x]
+                    for x, _ in classified]),
+                [x for _, x in classified]
+            )
+
+        text_at = {}
+        offset = 0
+        for i, text in enumerate(texts):
+            text_at[offset] = i
+            offset += len(text) + 1
+
+        categories = array.array('b', [-1]) * len(texts)
+        codes = PageScraper.SALE_TEXT_CATEGORY_CODES
+        for match in PageScraper.BATCH_SALE_TEXT_CATEGORIES.finditer(buffer):
+            categories[text_at[match.start()]] = codes[match.lastgroup]
+
+        # The separators are matched too, each one starts the next text.
+        prices = [None] * len(texts)
+        i = -1
+        dollars = others = None
+        for token in PageScraper.BATCH_PRICE.findall(buffer):
+            if token == separator:
+                if dollars:
+                    prices[i] = dollars
+                elif others:
+                    prices[i] = [x for x in others if x >= min_price] or None
+                i += 1
+                dollars = others = None
+            elif token[0] == '$':
+                if dollars is None:
+                    dollars = []
+                dollars.append(int(token[1:].replace(',', '')))
+            else:
+                if others is None:
+                    others = []
+                others.append(int(token.replace(',', '')))
+        if dollars:
+            prices[i] = dollars
+        elif others:
+            prices[i] = [x for x in others if x >= min_price] or None
+        return categories, prices
+
+    def deduce_sale_types(texts, under_contract_flags, off_plan_flags):
+        # deduce_sale_type over every text, as parallel arrays of codes, see
+        # SALE_TYPE_CODES, and prices. sale_types_from_codes makes the
+        # rep sale types.
+        texts = list(texts)
+        categories, prices = PageScraper.classify_sale_texts(
+            texts, PageScraper.MIN_PRICE)
+
+        codes = array.array('B')
+        for text, category, text_prices, under_contract, off_plan in zip(
+                texts, categories, prices, under_contract_flags,
+                off_plan_flags):
+            if off_plan:
+                code = 0
+            elif 0 <= category <= 2:
+                code = category + 1
+            elif text_prices is not None:
+                code = 4
+            elif category == 3:
+                code = 5
+            elif text == 'UnableToFindSaleTypeText':
+                code = 6
+            else:
+                code = 7
+            if under_contract:
+                code |= PageScraper.UNDER_CONTRACT_CODE
+            codes.append(code)
+        return codes, prices
+
+    def sale_types_from_codes(codes, prices):
+        sale_types = []
+        for code, code_prices in zip(codes, prices):
+            under_contract = bool(code & PageScraper.UNDER_CONTRACT_CODE)
+            code &= ~PageScraper.UNDER_CONTRACT_CODE
+            if code == 0:
+                sale_type = rep.OffPlan(code_prices, under_contract)
+            elif code == 1:
+                sale_type = rep.Auction(under_contract)
+            elif code == 2:
+                sale_type = rep.Tender(under_contract)
+            elif code == 3:
+                sale_type = rep.Negotiation(under_contract)
+            elif code == 4:
+                sale_type = rep.PrivateTreaty(code_prices, under_contract)
+            elif code == 5:
+                sale_type = rep.ContactAgent(under_contract)
+            elif code == 6:
+                sale_type = rep.UnableToFindSaleTypeText()
+            else:
+                sale_type = rep.SaleTypeParseFailed()
+            sale_types.append(sale_type)
+        return sale_types
+
+    def check_for_sale_by_negotiation(sale_text):
+        category_match = PageScraper.SALE_TEXT_CATEGORIES.match(sale_text)
+        return (category_match is not None and
+                category_match.lastgroup == 'negotiation')
 
     def extract_prices(price_text, min_price):
-        dollar_price_regex = '(\$\d+(,\d+)*)'
-        dollarless_price_regex = '(\d+(,\d+)*)'
-
-        if re.search(dollar_price_regex, price_text) is not None:
-            return PageScraper.text_to_prices(dollar_price_regex, price_text)
-        elif re.search(dollarless_price_regex, price_text) is not None:
-            prices = PageScraper.text_to_prices(
-                dollarless_price_regex, price_text)
+        price_strings = PageScraper.PRICE.findall(price_text)
+        dollar_prices = [x for x in price_strings if x.startswith('$')]
+
+        if len(dollar_prices) != 0:
+            return PageScraper.text_to_prices(dollar_prices)
+        else:
+            prices = PageScraper.text_to_prices(price_strings)
             prices = [x for x in prices if x >= min_price]
             if len(prices) != 0:
                 return prices
             else:
                 return None
-        else:
-            return None
 
     def check_for_missed_prices(price_text):
-        digits_regex = '(\d+,?\d*)'
-        if re.search(digits_regex, price_text) is not None:
-            digit_strings = re.findall(digits_regex, price_text)
-            numbers = [int(x.replace(',', ''))for x in digit_strings]
-            if any([x > 999 for x in numbers]):
-                print(
-                    'Note: Possible price will be missed: %s' % price_text
-                )
-
-    def text_to_prices(regex, price_text):
-        price_strings = re.findall(regex, price_text)
+        digit_strings = PageScraper.POSSIBLE_PRICE.findall(price_text)
+        numbers = [int(x.replace(',', '')) for x in digit_strings]
+        if any([x > 999 for x in numbers]):
+            PageScraper.EVENTS.event(
+                'missed_price', logging.WARNING, price_text)
+
+    def text_to_prices(price_strings):
         prices = [
             int(x.replace('$', '').replace(',', ''))
-            for x, _ in price_strings
+            for x in price_strings
         ]
         return prices
 
@@ -444,6 +895,9 @@ class PageScraper(object):
 
     def check_if_under_special(property_stats, regex):
         searches = PageScraper.under_special_searches(property_stats)
+        return PageScraper.check_searches_for_match(searches, regex)
+
+    def check_searches_for_match(searches, regex):
         tests = [PageScraper.maybe_check_for_match(x, regex) for x in searches]
         return any(tests)
 
@@ -474,6 +928,14 @@ class PageScraper(object):
     def get_address_text(article):
         return rep.AddressText(PageScraper.find_address_text(article))
 
+    def address_text_from_fields(fields):
+        if fields['photoviewer'] is not None:
+            return rep.AddressText(fields['photoviewer_img']['alt'])
+        elif fields['property_image'] is not None:
+            return rep.AddressText(fields['property_image_img']['alt'])
+        else:
+            raise RuntimeError('Could not find address text.')
+
     def find_address_text(article):
         photoviewer_search = article.find(
             'div', {'class': 'photoviewer'}
@@ -491,3 +953,14 @@ class PageScraper(object):
             return property_image_search.find('img', recursive=False)['alt']
         else:
             raise RuntimeError('Could not find address text.')
+
+
+# data-content-type to (scrape, many), the scrape functions have to be
+# defined before they can be registered.
+PageScraper.CONTENT_TYPES = TypeRegistry({
+    'residential': (PageScraper.scrape_residential_property, False),
+    'new apartment project': (PageScraper.scrape_new_apartment_project, True),
+    'residential land': (PageScraper.scrape_residential_land, False),
+    'house land package': (PageScraper.scrape_house_land_package, False),
+    'rural': (PageScraper.scrape_rural_property, False),
+})
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from scraper.page_pool import PageScrapeFailed
+from scraper.page_scraper import PageScraper
+from scraper.stream_extractor import StreamExtractor
+
+
+class ArticleScrapeFailed(object):
+    def __init__(self, data_content_type, listing_id, error_type, message,
+                 trace, item_id=None):
+        self.data_content_type = data_content_type
+        self.listing_id = listing_id
+        self.error_type = error_type
+        self.message = message
+        self.trace = trace
+        self.item_id = item_id
+
+    def summarise(self):
+        return 'Article %s (%s) failed with %s: %s' % (
+            self.listing_id, self.data_content_type, self.error_type,
+            self.message)
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.data_content_type == other.data_content_type and
+                self.listing_id == other.listing_id and
+                self.error_type == other.error_type and
+                self.message == other.message)
+
+
+class Quarantine(object):
+    # A directory of the pages and articles that raised while scraping.
+    # Each item is its markup, <item id>.html, and what went wrong,
+    # <item id>.json, with the item id a hash of the markup so a failure
+    # seen again just replaces its item. Once the scraping is fixed,
+    # replay scrapes the items again and removes the ones that now pass.
+    #
+    # Use one directory per scraper, replay does not know which scraper
+    # quarantined an item.
+    def __init__(self, directory):
+        self.directory = directory
+        # Articles quarantined by this process.
+        self.failures = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def scrape_article(self, article, scrape):
+        try:
+            return scrape(article)
+        except Exception as e:
+            return [self.article_failed(article, e)]
+
+    def article_failed(self, article, error):
+        self.failures += 1
+        trace = traceback.format_exc()
+        item_id = self.add('article', str(article), error, trace, {
+            'data_content_type': article.get('data-content-type'),
+            'listing_id': article.get('id'),
+        })
+        return ArticleScrapeFailed(
+            article.get('data-content-type'), article.get('id'),
+            type(error).__name__, str(error), trace, item_id)
+
+    def page_failed(self, page_num, html, error):
+        self.add('page', html, error, traceback.format_exc(),
+                 {'page_num': page_num})
+        return PageScrapeFailed.from_exception(page_num, error)
+
+    def item_id(kind, html):
+        return kind + '-' + hashlib.sha1(html.encode('utf-8')).hexdigest()
+
+    def add(self, kind, html, error, trace, info):
+        item_id = Quarantine.item_id(kind, html)
+        path = os.path.join(self.directory, item_id)
+        with open(path + '.html', 'w', encoding='utf-8') as f:
+            f.write(html)
+
+        info = dict(info, kind=kind, item_id=item_id,
+                    error_type=type(error).__name__, message=str(error),
+                    trace=trace, time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        # Written last, an item is only listed once its markup is in place.
+        with open(path + '.json.tmp', 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+        os.replace(path + '.json.tmp', path + '.json')
+        return item_id
+
+    def items(self):
+        items = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                with open(os.path.join(self.directory, name), 'r',
+                          encoding='utf-8') as f:
+                    items.append(json.load(f))
+        return items
+
+    def read_html(self, item_id):
+        path = os.path.join(self.directory, item_id + '.html')
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def remove(self, item_id):
+        path = os.path.join(self.directory, item_id)
+        os.remove(path + '.json')
+        os.remove(path + '.html')
+
+    def replay(self, scraper, parser=None):
+        # Returns the properties of the items that now scrape, and a
+        # failure entry for each one that still raises.
+        properties = []
+        for info in self.items():
+            html = self.read_html(info['item_id'])
+            try:
+                replayed = Quarantine.scrape_item(
+                    info['kind'], html, scraper, parser or scraper.PARSER)
+            except Exception as e:
+                if info['kind'] == 'article':
+                    failed = ArticleScrapeFailed(
+                        info['data_content_type'], info['listing_id'],
+                        type(e).__name__, str(e), traceback.format_exc(),
+                        info['item_id'])
+                else:
+                    failed = PageScrapeFailed.from_exception(
+                        info['page_num'], e)
+                self.add(info['kind'], html, e, failed.trace, dict(
+                    (k, v) for k, v in info.items()
+                    if k in ('data_content_type', 'listing_id', 'page_num')
+                ))
+                properties.append(failed)
+            else:
+                self.remove(info['item_id'])
+                properties.extend(replayed)
+        return properties
+
+    def scrape_item(kind, html, scraper, parser):
+        if kind != 'article':
+            return scraper.scrape_page(PageScraper.html_to_soup(html, parser))
+        if parser in PageScraper.STREAM_PARSERS:
+            articles = StreamExtractor.parse(
+                html, parser, fragment=True).articles[:1]
+        else:
+            articles = [PageScraper.html_to_soup(html, parser).find('article')]
+        return scraper.create_properties(articles)
@@ -1,40 +1,65 @@
+import array
+import logging
 import re
+from scraper.article_fields import ArticleFields
+from scraper.lazy_import import LazyImport
 from scraper.page_scraper import PageScraper
-import real_estate.real_estate_property as rep
+from scraper.type_registry import TypeRegistry
+
+rep = LazyImport.module('real_estate.real_estate_property')
 
 
 class RentalsScraper(object):
     MIN_PRICE = 50
-    UNDER_APPLICATION_REGEX = '.*(under application)(?i)'
-
-    def scrape_pages(htmls, quiet=False):
-        scrapings = []
+    UNDER_APPLICATION_REGEX = re.compile(
+        '.*(under application)', re.IGNORECASE)
+    PARSER = None
+    # Codes of deduce_rental_types, with UNDER_APPLICATION_CODE added when
+    # the listing is under application.
+    RENTAL_TYPE_CODES = (
+        'rental', 'negotiation', 'under_application',
+        'rental_type_parse_failed',
+    )
+    UNDER_APPLICATION_CODE = 0x80
 
-        if not quiet:
-            print('Scraping from %i pages.' % len(htmls))
+    def scrape_pages(htmls, quiet=False, parser=None, workers=None,
+                     chunksize=1, restrict=None, cache=None, memo=None,
+                     compact=False, quarantine=None):
+        with PageScraper.EVENTS.batch(quiet) as events:
+            events.log(logging.INFO, 'Scraping from %i pages.', len(htmls))
+            return list(RentalsScraper.iter_scrape_pages(
+                htmls, parser, workers, chunksize, restrict, cache, memo,
+                compact, quarantine
+            ))
 
-        for i, html in enumerate(htmls):
-            soup = PageScraper.html_to_soup(html)
-            scrapings.extend(RentalsScraper.scrape_page(soup))
-        return scrapings
+    def iter_scrape_pages(htmls, parser=None, workers=None, chunksize=1,
+                          restrict=None, cache=None, memo=None,
+                          compact=False, quarantine=None):
+        return PageScraper.iter_scrape_pages(
+            htmls, RentalsScraper.scrape_page, parser or RentalsScraper.PARSER,
+            workers, chunksize, restrict, cache, memo, compact, quarantine
+        )
 
-    def scrape_page(soup):
+    def scrape_page(soup, memo=None, quarantine=None):
         articles = PageScraper.find_articles(soup)
-        properties = RentalsScraper.create_properties(articles)
+        properties = RentalsScraper.create_properties(
+            articles, memo, quarantine)
         return properties
 
-    def create_properties(articles):
-        properties = []
-        for i, article in enumerate(articles):
-            data_content_type = article['data-content-type']
+    def create_properties(articles, memo=None, quarantine=None):
+        return PageScraper.create_properties_with(
+            articles, RentalsScraper.CONTENT_TYPES, memo, quarantine)
 
-            if data_content_type == 'rental':
-                residential = RentalsScraper.scrape_rental_property(article)
-                properties.append(residential)
-            else:
-                package = rep.DataContentTypeNotSupported(data_content_type)
-                properties.append(package)
-        return properties
+    def register_content_type(data_content_type, scrape, many=False):
+        RentalsScraper.CONTENT_TYPES.register(
+            data_content_type, (scrape, many))
+
+    def unsupported_counts():
+        return {
+            'data-content-type':
+                RentalsScraper.CONTENT_TYPES.unsupported_counts(),
+            'property-type': PageScraper.PROPERTY_TYPES.unsupported_counts(),
+        }
 
     def populate_state_and_postcode(properties, state, postcode):
         return PageScraper.populate_state_and_postcode(
@@ -42,14 +67,14 @@ class RentalsScraper(object):
     )
 
     def scrape_rental_property(article):
-        listing_info = PageScraper.get_listing_info(article)
-        sale_type = RentalsScraper.rental_sale_type(listing_info)
-        vcard_name_soup = PageScraper.find_vcard_name_soup(listing_info)
-        property_type = PageScraper.extract_property_type(vcard_name_soup)
-        features = PageScraper.extract_property_features(listing_info)
+        fields = ArticleFields.extract(article, ArticleFields.LISTING)
+        sale_type = RentalsScraper.rental_type_from_fields(fields)
+        property_type = PageScraper.extract_property_type(
+            fields['vcard_name'])
+        features = PageScraper.parse_property_features(fields['features'])
         details = PageScraper.create_property_details(
             property_type, features)
-        address_text = PageScraper.get_address_text(article)
+        address_text = PageScraper.address_text_from_fields(fields)
         residential_property = rep.Property(sale_type, details, address_text)
         return residential_property
 
@@ -62,20 +87,76 @@ class RentalsScraper(object):
             under_application)
         return sale_type
 
+    def rental_type_from_fields(fields):
+        under_application = PageScraper.check_searches_for_match(
+            [fields['any_type_text'], fields['price_text']],
+            RentalsScraper.UNDER_APPLICATION_REGEX
+        )
+        sale_type_text = PageScraper.choose_sale_type_text(
+            fields['price_text'], fields['type_text'],
+            fields['contact_agent'])
+        return RentalsScraper.deduce_rental_type(
+            sale_type_text, under_application)
+
     def check_if_under_application(property_stats):
         return PageScraper.check_if_under_special(
             property_stats, RentalsScraper.UNDER_APPLICATION_REGEX
         )
 
     def deduce_rental_type(sale_text, under_application):
-        prices = PageScraper.extract_prices(
+        category, prices = PageScraper.classify_sale_text(
             sale_text, RentalsScraper.MIN_PRICE)
 
         if prices is not None:
             return rep.Rental(prices, under_application)
-        elif PageScraper.check_for_sale_by_negotiation(sale_text):
+        elif category == 'negotiation':
             return rep.RentalNegotiation(under_application)
         elif prices is None and under_application is True:
             return rep.RentalUnderApplication()
         else:
             return rep.RentalTypeParseFailed(sale_text)
+
+    def deduce_rental_types(texts, under_application_flags):
+        # deduce_rental_type over every text, as parallel arrays of codes,
+        # see RENTAL_TYPE_CODES, and prices.
+        categories, prices = PageScraper.classify_sale_texts(
+            texts, RentalsScraper.MIN_PRICE)
+        negotiation = PageScraper.SALE_TEXT_CATEGORY_CODES['negotiation']
+
+        codes = array.array('B')
+        for category, text_prices, under_application in zip(
+                categories, prices, under_application_flags):
+            if text_prices is not None:
+                code = 0
+            elif category == negotiation:
+                code = 1
+            elif under_application:
+                code = 2
+            else:
+                code = 3
+            if under_application:
+                code |= RentalsScraper.UNDER_APPLICATION_CODE
+            codes.append(code)
+        return codes, prices
+
+    def rental_types_from_codes(codes, prices, texts):
+        rental_types = []
+        for code, code_prices, text in zip(codes, prices, texts):
+            under_application = bool(
+                code & RentalsScraper.UNDER_APPLICATION_CODE)
+            code &= ~RentalsScraper.UNDER_APPLICATION_CODE
+            if code == 0:
+                rental_type = rep.Rental(code_prices, under_application)
+            elif code == 1:
+                rental_type = rep.RentalNegotiation(under_application)
+            elif code == 2:
+                rental_type = rep.RentalUnderApplication()
+            else:
+                rental_type = rep.RentalTypeParseFailed(text)
+            rental_types.append(rental_type)
+        return rental_types
+
+
+RentalsScraper.CONTENT_TYPES = TypeRegistry({
+    'rental': (RentalsScraper.scrape_rental_property, False),
+})
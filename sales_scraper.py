@@ -1,23 +1,36 @@
+import logging
 from scraper.page_scraper import PageScraper
 
 
 class SalesScraper(object):
-    def scrape_pages(htmls, quiet=False):
-        scrapings = []
+    PARSER = None
 
-        if not quiet:
-            print('Scraping from %i pages.' % len(htmls))
+    def scrape_pages(htmls, quiet=False, parser=None, workers=None,
+                     chunksize=1, restrict=None, cache=None, memo=None,
+                     compact=False, quarantine=None):
+        with PageScraper.EVENTS.batch(quiet) as events:
+            events.log(logging.INFO, 'Scraping from %i pages.', len(htmls))
+            return list(SalesScraper.iter_scrape_pages(
+                htmls, parser, workers, chunksize, restrict, cache, memo,
+                compact, quarantine
+            ))
 
-        for i, html in enumerate(htmls):
-            soup = PageScraper.html_to_soup(html)
-            scrapings.extend(SalesScraper.scrape_page(soup))
-        return scrapings
+    def iter_scrape_pages(htmls, parser=None, workers=None, chunksize=1,
+                          restrict=None, cache=None, memo=None,
+                          compact=False, quarantine=None):
+        return PageScraper.iter_scrape_pages(
+            htmls, SalesScraper.scrape_page, parser or SalesScraper.PARSER,
+            workers, chunksize, restrict, cache, memo, compact, quarantine
+        )
 
-    def scrape_page(soup):
+    def scrape_page(soup, memo=None, quarantine=None):
         articles = PageScraper.find_articles(soup)
-        properties = PageScraper.create_properties(articles)
+        properties = SalesScraper.create_properties(articles, memo, quarantine)
         return properties
 
+    def create_properties(articles, memo=None, quarantine=None):
+        return PageScraper.create_properties(articles, memo, quarantine)
+
     def populate_state_and_postcode(properties, state, postcode):
         return PageScraper.populate_state_and_postcode(
             properties, state, postcode
@@ -0,0 +1,312 @@
+import argparse
+import itertools
+import os
+import pickle
+import signal
+import socket
+import time
+from scraper.page_cache import PageCache
+from scraper.page_pool import PagePool, PageScrapeFailed
+from scraper.page_scraper import PageScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.sqlite_file import SqliteFile
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ScrapeJob(object):
+    def __init__(self, job_id, scraper, html, state, postcode, page_num,
+                 attempts=0, claim=None):
+        self.job_id = job_id
+        self.scraper = scraper
+        self.html = html
+        self.state = state
+        self.postcode = postcode
+        self.page_num = page_num
+        self.attempts = attempts
+        self.claim = claim
+
+    def summarise(self):
+        return 'Job %i, %s page %i for %s %s' % (
+            self.job_id, self.scraper, self.page_num, self.state,
+            self.postcode)
+
+
+class JobResult(object):
+    def __init__(self, job_id, scraper, state, postcode, page_num,
+                 properties):
+        self.job_id = job_id
+        self.scraper = scraper
+        self.state = state
+        self.postcode = postcode
+        self.page_num = page_num
+        self.properties = properties
+
+
+class JobQueue(object):
+    # A queue of page jobs in SQLite, shared by the processes that put
+    # pages and the ScrapeWorkers that scrape them. A job is claimed by a
+    # worker, and deleted in the transaction that writes its result, so a
+    # page is scraped into exactly one result even if a worker dies: its
+    # claims go back to pending once older than claim_timeout.
+    #
+    # There is backpressure both ways: put waits, then raises QueueFull,
+    # while max_jobs pages are unscraped, and workers claim nothing while
+    # max_results results have not been taken.
+    SCRAPERS = ('sales', 'rentals')
+    MAX_JOBS = 1000
+    MAX_RESULTS = 1000
+    CLAIM_TIMEOUT = 600
+    POLL_INTERVAL = 0.1
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        'id INTEGER PRIMARY KEY AUTOINCREMENT, scraper TEXT, '
+        'html TEXT, state TEXT, postcode INTEGER, '
+        'page_num INTEGER, attempts INTEGER DEFAULT 0, '
+        'claim TEXT, claimed_at REAL)',
+        'CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (claim)',
+        'CREATE TABLE IF NOT EXISTS results ('
+        'job_id INTEGER PRIMARY KEY, scraper TEXT, state TEXT, '
+        'postcode INTEGER, page_num INTEGER, properties BLOB)',
+    )
+
+    def __init__(self, file_path, max_jobs=MAX_JOBS, max_results=MAX_RESULTS,
+                 claim_timeout=CLAIM_TIMEOUT):
+        self.file_path = file_path
+        self.max_jobs = max_jobs
+        self.max_results = max_results
+        self.claim_timeout = claim_timeout
+        self.connection = None
+        self.claims = itertools.count()
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = SqliteFile.connect(
+                self.file_path, JobQueue.SCHEMA, wal=True)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def put(self, scraper, html, state, postcode, page_num=1, timeout=None):
+        # Waits up to timeout seconds, forever when None, for room.
+        if scraper not in JobQueue.SCRAPERS:
+            raise ValueError('Scraper not supported: %s, use one of: %s' % (
+                scraper, ', '.join(JobQueue.SCRAPERS)))
+
+        connection = self.connect()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with connection:
+                # Counted and inserted in one statement, so producers can
+                # not overfill the queue between them.
+                cursor = connection.execute(
+                    'INSERT INTO jobs '
+                    '(scraper, html, state, postcode, page_num) '
+                    'SELECT ?, ?, ?, ?, ? '
+                    'WHERE (SELECT COUNT(*) FROM jobs) < ?',
+                    (scraper, html, state, postcode, page_num,
+                     self.max_jobs)
+                )
+            if cursor.rowcount == 1:
+                return cursor.lastrowid
+            if deadline is not None and time.monotonic() >= deadline:
+                raise QueueFull(
+                    'The queue has %i unscraped pages.' % self.max_jobs)
+            time.sleep(JobQueue.POLL_INTERVAL)
+
+    def claim(self, worker_id, n):
+        connection = self.connect()
+        claim = '%s/%i' % (worker_id, next(self.claims))
+        with connection:
+            if self.count_results() >= self.max_results:
+                return []
+            connection.execute(
+                'UPDATE jobs SET claim = ?, claimed_at = ?, '
+                'attempts = attempts + 1 WHERE id IN ('
+                'SELECT id FROM jobs WHERE claim IS NULL ORDER BY id '
+                'LIMIT ?)',
+                (claim, time.time(), n)
+            )
+            rows = connection.execute(
+                'SELECT id, scraper, html, state, postcode, page_num, '
+                'attempts FROM jobs WHERE claim = ? ORDER BY id', (claim,)
+            ).fetchall()
+        return [ScrapeJob(*row, claim=claim) for row in rows]
+
+    def complete(self, results):
+        # results are (job, properties), a job whose claim was lost to
+        # requeue_stale is left to its new worker.
+        rows = [
+            (job.job_id, job.scraper, job.state, job.postcode,
+             job.page_num, PagePool.dumps_page(job.page_num, properties))
+            for job, properties in results
+        ]
+        connection = self.connect()
+        written = 0
+        with connection:
+            for row, (job, _) in zip(rows, results):
+                cursor = connection.execute(
+                    'DELETE FROM jobs WHERE id = ? AND claim = ?',
+                    (job.job_id, job.claim)
+                )
+                if cursor.rowcount == 1:
+                    connection.execute(
+                        'INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)', row)
+                    written += 1
+        return written
+
+    def release(self, jobs):
+        connection = self.connect()
+        with connection:
+            connection.executemany(
+                'UPDATE jobs SET claim = NULL, claimed_at = NULL, '
+                'attempts = attempts - 1 WHERE id = ? AND claim = ?',
+                [(job.job_id, job.claim) for job in jobs]
+            )
+
+    def requeue_stale(self):
+        connection = self.connect()
+        with connection:
+            cursor = connection.execute(
+                'UPDATE jobs SET claim = NULL, claimed_at = NULL '
+                'WHERE claim IS NOT NULL AND claimed_at < ?',
+                (time.time() - self.claim_timeout,)
+            )
+        return cursor.rowcount
+
+    def take_results(self, n=None):
+        connection = self.connect()
+        with connection:
+            rows = connection.execute(
+                'SELECT * FROM results ORDER BY job_id LIMIT ?',
+                (-1 if n is None else n,)
+            ).fetchall()
+            connection.executemany(
+                'DELETE FROM results WHERE job_id = ?',
+                [(row[0],) for row in rows]
+            )
+        return [
+            JobResult(*row[:5], properties=pickle.loads(row[5]))
+            for row in rows
+        ]
+
+    def count_results(self):
+        return self.connect().execute(
+            'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def counts(self):
+        connection = self.connect()
+        pending, claimed = connection.execute(
+            'SELECT COALESCE(SUM(claim IS NULL), 0), '
+            'COALESCE(SUM(claim IS NOT NULL), 0) FROM jobs'
+        ).fetchone()
+        return {
+            'pending': pending,
+            'claimed': claimed,
+            'results': self.count_results(),
+        }
+
+
+class ScrapeWorker(object):
+    # Scrapes the jobs of a JobQueue in a long lived process, so the
+    # imports, the parser and the page cache stay warm from one batch to
+    # the next. Jobs are claimed batch_size at a time and each batch's
+    # results are written in one transaction.
+    #
+    # stop, which handle_signals hooks to SIGTERM and SIGINT, drains the
+    # worker: the page being scraped is finished, the batch so far is
+    # written, and the jobs claimed but not started are released.
+    SCRAPERS = {'sales': SalesScraper, 'rentals': RentalsScraper}
+    BATCH_SIZE = 20
+    POLL_INTERVAL = 0.5
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, queue, parser=None, cache=None, quarantine=None,
+                 batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL,
+                 worker_id=None):
+        self.queue = queue
+        self.parser = parser
+        self.cache = cache
+        self.quarantine = quarantine
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or '%s:%i' % (
+            socket.gethostname(), os.getpid())
+        self.stopping = False
+        self.scraped = 0
+
+    def stop(self, *signal_args):
+        self.stopping = True
+
+    def handle_signals(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run(self, exit_when_idle=False):
+        # Returns the number of pages scraped by this run.
+        scraped = self.scraped
+        while not self.stopping:
+            jobs = self.queue.claim(self.worker_id, self.batch_size)
+            if jobs:
+                self.run_batch(jobs)
+            elif self.queue.requeue_stale() == 0:
+                if exit_when_idle:
+                    break
+                time.sleep(self.poll_interval)
+        return self.scraped - scraped
+
+    def run_batch(self, jobs):
+        results = []
+        try:
+            for job in jobs:
+                if self.stopping:
+                    break
+                results.append((job, self.scrape(job)))
+        finally:
+            self.queue.complete(results)
+            self.queue.release(jobs[len(results):])
+            PageScraper.flush_events()
+        self.scraped += len(results)
+
+    def scrape(self, job):
+        if job.attempts > ScrapeWorker.MAX_ATTEMPTS:
+            # The page took down the workers that claimed it before.
+            return [PageScrapeFailed(
+                job.page_num, 'TooManyAttempts',
+                'Claimed %i times without a result.' % (job.attempts - 1),
+                '')]
+
+        scraper = ScrapeWorker.SCRAPERS[job.scraper]
+        try:
+            properties = list(scraper.iter_scrape_pages(
+                [job.html], self.parser, cache=self.cache,
+                quarantine=self.quarantine))
+        except Exception as e:
+            return [PageScrapeFailed.from_exception(job.page_num, e)]
+        return scraper.populate_state_and_postcode(
+            properties, job.state, job.postcode)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Scrape the pages put on a job queue until stopped.')
+    parser.add_argument('queue', help='The job queue SQLite file.')
+    parser.add_argument('--parser', default=None)
+    parser.add_argument('--cache', default=None, help='A PageCache file.')
+    parser.add_argument('--batch-size', type=int,
+                        default=ScrapeWorker.BATCH_SIZE)
+    args = parser.parse_args()
+
+    worker = ScrapeWorker(
+        JobQueue(args.queue), args.parser,
+        PageCache(args.cache) if args.cache else None,
+        batch_size=args.batch_size
+    )
+    worker.handle_signals()
+    worker.run()
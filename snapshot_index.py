@@ -0,0 +1,170 @@
+import json
+from scraper.lazy_import import LazyImport
+from scraper.sqlite_file import SqliteFile
+
+rep = LazyImport.module('real_estate.real_estate_property')
+
+
+class ListingChange(object):
+    # kind is one of SnapshotIndex.CHANGES. previous is the stored
+    # (status, prices) of the listing, None when added, and property is
+    # None when removed.
+    def __init__(self, kind, key, property, previous):
+        self.kind = kind
+        self.key = key
+        self.property = property
+        self.previous = previous
+
+    def summarise(self):
+        return '%s: %s' % (self.kind, ', '.join(str(x) for x in self.key))
+
+    def __eq__(self, other):
+        return (type(self) is type(other) and
+                self.kind == other.kind and
+                self.key == other.key and
+                self.previous == other.previous)
+
+
+class SnapshotIndex(object):
+    # The listings seen by the last scrape of each search, e.g. sales in
+    # act 2600, kept in SQLite as a row per listing of its status and
+    # prices, keyed by address text, state, postcode and property type.
+    # iter_changes compares the properties of a new scrape to it as they
+    # arrive and yields only what changed, the index being updated to
+    # match. Listings of the search that were not seen again are yielded
+    # as removed at the end, unless a page or article failed, when it can
+    # not be told.
+    CHANGES = ('added', 'removed', 'price_changed', 'status_changed')
+    STATUS_FLAGS = ('under_contract', 'under_application')
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS listings ('
+        'search TEXT, key TEXT, status TEXT, prices TEXT, '
+        'run INTEGER, PRIMARY KEY (search, key))',
+        'CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)',
+    )
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = SqliteFile.connect(
+                self.file_path, SnapshotIndex.SCHEMA)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def listing_key(p):
+        state_and_postcode = p.state_and_postcode
+        return (
+            p.address_text.string,
+            getattr(state_and_postcode, 'state', None),
+            getattr(state_and_postcode, 'postcode', None),
+            type(p.details.property_type).__name__,
+        )
+
+    def status(sale_type):
+        flags = [
+            name for name in SnapshotIndex.STATUS_FLAGS
+            if getattr(sale_type, name, False)
+        ]
+        return ':'.join([type(sale_type).__name__] + flags)
+
+    def prices(sale_type):
+        prices = getattr(sale_type, 'prices', None)
+        return None if prices is None else list(prices)
+
+    def next_run(self):
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'run'").fetchone()
+        run = 1 if row is None else row[0] + 1
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('run', ?)", (run,))
+        return run
+
+    def scrape_changes(self, scraper, htmls, state, postcode, **kwargs):
+        # kwargs are those of scraper.iter_scrape_pages.
+        properties = SnapshotIndex.with_state_and_postcode(
+            scraper.iter_scrape_pages(htmls, **kwargs), state, postcode)
+        return self.iter_changes(
+            properties, '%s/%s/%s' % (scraper.__name__, state, postcode))
+
+    def with_state_and_postcode(properties, state, postcode):
+        for p in properties:
+            if isinstance(p, rep.Property):
+                p.state_and_postcode = rep.StateAndPostcode(state, postcode)
+            yield p
+
+    def iter_changes(self, properties, search):
+        # Changes are committed once properties is exhausted, a run that
+        # is abandoned part way leaves the index as it was.
+        connection = self.connect()
+        try:
+            run = self.next_run()
+            complete = True
+            for p in properties:
+                if not isinstance(p, rep.Property):
+                    # PageScrapeFailed and ArticleScrapeFailed.
+                    complete = complete and not hasattr(p, 'error_type')
+                    continue
+                yield from self.update(p, search, run)
+            if complete:
+                yield from self.remove_unseen(search, run)
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+    def update(self, p, search, run):
+        key = SnapshotIndex.listing_key(p)
+        row_key = json.dumps(key)
+        status = SnapshotIndex.status(p.sale_type)
+        prices = json.dumps(SnapshotIndex.prices(p.sale_type))
+        row = self.connection.execute(
+            'SELECT status, prices, run FROM listings '
+            'WHERE search = ? AND key = ?', (search, row_key)
+        ).fetchone()
+        if row is not None and row[2] == run:
+            # The same listing twice in one scrape.
+            return []
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?)',
+            (search, row_key, status, prices, run)
+        )
+        if row is None:
+            return [ListingChange('added', key, p, None)]
+
+        previous = (row[0], json.loads(row[1]))
+        changes = []
+        if row[1] != prices:
+            changes.append(ListingChange('price_changed', key, p, previous))
+        if row[0] != status:
+            changes.append(ListingChange('status_changed', key, p, previous))
+        return changes
+
+    def remove_unseen(self, search, run):
+        rows = self.connection.execute(
+            'SELECT key, status, prices FROM listings '
+            'WHERE search = ? AND run < ?', (search, run)
+        ).fetchall()
+        self.connection.execute(
+            'DELETE FROM listings WHERE search = ? AND run < ?',
+            (search, run))
+        for key, status, prices in rows:
+            yield ListingChange(
+                'removed', tuple(json.loads(key)), None,
+                (status, json.loads(prices)))
+
+    def count(self, search=None):
+        connection = self.connect()
+        if search is None:
+            return connection.execute(
+                'SELECT COUNT(*) FROM listings').fetchone()[0]
+        return connection.execute(
+            'SELECT COUNT(*) FROM listings WHERE search = ?', (search,)
+        ).fetchone()[0]
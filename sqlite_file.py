@@ -0,0 +1,22 @@
+import os
+import sqlite3
+
+
+class SqliteFile(object):
+    # Opens the SQLite files of PageCache, SnapshotIndex, JobQueue and
+    # LeaseTable. The file's directory is made and its schema, CREATE ...
+    # IF NOT EXISTS statements, run in one transaction, so a new file is
+    # ready to use. wal suits a file shared by several processes.
+    TIMEOUT = 30
+
+    def connect(file_path, schema, wal=False):
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(file_path, timeout=SqliteFile.TIMEOUT)
+        if wal:
+            connection.execute('PRAGMA journal_mode=WAL')
+        with connection:
+            for statement in schema:
+                connection.execute(statement)
+        return connection
@@ -0,0 +1,332 @@
+import functools
+import html.parser
+import re
+from scraper.article_fields import ArticleFields
+from scraper.stream_soup import StreamSoup
+
+
+class StreamPage(object):
+    # What StreamExtractor keeps of a results page: its articles, the
+    # ROLES that were seen, which PageScraper.check_for_no_results reads,
+    # and the '#resultsInfo' paragraph.
+    def __init__(self):
+        self.articles = []
+        self.seen = set()
+        self.results_info = None
+
+    def results_info_text(self):
+        if self.results_info is None:
+            raise RuntimeError('HTML not understood.')
+        return self.results_info.get_text()
+
+
+class HtmlParserEvents(html.parser.HTMLParser):
+    # Feeds a StreamExtractor from html.parser, and gives it the source
+    # offsets of tags so that it can keep the markup of articles.
+    def __init__(self, extractor, html):
+        super().__init__(convert_charrefs=True)
+        self.extractor = extractor
+        self.html = html
+        self.line_starts = None
+        extractor.source = self
+
+    def source_offset(self):
+        if self.line_starts is None:
+            self.line_starts = [0]
+            self.line_starts.extend(
+                x.end() for x in re.finditer('\n', self.html))
+        line, column = self.getpos()
+        return self.line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        self.extractor.start(tag, dict(
+            (key, '' if value is None else value) for key, value in attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.extractor.end(tag)
+
+    def handle_endtag(self, tag):
+        self.extractor.end(tag)
+
+    def handle_data(self, data):
+        self.extractor.data(data)
+
+
+class StreamExtractor(object):
+    # A second extraction engine, parser 'stream' (html.parser events) or
+    # 'stream.lxml' (an lxml parser target), that never builds a tree. The
+    # start, end and data events of the page drive a stack of open tags,
+    # and only the tags the scrape functions read are kept, as StreamSoup:
+    # each article's ArticleFields for its rule sets are filled in as it
+    # streams by, the same rules matched the same way as by
+    # ArticleFields.extract, so the scrape functions run unchanged and
+    # return the same properties.
+    #
+    # Content types registered with scrape functions that find in the
+    # article themselves need a tree parser.
+
+    # (tag, id) to (role, the role of the parent, or of an ancestor when
+    # not direct, direct), the page structure PageScraper checks. Only the
+    # first tag of a role counts, as for a find.
+    ROLES = {
+        ('body', 'searchResults'): ('page', None, False),
+        ('div', 'DSContents'): ('ds_contents', 'page', False),
+        ('form', 'searchResultsForm'): (
+            'search_results_form', 'ds_contents', True),
+        ('div', 'noresults'): ('no_results', 'search_results_form', True),
+        ('div', 'results'): ('results', 'ds_contents', True),
+        ('div', 'resultsInfo'): ('results_info', 'results', False),
+        ('div', 'searchResultsTbl'): ('results_table', 'results', False),
+    }
+    # data-content-type to the rule sets streamed for its articles, others
+    # get ARTICLE_RULES.
+    CONTENT_TYPE_RULES = {
+        'new apartment project': (ArticleFields.PROJECT,),
+    }
+    ARTICLE_RULES = (ArticleFields.LISTING,)
+    # The fields whose text is read.
+    TEXT_FIELDS = frozenset([
+        'price_text', 'type_text', 'any_type_text', 'contact_agent', 'price',
+    ])
+    # Field to (names of the tags below it kept for find_all, direct
+    # children only). Kept tags keep their text, unless they have
+    # CHILD_RULES.
+    FIND_ALL = {
+        'features': (('dt', 'dd'), False),
+        'child_listings': (('a',), True),
+    }
+    # Field to the rule sets streamed for each of its kept tags.
+    CHILD_RULES = {
+        'child_listings': (ArticleFields.PROJECT_CHILD,),
+    }
+    FEED_SIZE = 64 * 1024
+    ARTICLE_END_TAG = re.compile(r'</article\s*>', re.IGNORECASE)
+    VOID_ELEMENTS = frozenset([
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+        'keygen', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+    ])
+
+    def __init__(self, fragment=False):
+        # A fragment's articles are its outermost article tags, a page's
+        # are the children of div#searchResultsTbl.
+        self.fragment = fragment
+        self.page = StreamPage()
+        self.source = None
+        # Open tags as (name, role, contexts, nodes), where contexts are
+        # (fields, rules, scopes, parent fields) for the tag's children, as
+        # ArticleFields.walk_bs4 passes them down, and nodes are the kept
+        # tags that end with it.
+        self.stack = []
+        self.roles = set()
+        self.text_nodes = []
+        # (node, depth, direct, child rules)
+        self.collectors = []
+        self.article = None
+        self.article_start = None
+
+    def parse(html, parser='stream', fragment=False):
+        # The html is fed in pieces, so the parsers never hold a copy of
+        # the whole page.
+        extractor = StreamExtractor(fragment)
+        if parser == 'stream.lxml':
+            import lxml.etree
+            events = lxml.etree.HTMLParser(target=extractor)
+        elif parser == 'stream':
+            events = HtmlParserEvents(extractor, html)
+        else:
+            raise ValueError('Not a stream parser: %s' % parser)
+
+        for i in range(0, len(html), StreamExtractor.FEED_SIZE):
+            events.feed(html[i:i + StreamExtractor.FEED_SIZE])
+        events.close()
+        page = extractor.close()
+        if parser == 'stream.lxml':
+            StreamExtractor.defer_markup(page, html, fragment)
+        return page
+
+    def defer_markup(page, html, fragment):
+        # lxml gives no source offsets, so the markup of the articles, only
+        # wanted to quarantine one, comes from streaming the page again
+        # with html.parser, once, when the first is asked for.
+        markups = []
+
+        def markup(i):
+            if not markups:
+                markups.extend(x.markup for x in StreamExtractor.parse(
+                    html, 'stream', fragment).articles)
+            return markups[i] if i < len(markups) else None
+
+        for i, article in enumerate(page.articles):
+            article.markup_source = functools.partial(markup, i)
+
+    def start(self, name, attrs):
+        parent = self.stack[-1] if self.stack else None
+        role = None
+        nodes = ()
+        if self.article is not None:
+            contexts, nodes = self.start_in_article(name, attrs, parent[2])
+        else:
+            contexts = ()
+            element_id = attrs.get('id')
+            if element_id is not None:
+                role = self.start_role(name, element_id, parent)
+            if name == 'article':
+                if self.fragment or (parent is not None and
+                                     parent[1] == 'results_table'):
+                    contexts, nodes = self.start_article(name, attrs)
+            elif (name == 'p' and 'results_info' in self.roles and
+                    self.page.results_info is None):
+                self.page.results_info = StreamSoup(name, attrs, True)
+                nodes = (self.page.results_info,)
+
+        if name in StreamExtractor.VOID_ELEMENTS:
+            return
+        for node in nodes:
+            if node.strings is not None:
+                self.text_nodes.append(node)
+        if role is not None:
+            self.roles.add(role)
+        self.stack.append((name, role, contexts, nodes))
+
+    def start_role(self, name, element_id, parent):
+        entry = StreamExtractor.ROLES.get((name, element_id))
+        if entry is None:
+            return None
+        role, required, direct = entry
+        if role in self.page.seen:
+            return None
+        if required is not None and not (
+                (parent is not None and parent[1] == required) if direct
+                else required in self.roles):
+            return None
+        self.page.seen.add(role)
+        return role
+
+    def start_article(self, name, attrs):
+        article = StreamSoup(name, attrs)
+        self.article = article
+        if self.source is not None:
+            self.article_start = self.source.source_offset()
+        self.page.articles.append(article)
+        rule_sets = StreamExtractor.CONTENT_TYPE_RULES.get(
+            attrs.get('data-content-type'), StreamExtractor.ARTICLE_RULES)
+        return self.root_contexts(article, rule_sets), (article,)
+
+    def root_contexts(self, node, rule_sets):
+        contexts = []
+        for rules in rule_sets:
+            fields = ArticleFields.for_rules(rules)
+            node.rule_fields.append((rules, fields))
+            contexts.append((fields, rules, frozenset(), ()))
+        return contexts
+
+    def start_in_article(self, name, attrs, parent_contexts):
+        # The children's contexts are the parent's unless a context found
+        # a field here, is finished, or has parent fields to drop.
+        text_fields = StreamExtractor.TEXT_FIELDS
+        matches = []
+        keep_text = False
+        contexts = None
+        for i, context in enumerate(parent_contexts):
+            fields, rules, scopes, parent_fields = context
+            if len(fields.nodes) == fields.wanted:
+                new_context = None
+            else:
+                fields.visits += 1
+                found = ()
+                candidates = rules.get(name)
+                if candidates is not None:
+                    found = fields.match(
+                        attrs.get('class'), candidates, scopes, parent_fields)
+                if found:
+                    matches.append((fields, found))
+                    keep_text = keep_text or not text_fields.isdisjoint(found)
+                    new_context = (fields, rules, scopes.union(found), found)
+                elif parent_fields:
+                    new_context = (fields, rules, scopes, ())
+                else:
+                    new_context = context
+            if new_context is not context and contexts is None:
+                contexts = list(parent_contexts[:i])
+            if contexts is not None and new_context is not None:
+                contexts.append(new_context)
+        if contexts is None:
+            contexts = parent_contexts
+
+        kept_by = [
+            (node, child_rules)
+            for node, depth, direct, child_rules in self.collectors
+            if name in node.kept and (
+                not direct or depth == len(self.stack) - 1)
+        ] if self.collectors else ()
+        if not matches and not kept_by:
+            return contexts, ()
+
+        node = StreamSoup(name, attrs, keep_text or any(
+            not child_rules for _, child_rules in kept_by))
+        for fields, found in matches:
+            for field in found:
+                fields.nodes[field] = node
+                self.start_collector(node, field)
+        for collector, child_rules in kept_by:
+            collector.kept[name].append(node)
+            if child_rules:
+                contexts = list(contexts)
+                contexts.extend(self.root_contexts(node, child_rules))
+        return contexts, (node,)
+
+    def start_collector(self, node, field):
+        find_all = StreamExtractor.FIND_ALL.get(field)
+        if find_all is not None:
+            names, direct = find_all
+            for name in names:
+                node.kept[name] = []
+            self.collectors.append((
+                node, len(self.stack), direct,
+                StreamExtractor.CHILD_RULES.get(field, ())))
+
+    def end(self, name):
+        if name in StreamExtractor.VOID_ELEMENTS:
+            return
+        # As bs4, an end tag closes the last open tag of its name and the
+        # tags left open inside it, and is ignored when none is open.
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == name:
+                break
+        else:
+            return
+        while len(self.stack) > i:
+            self.pop()
+
+    def pop(self):
+        name, role, contexts, nodes = self.stack.pop()
+        if role is not None:
+            self.roles.discard(role)
+        for node in nodes:
+            if node.strings is not None:
+                self.text_nodes.remove(node)
+            if node.kept:
+                self.collectors = [
+                    x for x in self.collectors if x[0] is not node]
+            if node is self.article:
+                self.end_article()
+
+    def end_article(self):
+        if self.source is not None:
+            html = self.source.html
+            end = self.source.source_offset()
+            end_tag = StreamExtractor.ARTICLE_END_TAG.match(html, end)
+            if end_tag is not None:
+                end = end_tag.end()
+            self.article.markup = html[self.article_start:end]
+        self.article = None
+
+    def data(self, data):
+        for node in self.text_nodes:
+            node.strings.append(data)
+
+    def close(self):
+        while self.stack:
+            self.pop()
+        return self.page
@@ -0,0 +1,61 @@
+import html
+
+
+class StreamSoup(object):
+    # A tag kept by StreamExtractor, with only what the scrape functions
+    # read of it: its attributes, its text when that was kept, the tags
+    # below it that find_all is asked for, and, for an article or project
+    # child, its ArticleFields for each rule set that was streamed. Only an
+    # article keeps its markup, from html.parser's source offsets or, for
+    # lxml, from markup_source once asked for, str of any other tag is just
+    # its start tag.
+
+    def __init__(self, name, attrs, keep_text=False):
+        self.name = name
+        self.attrs = attrs
+        self.strings = [] if keep_text else None
+        self.kept = {}
+        self.rule_fields = []
+        self.markup = None
+        self.markup_source = None
+
+    def get_text(self):
+        if self.strings is None:
+            raise ValueError('The text of <%s> was not kept.' % self.name)
+        return ''.join(self.strings)
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key):
+        return key in self.attrs
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def find_all(self, name, recursive=True):
+        # Only the tags kept for this tag's field, see
+        # StreamExtractor.FIND_ALL, which also says whether they are kept
+        # from the whole subtree or the direct children only.
+        kept = self.kept.get(name)
+        if kept is None:
+            raise ValueError('<%s> tags were not kept under <%s>.' % (
+                name, self.name))
+        return list(kept)
+
+    def fields(self, rules):
+        for streamed, fields in self.rule_fields:
+            if streamed is rules:
+                return fields
+        raise ValueError('The rules were not streamed for <%s>.' % self.name)
+
+    def __str__(self):
+        if self.markup is None and self.markup_source is not None:
+            self.markup = self.markup_source()
+            self.markup_source = None
+        if self.markup is not None:
+            return self.markup
+        return '<%s%s>' % (self.name, ''.join(
+            ' %s="%s"' % (key, html.escape(value))
+            for key, value in self.attrs.items()
+        ))
@@ -0,0 +1,89 @@
+import http.server
+import threading
+import time
+
+
+class StubServer(object):
+    # Serves fixed pages from a {path: html} dict on a local port and
+    # records the paths that were requested. Faults can be injected:
+    # latency seconds before each response, errors {path: [status, ...]}
+    # answered in turn before the page, and capacity, the requests in
+    # flight beyond which a request is answered 429 with retry_after.
+    def __init__(self, pages, latency=0, errors=None, capacity=None,
+                 retry_after=None):
+        self.pages = pages
+        self.latency = latency
+        self.errors = dict((k, list(v)) for k, v in (errors or {}).items())
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = []
+        self.requests = []
+        self.server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), self.handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever)
+
+    def handler_class(stub):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = stub.start(self.path)
+                try:
+                    time.sleep(stub.latency)
+                    self.respond(status)
+                finally:
+                    stub.end()
+
+            def respond(self, status):
+                html = stub.pages.get(self.path)
+                if status is None and html is None:
+                    status = 404
+                stub.statuses.append(status or 200)
+                if status is not None:
+                    self.send_response(status)
+                    if status == 429 and stub.retry_after is not None:
+                        self.send_header('Retry-After', str(stub.retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                else:
+                    body = html.encode('utf-8')
+                    self.send_response(200)
+                    self.send_header(
+                        'Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+        return Handler
+
+    def start(self, path):
+        # The injected error status for the request, or None.
+        with self.lock:
+            self.requests.append(path)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            if self.capacity is not None and self.in_flight > self.capacity:
+                return 429
+            errors = self.errors.get(path)
+            if errors:
+                return errors.pop(0)
+        return None
+
+    def end(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def url(self, path):
+        return 'http://127.0.0.1:%i%s' % (self.server.server_port, path)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
@@ -0,0 +1,64 @@
+import unittest
+from scraper.article_fields import ArticleFields
+from scraper.benchmark.article_fields import ArticleFieldsBenchmark
+from scraper.benchmark.article_fields import LegacyArticleScrape
+from scraper.page_scraper import PageScraper
+from scraper.test.test_page_scraper import available_parsers
+from scraper.test.test_page_scraper import open_json_file
+
+
+class TestArticleFields(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+    TEST_HTML_FILE = TEST_DATA_DIR + '/test_html.json'
+
+    def test_same_nodes_as_finds(self):
+        article = open_json_file(self.TEST_HTML_FILE)['residential_property']
+        for parser in available_parsers():
+            soup = PageScraper.html_to_soup(article, parser)
+            fields = ArticleFields.extract(soup, ArticleFields.LISTING)
+
+            listing_info = PageScraper.get_listing_info(soup)
+            property_stats = PageScraper.get_property_stats(listing_info)
+            self.assertEqual(fields['listing_info'], listing_info)
+            self.assertEqual(fields['property_stats'], property_stats)
+            self.assertEqual(
+                fields['price_text'],
+                PageScraper.search_for_price_text(property_stats))
+            self.assertEqual(
+                fields['vcard_name'],
+                PageScraper.find_vcard_name_soup(listing_info))
+            self.assertEqual(
+                fields['features'],
+                PageScraper.get_property_features_soup(listing_info))
+            self.assertIsNone(fields['contact_agent'])
+            self.assertEqual(
+                fields['photoviewer_img']['alt'],
+                PageScraper.find_address_text(soup))
+
+    def test_direct_child_and_stop(self):
+        html = (
+            '<div class="child"><div class="features">'
+            '<dl class="rui-property-features rui-clearfix"></dl></div>'
+            '<div class="photoviewer"><a><span><img alt="nested"/></span>'
+            '<img alt="child"/></a></div></div><p>after</p>'
+        )
+        for parser in available_parsers():
+            soup = PageScraper.html_to_soup(html, parser)
+            fields = ArticleFields.extract(soup, ArticleFields.PROJECT_CHILD)
+            self.assertEqual(fields['photoviewer_img']['alt'], 'child')
+            self.assertIsNone(fields['price'])
+
+            fields = ArticleFields.extract(soup, ArticleFields.PROJECT)
+            self.assertIsNone(fields['child_listings'])
+
+    def test_agrees_with_legacy_and_visits_fewer(self):
+        content_types = ArticleFieldsBenchmark.content_types()
+        for parser in available_parsers():
+            articles = ArticleFieldsBenchmark.articles(parser, num_pages=1)
+            ArticleFieldsBenchmark.check_agreement(articles)
+
+        articles = ArticleFieldsBenchmark.articles('html.parser', num_pages=1)
+        self.assertLess(
+            ArticleFieldsBenchmark.count_visits(articles, content_types),
+            ArticleFieldsBenchmark.count_visits(
+                articles, LegacyArticleScrape.CONTENT_TYPES))
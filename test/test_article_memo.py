@@ -0,0 +1,54 @@
+import unittest
+import bs4
+from scraper.article_memo import ArticleMemo, DuplicateListing
+from scraper.sales_scraper import SalesScraper
+from scraper.test.test_page_scraper import open_test_html
+from scraper.test.test_page_scraper import available_parsers
+
+
+class TestArticleMemo(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.html = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+
+    def test_duplicate_pages(self):
+        expected = SalesScraper.scrape_pages([self.html], quiet=True)
+
+        for parser in available_parsers():
+            memo = ArticleMemo()
+            properties = SalesScraper.scrape_pages(
+                [self.html, self.html], quiet=True, parser=parser, memo=memo)
+
+            self.assertEqual(properties[:len(expected)], expected)
+            duplicates = properties[len(expected):]
+            self.assertEqual(len(duplicates), len(expected))
+            for duplicate, original in zip(duplicates, expected):
+                self.assertIs(type(duplicate), DuplicateListing)
+                self.assertEqual(duplicate.properties, [original])
+            self.assertEqual(
+                memo.stats(),
+                {'hits': 20, 'misses': 20, 'evictions': 0, 'entries': 20})
+
+    def test_listing_key(self):
+        articles = bs4.BeautifulSoup(
+            '<article data-content-type="residential" id="t1"></article>'
+            '<article data-content-type="residential"></article>',
+            'html.parser'
+        ).find_all('article')
+
+        self.assertEqual(
+            ArticleMemo.listing_key(articles[0]), ('residential', 't1'))
+        self.assertEqual(ArticleMemo.listing_key(articles[1])[0], 'markup')
+
+    def test_eviction(self):
+        memo = ArticleMemo(max_entries=10)
+        SalesScraper.scrape_pages([self.html], quiet=True, memo=memo)
+        self.assertEqual(memo.stats()['entries'], 10)
+        self.assertEqual(memo.stats()['evictions'], 10)
+
+    def test_memo_is_serial_only(self):
+        with self.assertRaises(ValueError):
+            SalesScraper.scrape_pages(
+                [self.html], quiet=True, workers=2, memo=ArticleMemo())
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+from scraper.columnar import ColumnarExport
+from scraper.page_scraper import PageScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.rentals_scraper import RentalsScraper
+import real_estate.real_estate_property as rep
+from scraper.test.open_json import open_json_file
+from scraper.test.test_page_scraper import open_test_html
+from scraper.test.test_page_scraper import populate_state_and_postcode
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestColumnarExport(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def scrape(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        properties = SalesScraper.scrape_pages([html], quiet=True)
+        properties.append(rep.DataContentTypeNotSupported('commercial'))
+        return populate_state_and_postcode(properties, 'act', 2600)
+
+    def test_to_columns(self):
+        properties = self.scrape()
+        columns = ColumnarExport.to_columns(properties)
+
+        self.assertEqual(
+            set(columns.keys()), set(ColumnarExport.COLUMNS))
+        for name in ColumnarExport.COLUMNS:
+            self.assertEqual(len(columns[name]), 21, name)
+
+        self.assertEqual(columns['record_type'][0], 'Property')
+        self.assertEqual(columns['sale_type'][0], 'PrivateTreaty')
+        self.assertEqual(columns['prices'][0], [495000])
+        self.assertEqual(columns['property_type'][0], 'Land')
+        self.assertEqual(columns['bedrooms'][0], None)
+        self.assertEqual(columns['bedrooms'][1], 2)
+        self.assertEqual(
+            columns['address_text'][0],
+            '29 Mayfair Bott Crescent, Casey, ACT 2913')
+        self.assertEqual(columns['postcode'][0], '2600')
+        self.assertEqual(
+            columns['record_type'][20], 'DataContentTypeNotSupported')
+        self.assertEqual(columns['sale_type'][20], None)
+
+    def test_rental_columns(self):
+        article = open_json_file(
+            self.TEST_DATA_DIR + '/test_html.json')['rental_property']
+        rental = RentalsScraper.scrape_rental_property(
+            PageScraper.html_to_soup(article))
+        columns = ColumnarExport.to_columns([rental])
+        self.assertEqual(columns['sale_type'], ['Rental'])
+        self.assertEqual(columns['under_contract'], [False])
+        self.assertEqual(columns['prices'], [[300]])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_write_parquet_and_arrow(self):
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        properties = self.scrape()
+        expected = ColumnarExport.to_table(properties)
+        self.assertEqual(
+            expected.schema.field('sale_type').type,
+            pyarrow.dictionary(pyarrow.int32(), pyarrow.string()))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            parquet_file = os.path.join(temp_dir, 'properties.parquet')
+            rows = ColumnarExport.write_parquet(
+                iter(properties), parquet_file, batch_size=8)
+            parquet = pyarrow.parquet.ParquetFile(parquet_file)
+            self.assertEqual(rows, 21)
+            self.assertEqual(parquet.num_row_groups, 3)
+            self.assertEqual(
+                parquet.read().column('prices').to_pylist(),
+                expected.column('prices').to_pylist())
+
+            arrow_file = os.path.join(temp_dir, 'properties.arrows')
+            ColumnarExport.write_arrow(properties, arrow_file, batch_size=8)
+            with pyarrow.OSFile(arrow_file, 'rb') as source:
+                table = pyarrow.ipc.open_stream(source).read_all()
+            self.assertEqual(table.to_pylist(), expected.to_pylist())
@@ -0,0 +1,79 @@
+import pickle
+import unittest
+from scraper.compact import CompactProperty, CompactRecords
+from scraper.columnar import ColumnarExport
+from scraper.sales_scraper import SalesScraper
+import real_estate.real_estate_property as rep
+from scraper.test.test_page_scraper import open_test_html
+from scraper.test.test_page_scraper import populate_state_and_postcode
+
+
+class TestCompactRecords(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        self.expected = populate_state_and_postcode(
+            SalesScraper.scrape_pages([html], quiet=True), 'act', 2600)
+        self.compact = populate_state_and_postcode(
+            SalesScraper.scrape_pages([html], quiet=True, compact=True),
+            'act', 2600)
+
+    def assert_equal_with_summary(self, provided, expected):
+        self.assertEqual(
+            provided, expected,
+            '\n%s\nv.\n%s' % (provided.summarise(), expected.summarise())
+        )
+
+    def test_equal_to_rep_properties(self):
+        self.assertEqual(len(self.compact), len(self.expected))
+        for compact, expected in zip(self.compact, self.expected):
+            self.assertIs(type(compact), CompactProperty)
+            self.assert_equal_with_summary(compact, expected)
+            self.assert_equal_with_summary(expected, compact)
+            self.assertEqual(compact.details, expected.details)
+            self.assertEqual(compact.address_text, expected.address_text)
+            self.assertEqual(compact.summarise(), expected.summarise())
+
+    def test_shared_types(self):
+        records = CompactRecords()
+        first = records.compact(rep.Property(
+            rep.Auction(False), rep.Details(rep.House(), 3, 1, 1, None, None),
+            rep.AddressText('1 Wootton Crescent, Gordon, ACT 2906')))
+        second = records.compact(rep.Property(
+            rep.Auction(False), rep.Details(rep.House(), 4, 2, 2, None, None),
+            rep.AddressText('51 Wootton Crescent, Gordon, ACT 2906')))
+        priced = records.compact(rep.Property(
+            rep.PrivateTreaty([1], False),
+            rep.Details(rep.House(), 4, 2, 2, None, None),
+            rep.AddressText('5 Main Road')))
+
+        self.assertIs(first.sale_type, second.sale_type)
+        self.assertIs(first.property_type, second.property_type)
+        self.assertIs(first.locality, second.locality)
+        self.assertIsNot(priced.sale_type, first.sale_type)
+        self.assertEqual(
+            (priced.street, priced.locality), ('5 Main Road', None))
+        self.assertEqual(priced.address_text, rep.AddressText('5 Main Road'))
+
+    def test_shared_state_and_postcode(self):
+        self.assertIs(self.compact[0].state_and_postcode,
+                      self.compact[1].state_and_postcode)
+        self.assertEqual(self.compact[0].state_and_postcode,
+                         rep.StateAndPostcode('act', 2600))
+        self.assertIsNot(self.expected[0].state_and_postcode,
+                         self.expected[1].state_and_postcode)
+        copy = pickle.loads(pickle.dumps(self.compact[0]))
+        self.assertIs(copy.state_and_postcode,
+                      self.compact[0].state_and_postcode)
+
+    def test_other_records_pass_through(self):
+        not_supported = rep.DataContentTypeNotSupported('commercial')
+        self.assertIs(CompactRecords().compact(not_supported), not_supported)
+
+    def test_pickle_and_export(self):
+        self.assertEqual(
+            pickle.loads(pickle.dumps(self.compact)), self.compact)
+        self.assertEqual(
+            ColumnarExport.to_columns(self.compact),
+            ColumnarExport.to_columns(self.expected))
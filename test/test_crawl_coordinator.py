@@ -0,0 +1,177 @@
+import os
+import tempfile
+import time
+import unittest
+from scraper.crawl_coordinator import CrawlCoordinator, CrawlWorker
+from scraper.crawl_coordinator import LeaseTable, ShardFetch
+from scraper.sales_scraper import SalesScraper
+from scraper.test.stub_server import StubServer
+from scraper.test.test_page_scraper import open_test_html
+
+
+def crawl_postcode(shard):
+    return [(shard.state, shard.postcode, shard.scraper)]
+
+
+def crawl_error(shard):
+    raise RuntimeError('Blocked')
+
+
+class TestCrawlCoordinator(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'leases.sqlite')
+        self.table = LeaseTable(self.file_path)
+
+    def tearDown(self):
+        self.table.close()
+        self.temp_dir.cleanup()
+
+    def test_plan(self):
+        self.assertEqual(
+            LeaseTable.plan([('act', 2600), ('nsw', 2000)]),
+            [('act', 2600, 'sales'), ('act', 2600, 'rentals'),
+             ('nsw', 2000, 'sales'), ('nsw', 2000, 'rentals')])
+        with self.assertRaises(ValueError):
+            LeaseTable.plan([('act', 2600)], ['auctions'])
+
+        shards = LeaseTable.plan([('act', 2600)])
+        self.assertEqual(self.table.add_shards(shards), 2)
+        self.assertEqual(self.table.add_shards(shards), 0)
+        self.assertEqual(self.table.counts(), {
+            'pending': 2, 'leased': 0, 'done': 0, 'failed': 0})
+
+    def test_run_local(self):
+        has_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+        no_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+        pages = {
+            '/buy/act/2914/list-1': has_results,
+            '/buy/act/2914/list-2': no_results,
+            '/buy/act/2600/list-1': no_results,
+            '/buy/nsw/2000/list-1': has_results,
+            '/buy/nsw/2000/list-2': no_results,
+        }
+        expected = SalesScraper.scrape_pages([has_results], quiet=True)
+        shards = LeaseTable.plan(
+            [('act', 2914), ('act', 2600), ('nsw', 2000)], ['sales'])
+
+        with StubServer(pages) as server:
+            fetch = ShardFetch({
+                'sales': server.url(
+                    '/buy/{state}/{postcode}/list-{page_num}'),
+            }, max_connections=2)
+            properties = CrawlCoordinator.run_local(
+                self.table, shards, fetch.crawl, 3, poll_interval=0.05)
+
+        self.assertEqual(sorted(server.requests), sorted(pages))
+        self.assertEqual(self.table.counts(), {
+            'pending': 0, 'leased': 0, 'done': 3, 'failed': 0})
+        self.assertEqual(len(properties), len(expected) * 2)
+        self.assertEqual(
+            [(p.state_and_postcode.state, p.state_and_postcode.postcode)
+             for p in properties],
+            [('act', 2914)] * len(expected) + [('nsw', 2000)] * len(expected))
+        self.assertEqual(self.table.merge('rentals'), [])
+
+    def test_failed_page_fails_shard(self):
+        table = LeaseTable(self.file_path, max_attempts=1)
+        table.add_shards(LeaseTable.plan([('act', 2600)], ['sales']))
+        with StubServer({}) as server:
+            fetch = ShardFetch({
+                'sales': server.url(
+                    '/buy/{state}/{postcode}/list-{page_num}'),
+            })
+            worker = CrawlWorker(table, fetch.crawl, 'a', poll_interval=0)
+            self.assertEqual(worker.run(), 0)
+
+        (shard, error), = table.failures()
+        self.assertTrue(error.startswith(
+            'RuntimeError: Page 1 failed with HTTPError'))
+        table.close()
+
+    def test_same_worker_id_on_two_tables(self):
+        self.table.add_shards(LeaseTable.plan([('act', 2600)]))
+        other = self.table.copy()
+        a = self.table.lease('local-0')
+        b = other.lease('local-0')
+        self.assertNotEqual(a.lease, b.lease)
+        self.assertEqual((a.shard_id, b.shard_id), (1, 2))
+        self.assertTrue(self.table.complete(a, ['a']))
+        self.assertTrue(other.complete(b, ['b']))
+        self.assertEqual(self.table.merge(), ['a', 'b'])
+        other.close()
+
+    def test_expired_lease_reassigned(self):
+        table = LeaseTable(self.file_path, lease_seconds=0.1)
+        table.add_shards(LeaseTable.plan([('act', 2600)], ['sales']))
+        dead = table.lease('dead')
+        self.assertIsNone(table.lease('other'))
+
+        time.sleep(0.2)
+        worker = CrawlWorker(table, crawl_postcode, 'live', poll_interval=0)
+        self.assertEqual(worker.run(), 1)
+        self.assertFalse(table.heartbeat(dead))
+        self.assertFalse(table.complete(dead, ['late']))
+        self.assertEqual(table.merge(), [('act', 2600, 'sales')])
+        table.close()
+
+    def test_heartbeat_keeps_lease(self):
+        table = LeaseTable(self.file_path, lease_seconds=0.2)
+        table.add_shards(LeaseTable.plan([('act', 2600)], ['sales']))
+        other = table.copy()
+        leased_by_other = []
+
+        def crawl(shard):
+            for _ in range(4):
+                time.sleep(0.1)
+                leased_by_other.append(other.lease('other'))
+            return crawl_postcode(shard)
+
+        worker = CrawlWorker(
+            table, crawl, 'live', heartbeat_interval=0.05, poll_interval=0)
+        self.assertEqual(worker.run(), 1)
+        self.assertEqual(leased_by_other, [None] * 4)
+        self.assertEqual(table.counts()['done'], 1)
+        other.close()
+        table.close()
+
+    def test_failed_shard(self):
+        table = LeaseTable(self.file_path, max_attempts=2)
+        table.add_shards(LeaseTable.plan([('act', 2600)]))
+        worker = CrawlWorker(table, crawl_error, 'a', poll_interval=0)
+        self.assertEqual(worker.run(), 0)
+        self.assertEqual(table.counts(), {
+            'pending': 0, 'leased': 0, 'done': 0, 'failed': 2})
+        failures = table.failures()
+        self.assertEqual(
+            [(x.scraper, x.attempts, error) for x, error in failures],
+            [('sales', 2, 'RuntimeError: Blocked'),
+             ('rentals', 2, 'RuntimeError: Blocked')])
+        table.close()
+
+    def test_unpicklable_output(self):
+        table = LeaseTable(self.file_path, max_attempts=2)
+        table.add_shards(LeaseTable.plan([('act', 2600)], ['sales']))
+        worker = CrawlWorker(
+            table, lambda shard: [lambda: None], 'a', poll_interval=0)
+        self.assertEqual(worker.run(), 0)
+        self.assertEqual(table.counts()['failed'], 1)
+        (shard, error), = table.failures()
+        self.assertEqual(shard.attempts, 2)
+        self.assertIn('pickle', error)
+        table.close()
+
+    def test_expired_too_often(self):
+        table = LeaseTable(self.file_path, lease_seconds=0, max_attempts=1)
+        table.add_shards(LeaseTable.plan([('act', 2600)], ['sales']))
+        self.assertIsNotNone(table.lease('dead'))
+        time.sleep(0.01)
+        self.assertIsNone(table.lease('other'))
+        self.assertEqual(
+            [error for _, error in table.failures()],
+            ['Lease expired on attempt 1.'])
+        table.close()
@@ -0,0 +1,120 @@
+import functools
+import logging
+import time
+import unittest
+from scraper.events import EventSink
+from scraper.page_pool import PagePool
+from scraper.page_scraper import PageScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestEventSink(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.logger = logging.getLogger('scraper.test_events')
+        self.logger.setLevel(logging.INFO)
+        self.events = EventSink(self.logger, max_samples=2)
+
+    def test_aggregated_per_batch(self):
+        with self.assertLogs(self.logger, logging.INFO) as logs:
+            with self.events.batch():
+                for text in ('1,250', '3,500', '7,000'):
+                    self.events.event('missed_price', logging.WARNING, text)
+                self.events.event('no_results', logging.INFO, 4)
+                self.assertEqual(self.events.summary(), {
+                    'missed_price': (3, ['1,250', '3,500']),
+                    'no_results': (1, [4]),
+                })
+
+        self.assertEqual(logs.output, [
+            "WARNING:scraper.test_events:3 possible missed prices in this "
+            "batch, e.g. '1,250', '3,500'",
+            "INFO:scraper.test_events:1 'no results' pages in this batch, "
+            "final page numbers 4",
+        ])
+        self.assertEqual(logs.records[0].samples, ['1,250', '3,500'])
+        self.assertEqual(self.events.summary(), {})
+
+    def test_quiet_and_level(self):
+        with self.events.batch(quiet=True):
+            self.events.event('missed_price', logging.WARNING, '1,250')
+            self.events.log(logging.INFO, 'Scraping from %i pages.', 1)
+        self.assertEqual(self.events.summary(), {})
+
+        self.logger.setLevel(logging.ERROR)
+        self.events.event('missed_price', logging.WARNING, '1,250')
+        self.assertEqual(self.events.summary(), {})
+
+    def test_page_scraper_events(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        original = PageScraper.EVENTS
+        PageScraper.EVENTS = self.events
+        try:
+            with self.assertLogs(self.logger, logging.INFO) as logs:
+                with self.events.batch():
+                    PageScraper.check_for_missed_prices('Offers 1,250,000')
+                    SalesScraper.scrape_pages([html])
+            with self.events.batch(quiet=True):
+                PageScraper.check_for_missed_prices('Offers 1,250,000')
+                SalesScraper.scrape_pages([html])
+                self.assertEqual(self.events.summary(), {})
+        finally:
+            PageScraper.EVENTS = original
+
+        self.assertEqual(logs.output[0], (
+            'INFO:scraper.test_events:Scraping from 1 pages.'))
+        self.assertEqual(logs.records[-1].event, 'missed_price')
+
+    def test_rate_limited(self):
+        events = EventSink(self.logger, max_lines=2, interval=0.05)
+        with self.assertLogs(self.logger, logging.INFO) as logs:
+            with events.batch():
+                for name in ('missed_price', 'no_results', 'fetch_retry'):
+                    events.event(name, logging.WARNING, 1)
+                    events.event(name, logging.WARNING, 2)
+            time.sleep(0.06)
+            with events.batch():
+                events.event('missed_price', logging.WARNING, 3)
+
+        self.assertEqual(
+            [record.event for record in logs.records],
+            ['missed_price', 'no_results', 'suppressed', 'missed_price'])
+        self.assertEqual(logs.records[2].count, 2)
+
+    def test_iter_scrape_pages_flushes(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        original = PageScraper.EVENTS
+        PageScraper.EVENTS = self.events
+        try:
+            with self.assertLogs(self.logger, logging.INFO) as logs:
+                properties = SalesScraper.iter_scrape_pages([html])
+                next(properties)
+                PageScraper.check_for_missed_prices('Offers 1,250,000')
+                list(properties)
+        finally:
+            PageScraper.EVENTS = original
+
+        self.assertEqual(logs.records[-1].event, 'missed_price')
+        self.assertEqual(self.events.summary(), {})
+
+    def test_quiet_passed_to_chunks(self):
+        def scrape_html(html):
+            PageScraper.check_for_missed_prices(html)
+            return []
+
+        chunk = [(1, 'Offers 1,250,000')]
+        original = PageScraper.EVENTS
+        PageScraper.EVENTS = self.events
+        try:
+            with self.assertNoLogs(self.logger, logging.INFO):
+                PagePool.scrape_chunk(chunk, scrape_html, functools.partial(
+                    PageScraper.worker_batch, True))
+            with self.assertLogs(self.logger, logging.INFO) as logs:
+                PagePool.scrape_chunk(chunk, scrape_html, functools.partial(
+                    PageScraper.worker_batch, False))
+        finally:
+            PageScraper.EVENTS = original
+
+        self.assertEqual(logs.records[0].event, 'missed_price')
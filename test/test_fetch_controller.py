@@ -0,0 +1,187 @@
+import asyncio
+import time
+import unittest
+import urllib.error
+from scraper.fetch_controller import AdaptiveConcurrency, FetchController
+from scraper.fetch_controller import RetryBackoff, TokenBuckets
+from scraper.fetch_pipeline import FetchPipeline, Search
+from scraper.instrumentation import Instrumentation
+from scraper.sales_scraper import SalesScraper
+from scraper.test.stub_server import StubServer
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestFetchController(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def tearDown(self):
+        Instrumentation.disable()
+
+    def stub_pages(self, num_pages):
+        has_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+        template = 'Showing 1601 - 1620 of  total results'
+        total = 'Showing 1 - 20 of %i total results' % (num_pages * 20)
+        pages = dict(
+            ('/list-%i' % i, has_results.replace(template, total))
+            for i in range(1, num_pages + 1)
+        )
+        return pages, SalesScraper.scrape_pages([has_results], quiet=True)
+
+    def test_aimd(self):
+        concurrency = AdaptiveConcurrency(8, initial=2, target_latency=1)
+        for _ in range(2):
+            concurrency.update(0, False, 0.5)
+        self.assertAlmostEqual(concurrency.limit, 2.9, places=1)
+
+        concurrency.update(1, True, 2)
+        self.assertAlmostEqual(concurrency.limit, 1.45, places=2)
+        # Started before the cut, so no second cut.
+        concurrency.update(1.5, True, 2.5)
+        concurrency.update(1.5, False, 3)
+        self.assertAlmostEqual(concurrency.limit, 1.45, places=2)
+        concurrency.update(2, False, 3.5)
+        self.assertEqual(concurrency.limit, 1)
+
+        concurrency = AdaptiveConcurrency(8, initial=8, target_latency=1)
+        for _ in range(8):
+            concurrency.update(0, False, 0.1)
+        self.assertEqual(concurrency.limit, 8)
+        self.assertEqual(AdaptiveConcurrency(8).limit, 4)
+
+    def test_retry_backoff(self):
+        backoff = RetryBackoff(base_delay=0.5, max_delay=3,
+                               random=lambda: 1.0)
+        self.assertEqual(
+            [backoff.delay(n) for n in range(5)], [0.5, 1, 2, 3, 3])
+        self.assertEqual(backoff.delay(0, retry_after=2), 2)
+        self.assertEqual(backoff.delay(0, retry_after=60), 3)
+        self.assertEqual(
+            RetryBackoff(random=lambda: 0.25).delay(2), 0.5)
+
+    def test_token_buckets(self):
+        buckets = TokenBuckets(requests_per_second=20, burst=2)
+        self.assertEqual(
+            [buckets.take('a', 0) for _ in range(3)], [0, 0, 0.05])
+        self.assertEqual(buckets.take('a', 0.05), 0)
+        self.assertAlmostEqual(buckets.take('a', 0.06), 0.04)
+
+        self.assertEqual(buckets.take('b', 0), 0)
+        buckets.pause('b', 0.1, now=0)
+        self.assertAlmostEqual(buckets.backoff_seconds('b', now=0.02), 0.08)
+        self.assertAlmostEqual(buckets.take('b', 0.02), 0.08)
+        self.assertEqual(buckets.take('b', 0.1), 0)
+        self.assertEqual(buckets.backoff_seconds('b', now=0.1), 0)
+
+        async def waits():
+            buckets = TokenBuckets(requests_per_second=1000, burst=2)
+            await asyncio.gather(*[buckets.wait('a') for _ in range(4)])
+            return buckets.buckets['a'][0]
+
+        self.assertLess(asyncio.run(waits()), 1)
+
+    def test_retries_errors(self):
+        pages, expected = self.stub_pages(2)
+        errors = {'/list-1': [503, 429], '/list-2': [500]}
+        with Instrumentation.collect() as stats:
+            with StubServer(pages, errors=errors, retry_after=0) as server:
+                pipeline = FetchPipeline(
+                    SalesScraper, max_connections=2, base_delay=0.01,
+                    quiet=True)
+                properties = pipeline.scrape(
+                    [Search(server.url('/list-{page_num}'), 'act', 2914)])
+
+        self.assertEqual(len(properties), len(expected) * 2)
+        self.assertEqual(sorted(server.requests), [
+            '/list-1', '/list-1', '/list-1', '/list-2', '/list-2'])
+        self.assertEqual(stats.calls['fetch:200'], 2)
+        self.assertEqual(stats.calls['fetch:503'], 1)
+        self.assertEqual(stats.calls['fetch:429'], 1)
+        self.assertEqual(stats.calls['fetch:500'], 1)
+        self.assertEqual(stats.calls['fetch_retry'], 3)
+        gauges = stats.snapshot()['gauges']
+        self.assertLessEqual(gauges['fetch_concurrency_limit'], 2)
+        self.assertEqual(gauges['fetch_in_flight'], 0)
+        self.assertGreater(gauges['fetch_pages_per_second'], 0)
+        host = server.url('').split('//')[1]
+        self.assertIn('fetch_backoff_seconds:' + host, gauges)
+        self.assertIn('scraper_gauge{gauge="fetch_in_flight"} 0.000000',
+                      stats.to_prometheus().splitlines())
+
+    def test_pipeline_reused(self):
+        pages, expected = self.stub_pages(1)
+        pages['/act/list-1'] = pages['/list-1']
+        with StubServer(pages) as server:
+            searches = [
+                Search(server.url('/list-{page_num}'), 'act', 2914),
+                Search(server.url('/act/list-{page_num}'), 'act', 2600),
+            ]
+            pipeline = FetchPipeline(
+                SalesScraper, max_connections=1, quiet=True)
+            first = pipeline.scrape(searches)
+            second = pipeline.scrape(searches)
+
+        self.assertEqual(len(first), len(expected) * 2)
+        self.assertEqual(len(second), len(first))
+        self.assertEqual(len(server.requests), 4)
+
+    def test_gives_up(self):
+        pages, _ = self.stub_pages(1)
+        with StubServer(pages, errors={'/list-1': [500] * 3}) as server:
+            pipeline = FetchPipeline(
+                SalesScraper, retries=2, base_delay=0.01, quiet=True)
+            failed, = pipeline.scrape(
+                [Search(server.url('/list-{page_num}'), 'act', 2914)])
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual((failed.page_num, failed.error_type),
+                         (1, 'HTTPError'))
+
+        with StubServer({}) as server:
+            pipeline = FetchPipeline(SalesScraper, quiet=True)
+            failed, = pipeline.scrape(
+                [Search(server.url('/list-{page_num}'), 'act', 2914)])
+        self.assertEqual(server.statuses, [404])
+        self.assertIn('404', failed.message)
+
+    def test_backs_off_to_capacity(self):
+        pages, expected = self.stub_pages(24)
+        with StubServer(pages, latency=0.02, capacity=2) as server:
+            pipeline = FetchPipeline(
+                SalesScraper, max_connections=8, initial_connections=8,
+                base_delay=0.02, retries=8, quiet=True)
+            properties = pipeline.scrape(
+                [Search(server.url('/list-{page_num}'), 'act', 2914)])
+
+        self.assertEqual(len(properties), len(expected) * 24)
+        self.assertEqual(server.statuses.count(200), 24)
+        self.assertGreater(server.statuses.count(429), 0)
+        self.assertLess(pipeline.controller.concurrency.limit, 8)
+
+    def test_client_errors_neutral(self):
+        async def fetch_missing(controller):
+            def fetch_html(url):
+                raise urllib.error.HTTPError(url, 404, 'Not Found', {}, None)
+            for _ in range(4):
+                with self.assertRaises(urllib.error.HTTPError):
+                    await controller.fetch(fetch_html, 'http://a/missing')
+            return await controller.fetch(lambda url: url, 'http://a/1')
+
+        controller = FetchController(max_connections=8, initial_connections=2)
+        self.assertEqual(asyncio.run(fetch_missing(controller)), 'http://a/1')
+        self.assertEqual(controller.concurrency.limit, 2.5)
+
+    def test_slow_responses(self):
+        async def fetch_slowly(controller):
+            def fetch_html(url):
+                time.sleep(0.05)
+                return url
+            return await asyncio.gather(*[
+                controller.fetch(fetch_html, 'http://a/%i' % i)
+                for i in range(4)
+            ])
+
+        controller = FetchController(
+            max_connections=4, initial_connections=4, target_latency=0.01)
+        self.assertEqual(asyncio.run(fetch_slowly(controller)), [
+            'http://a/0', 'http://a/1', 'http://a/2', 'http://a/3'])
+        self.assertEqual(controller.concurrency.limit, 2)
@@ -0,0 +1,106 @@
+import unittest
+from scraper.fetch_pipeline import FetchPipeline, Search
+from scraper.instrumentation import Instrumentation
+from scraper.page_pool import PageScrapeFailed
+from scraper.sales_scraper import SalesScraper
+import real_estate.real_estate_property as rep
+from scraper.test.stub_server import StubServer
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestFetchPipeline(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def stub_pages(self):
+        has_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+        no_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+        return has_results, {
+            '/act/2914/list-1': has_results,
+            '/act/2914/list-2': has_results,
+            '/act/2914/list-3': no_results,
+            '/act/2600/list-1': no_results,
+        }
+
+    def test_scrape_searches(self):
+        has_results, pages = self.stub_pages()
+        expected = SalesScraper.scrape_pages([has_results], quiet=True)
+
+        for parse_workers in (None, 2):
+            with StubServer(pages) as server:
+                searches = [
+                    Search(server.url('/act/2914/list-{page_num}'),
+                           'act', 2914),
+                    Search(server.url('/act/2600/list-{page_num}'),
+                           'act', 2600),
+                ]
+                pipeline = FetchPipeline(
+                    SalesScraper, max_connections=2,
+                    parse_workers=parse_workers)
+                with Instrumentation.collect() as stats:
+                    properties = pipeline.scrape(searches)
+
+            self.assertEqual(stats.calls['parse'], len(pages))
+            self.assertEqual(len(properties), len(expected) * 2)
+            self.assertEqual(
+                [p.address_text for p in properties],
+                [p.address_text for p in expected * 2])
+            for p in properties:
+                self.assertEqual(
+                    p.state_and_postcode, rep.StateAndPostcode('act', 2914))
+            self.assertEqual(sorted(server.requests), sorted(pages.keys()))
+
+    def test_failed_searches(self):
+        has_results, pages = self.stub_pages()
+        expected = SalesScraper.populate_state_and_postcode(
+            SalesScraper.scrape_pages([has_results], quiet=True),
+            'act', 2914)
+        pages['/act/2601/list-1'] = '<html></html>'
+
+        for parse_workers in (None, 2):
+            with StubServer(pages) as server:
+                searches = [
+                    Search(server.url('/act/2602/list-{page_num}'),
+                           'act', 2602),
+                    Search(server.url('/act/2914/list-{page_num}'),
+                           'act', 2914),
+                    Search(server.url('/act/2601/list-{page_num}'),
+                           'act', 2601),
+                ]
+                pipeline = FetchPipeline(
+                    SalesScraper, max_connections=2,
+                    parse_workers=parse_workers, quiet=True)
+                properties = pipeline.scrape(searches)
+
+            self.assertEqual(len(properties), len(expected) * 2 + 2)
+            self.assertEqual(properties[1:-1], expected * 2)
+            failed = [properties[0], properties[-1]]
+            self.assertEqual(
+                [(type(x), x.page_num) for x in failed],
+                [(PageScrapeFailed, 1)] * 2)
+            self.assertEqual(failed[0].error_type, 'HTTPError')
+            self.assertEqual(
+                failed[1].state_and_postcode,
+                rep.StateAndPostcode('act', 2601))
+
+    def test_pages_planned_from_total(self):
+        has_results, _ = self.stub_pages()
+        template = 'Showing 1601 - 1620 of  total results'
+        self.assertIn(template, has_results)
+        pages = {
+            '/list-1': has_results.replace(
+                template, 'Showing 1 - 20 of 60 total results'),
+            '/list-2': has_results.replace(
+                template, 'Showing 21 - 40 of 60 total results'),
+            '/list-3': has_results.replace(
+                template, 'Showing 41 - 60 of 60 total results'),
+        }
+
+        with StubServer(pages) as server:
+            pipeline = FetchPipeline(SalesScraper)
+            properties = pipeline.scrape(
+                [Search(server.url('/list-{page_num}'), 'act', 2914)])
+
+        self.assertEqual(len(properties), 60)
+        self.assertEqual(sorted(server.requests), sorted(pages.keys()))
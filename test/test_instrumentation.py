@@ -0,0 +1,96 @@
+import unittest
+from scraper.instrumentation import Instrumentation, ScrapeStats
+from scraper.page_scraper import PageScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.benchmark.synthetic import SyntheticPages
+import real_estate.real_estate_property as rep
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.htmls = SyntheticPages().pages({
+            'residential_property': 1, 'new_apartment_project': 1,
+            'rural_property': 1, 'rental_property': 1,
+        }, 8, 2)
+
+    def tearDown(self):
+        Instrumentation.disable()
+
+    def test_collect(self):
+        original = PageScraper.html_to_soup
+        reports = []
+        with Instrumentation.collect(callback=reports.append) as stats:
+            self.assertIsNot(PageScraper.html_to_soup, original)
+            properties = SalesScraper.scrape_pages(self.htmls, quiet=True)
+
+        self.assertIs(PageScraper.html_to_soup, original)
+        self.assertEqual(reports, [stats])
+        self.assertEqual(stats.calls['parse'], 2)
+        self.assertEqual(stats.calls['find_articles'], 2)
+        self.assertEqual(
+            sum(n for stage, n in stats.calls.items()
+                if stage.startswith('scrape:')), 16)
+        self.assertGreater(stats.calls['sale_type'], 0)
+        self.assertGreater(stats.calls['address'], 0)
+        self.assertGreater(stats.seconds['parse'], 0)
+
+        not_supported = [
+            p for p in properties
+            if isinstance(p, rep.DataContentTypeNotSupported)]
+        self.assertEqual(
+            stats.outcomes['DataContentTypeNotSupported'],
+            len(not_supported))
+        self.assertGreater(len(not_supported), 0)
+
+    def test_collect_with_workers(self):
+        with Instrumentation.collect() as serial:
+            SalesScraper.scrape_pages(self.htmls, quiet=True)
+        with Instrumentation.collect() as parallel:
+            SalesScraper.scrape_pages(
+                self.htmls, quiet=True, workers=2, chunksize=1)
+
+        self.assertEqual(parallel.calls, serial.calls)
+        self.assertEqual(parallel.outcomes, serial.outcomes)
+        self.assertGreater(parallel.seconds['parse'], 0)
+
+    def test_rentals_sale_type(self):
+        with Instrumentation.collect() as stats:
+            RentalsScraper.scrape_pages(self.htmls, quiet=True)
+        self.assertEqual(
+            stats.calls['sale_type'], stats.calls['scrape:rental'])
+
+    def test_enable_twice(self):
+        Instrumentation.enable()
+        self.assertRaises(RuntimeError, Instrumentation.enable)
+
+    def test_count_outcomes(self):
+        stats = ScrapeStats()
+        stats.count_outcomes(rep.Property(
+            rep.SaleTypeParseFailed(),
+            rep.Details(rep.PropertyTypeNotSupported('?', None),
+                        None, None, None, None, None),
+            rep.AddressText('1 Main Road')))
+        self.assertEqual(stats.outcomes, {
+            'SaleTypeParseFailed': 1, 'PropertyTypeNotSupported': 1})
+
+    def test_merge_and_prometheus(self):
+        stats = ScrapeStats()
+        stats.record('parse', 0.5)
+        other = ScrapeStats()
+        other.record('parse', 0.25)
+        other.count('SaleTypeParseFailed', 2)
+        stats.merge(other)
+
+        self.assertEqual(stats.snapshot(), {
+            'stages': {'parse': {'seconds': 0.75, 'calls': 2}},
+            'outcomes': {'SaleTypeParseFailed': 2},
+        })
+        self.assertEqual(stats.to_prometheus().splitlines(), [
+            '# TYPE scraper_stage_seconds_total counter',
+            'scraper_stage_seconds_total{stage="parse"} 0.750000',
+            '# TYPE scraper_stage_calls_total counter',
+            'scraper_stage_calls_total{stage="parse"} 2',
+            '# TYPE scraper_outcomes_total counter',
+            'scraper_outcomes_total{outcome="SaleTypeParseFailed"} 2',
+        ])
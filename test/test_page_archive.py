@@ -0,0 +1,155 @@
+import datetime
+import os
+import tempfile
+import unittest
+from scraper.page_archive import PageArchive
+from scraper.sales_scraper import SalesScraper
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestPageArchive(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'pages.archive')
+        self.html = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+        self.no_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def fill(self, archive):
+        archive.append_pages('sales/act/2600', datetime.date(2016, 9, 1),
+                             [self.html, self.no_results])
+        archive.append_pages('sales/act/2601', '2016-09-01', [self.html])
+        archive.append_pages('sales/act/2600', '2016-09-08', [self.html])
+
+    def test_random_access(self):
+        with PageArchive(self.file_path) as archive:
+            self.fill(archive)
+            self.assertEqual(
+                archive.page('sales/act/2600', '2016-09-01', 2),
+                self.no_results)
+
+        self.assertLess(
+            os.path.getsize(self.file_path),
+            len(self.html) + len(self.no_results))
+        with PageArchive(self.file_path) as archive:
+            self.assertEqual(
+                archive.page('sales/act/2600', datetime.date(2016, 9, 1), 2),
+                self.no_results)
+            self.assertEqual(
+                archive.page('sales/act/2601', '2016-09-01', 1), self.html)
+            with self.assertRaises(KeyError):
+                archive.page('sales/act/2601', '2016-09-01', 2)
+
+    def test_select(self):
+        with PageArchive(self.file_path) as archive:
+            self.fill(archive)
+            self.assertEqual(
+                archive.searches(), ['sales/act/2600', 'sales/act/2601'])
+            self.assertEqual(archive.dates('sales/act/2600'),
+                             ['2016-09-01', '2016-09-08'])
+            self.assertEqual(
+                [(x.search, x.page_num)
+                 for x in archive.select(until='2016-09-01')],
+                [('sales/act/2600', 1), ('sales/act/2600', 2),
+                 ('sales/act/2601', 1)])
+            self.assertEqual(
+                list(archive.pages('sales/act/2600', since='2016-09-02')),
+                [self.html])
+
+    def test_scrape_pages(self):
+        with PageArchive(self.file_path) as archive:
+            archive.append_pages(
+                'sales/act/2600', '2016-09-01', [self.html, self.html])
+            pages = archive.pages('sales/act/2600')
+            self.assertEqual(len(pages), 2)
+            self.assertEqual(
+                SalesScraper.scrape_pages(pages, quiet=True),
+                SalesScraper.scrape_pages([self.html, self.html], quiet=True))
+            self.assertEqual(
+                list(SalesScraper.iter_scrape_pages(pages)),
+                SalesScraper.scrape_pages([self.html, self.html], quiet=True))
+
+    def test_torn_append(self):
+        with PageArchive(self.file_path) as archive:
+            self.fill(archive)
+        size = os.path.getsize(self.file_path)
+        with open(self.file_path, 'ab') as f:
+            f.write(PageArchive.HEADER.pack(PageArchive.MAGIC, 20, 1000))
+
+        with PageArchive(self.file_path) as archive:
+            self.assertEqual(len(archive.entries), 4)
+            archive.append('sales/act/2602', '2016-09-08', self.html, 1)
+            self.assertEqual(
+                archive.page('sales/act/2602', '2016-09-08', 1), self.html)
+        self.assertGreater(os.path.getsize(self.file_path), size)
+        with PageArchive(self.file_path) as archive:
+            self.assertEqual(len(archive.entries), 5)
+
+    def test_corrupt_record_skipped(self):
+        with PageArchive(self.file_path) as archive:
+            self.fill(archive)
+            corrupt = archive.entries[1]
+        header_offset = (corrupt.offset - PageArchive.HEADER.size -
+                         len('sales/act/2600\t2016-09-01\t2'))
+        with open(self.file_path, 'r+b') as f:
+            f.seek(header_offset)
+            f.write(b'XXXX')
+
+        with PageArchive(self.file_path) as archive:
+            self.assertEqual(
+                [(x.search, x.page_num) for x in archive.entries],
+                [('sales/act/2600', 1), ('sales/act/2601', 1),
+                 ('sales/act/2600', 1)])
+            self.assertEqual(archive.skipped, [
+                (header_offset,
+                 corrupt.offset + corrupt.length - header_offset)])
+            archive.append('sales/act/2602', '2016-09-08', self.html, 1)
+
+        with PageArchive(self.file_path) as archive:
+            self.assertEqual(len(archive.entries), 4)
+            self.assertEqual(
+                archive.page('sales/act/2600', '2016-09-08', 1), self.html)
+            self.assertEqual(
+                archive.page('sales/act/2602', '2016-09-08', 1), self.html)
+
+    def test_load_appends_of_another_writer(self):
+        with PageArchive(self.file_path) as reader:
+            self.assertEqual(reader.entries, [])
+            with PageArchive(self.file_path) as writer:
+                self.fill(writer)
+            reader.load()
+            self.assertEqual(len(reader.entries), 4)
+            self.assertEqual(
+                reader.page('sales/act/2600', '2016-09-08', 1), self.html)
+
+    def test_writers_taking_turns(self):
+        with PageArchive(self.file_path) as a:
+            with PageArchive(self.file_path) as b:
+                b.append('sales/act/2600', '2016-09-01', self.html, 1)
+            a.append('sales/act/2601', '2016-09-01', self.no_results, 1)
+            with PageArchive(self.file_path) as b:
+                b.append('sales/act/2602', '2016-09-01', self.html, 1)
+            a.append('sales/act/2603', '2016-09-01', self.no_results, 1)
+            self.assertEqual(len(a.entries), 4)
+
+        with PageArchive(self.file_path) as archive:
+            self.assertEqual(
+                archive.searches(),
+                ['sales/act/2600', 'sales/act/2601', 'sales/act/2602',
+                 'sales/act/2603'])
+            self.assertEqual(
+                archive.page('sales/act/2602', '2016-09-01', 1), self.html)
+            self.assertEqual(
+                archive.page('sales/act/2603', '2016-09-01', 1),
+                self.no_results)
+
+    def test_bad_key(self):
+        with PageArchive(self.file_path) as archive:
+            with self.assertRaises(ValueError):
+                archive.append('sales\tact', '2016-09-08', self.html, 1)
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from scraper.page_cache import PageCache
+from scraper.page_scraper import PageScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestPageCache(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.temp_dir.name, 'pages.sqlite')
+        self.html = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_hit_skips_scraping(self):
+        cache = PageCache(self.cache_file)
+        expected = SalesScraper.scrape_pages([self.html], quiet=True)
+
+        first = SalesScraper.scrape_pages(
+            [self.html], quiet=True, cache=cache)
+        # Only ads and whitespace around the results table have changed.
+        changed = self.html.replace(
+            '<div id="searchResultsTbl">',
+            '<div id="searchResultsTbl">\n  <!-- ad slot 42 -->'
+        ).replace('id="krux-container"', 'id="krux-container-2"')
+        second = SalesScraper.scrape_pages([changed], quiet=True, cache=cache)
+
+        self.assertEqual(first, expected)
+        self.assertEqual(second, expected)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['entries'], 1)
+
+    def test_key_depends_on_results_and_scraper(self):
+        key = PageCache.page_key('SalesScraper.scrape_page', self.html)
+        self.assertIsNotNone(key)
+        self.assertNotEqual(
+            key, PageCache.page_key('RentalsScraper.scrape_page', self.html))
+        self.assertNotEqual(key, PageCache.page_key(
+            'SalesScraper.scrape_page',
+            self.html.replace('Mayfair Bott Crescent', 'Mayfair Bott Street')
+        ))
+        self.assertIsNone(PageCache.page_key(
+            'SalesScraper.scrape_page',
+            open_test_html(self.TEST_DATA_DIR + '/test_no_results.html')
+        ))
+
+    def test_parser_version_invalidates(self):
+        cache = PageCache(self.cache_file)
+        SalesScraper.scrape_pages([self.html], quiet=True, cache=cache)
+        cache.close()
+
+        version = PageScraper.PARSER_VERSION
+        PageScraper.PARSER_VERSION = version + 1
+        try:
+            cache = PageCache(self.cache_file)
+            self.assertEqual(cache.stats()['entries'], 0)
+        finally:
+            PageScraper.PARSER_VERSION = version
+
+    def test_lru_eviction(self):
+        cache = PageCache(self.cache_file)
+        cache.store('a', [1] * 100)
+        cache.store('b', [2] * 100)
+        cache.lookup('x', '<div id="searchResultsTbl"></div>')
+        cache.max_bytes = cache.stats()['bytes'] - 1
+
+        self.assertEqual(cache.connect().execute(
+            'SELECT key FROM pages').fetchall(), [('a',), ('b',)])
+        self.assertEqual(cache.lookup('ns', 'no table'), (None, None))
+        cache.connection.execute(
+            "UPDATE pages SET last_used = last_used + 10 WHERE key = 'a'")
+        cache.store('c', [3])
+
+        self.assertEqual(sorted(cache.connection.execute(
+            'SELECT key FROM pages').fetchall()), [('a',), ('c',)])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_unpicklable_not_stored(self):
+        cache = PageCache(self.cache_file)
+        self.assertTrue(cache.store('a', [1]))
+        self.assertFalse(cache.store('b', [1, lambda: None]))
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_cache_with_workers(self):
+        cache = PageCache(self.cache_file)
+        expected = RentalsScraper.scrape_pages([self.html], quiet=True)
+        parallel = RentalsScraper.scrape_pages(
+            [self.html] * 3, quiet=True, workers=2, cache=cache)
+
+        self.assertEqual(parallel, expected * 3)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 3)
+        self.assertEqual(stats['entries'], 1)
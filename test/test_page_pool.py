@@ -0,0 +1,68 @@
+import pickle
+import unittest
+from scraper.page_pool import PagePool, PageScrapeFailed
+from scraper.sales_scraper import SalesScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestPagePool(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def test_scrape_pages_with_workers(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        no_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+
+        serial = SalesScraper.scrape_pages([html], quiet=True)
+        parallel = SalesScraper.scrape_pages(
+            [html, no_results, html], quiet=True, workers=2, chunksize=1)
+
+        self.assertEqual(len(parallel), len(serial) * 2 + 1)
+        self.assertEqual(parallel[:len(serial)], serial)
+        self.assertEqual(parallel[len(serial) + 1:], serial)
+
+        failed = parallel[len(serial)]
+        self.assertIs(type(failed), PageScrapeFailed)
+        self.assertEqual(failed.page_num, 1)
+        self.assertEqual(failed.error_type, 'AttributeError')
+
+    def test_failed_page_does_not_stop_batch(self):
+        pages = ['<html></html>', '<p>not a results page</p>']
+        parallel = RentalsScraper.scrape_pages(
+            pages, quiet=True, workers=2)
+
+        self.assertEqual(
+            [(type(x), x.page_num) for x in parallel],
+            [(PageScrapeFailed, 0), (PageScrapeFailed, 1)]
+        )
+
+    def test_iter_scrape_pages_with_workers(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        serial = SalesScraper.scrape_pages([html], quiet=True)
+
+        parallel = SalesScraper.iter_scrape_pages(
+            (html for _ in range(5)), workers=2, chunksize=2)
+        self.assertEqual(list(parallel), serial * 5)
+
+    def test_unsupported_property_type_with_workers(self):
+        html = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html').replace(
+                "href='/property-unit-act-watson",
+                "href='/property-weirdtype-act-watson")
+        serial = SalesScraper.scrape_pages([html], quiet=True)
+        self.assertEqual(
+            serial[1].details.property_type.text, 'weirdtype')
+
+        parallel = SalesScraper.scrape_pages(
+            [html, html], quiet=True, workers=2)
+        self.assertEqual(parallel, serial * 2)
+
+    def test_unpicklable_property(self):
+        page = PagePool.dumps_page(3, ['a', lambda: None, 'b'])
+        properties = pickle.loads(page)
+
+        self.assertEqual(properties[::2], ['a', 'b'])
+        self.assertIs(type(properties[1]), PageScrapeFailed)
+        self.assertEqual(properties[1].page_num, 3)
+        self.assertIsNone(PagePool.dumps([lambda: None]))
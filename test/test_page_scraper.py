@@ -1,6 +1,8 @@
+import array
 import unittest
 import bs4
-from scraper.page_scraper import PageScraper
+from scraper.page_scraper import PageScraper, PaginationInfo
+from scraper.sales_scraper import SalesScraper
 import real_estate.real_estate_property as rep
 from scraper.test.open_json import open_json_file
 
@@ -22,6 +24,16 @@ def populate_state_and_postcode(x, state, pc):
     return PageScraper.populate_state_and_postcode(x, state, pc)
 
 
+def available_parsers():
+    parsers = ['html.parser']
+    try:
+        import lxml
+        parsers.extend(['lxml', 'lxml.html'])
+    except ImportError:
+        pass
+    return parsers
+
+
 class TestPageScraper(unittest.TestCase):
     TEST_DATA_DIR = 'scraper/test/data'
     TEST_HTML_FILE = TEST_DATA_DIR + '/test_html.json'
@@ -284,3 +296,215 @@ class TestPageScraper(unittest.TestCase):
         )
         with self.assertRaises(ValueError):
             PageScraper.feature_value_to_int('1x', [], '')
+
+    def test_parsers_agree_on_results_page(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        expected = SalesScraper.scrape_pages([html], quiet=True)
+        self.assertEqual(len(expected), 20)
+
+        for parser in available_parsers():
+            parsed = SalesScraper.scrape_pages(
+                [html], quiet=True, parser=parser)
+            for prop, exp in self.zip_eq_len(parsed, expected):
+                self.assert_equal_with_summary(prop, exp)
+
+    def test_parsers_agree_on_no_results(self):
+        no_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+        has_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+
+        for parser in available_parsers():
+            self.assertTrue(PageScraper.check_for_no_results(
+                PageScraper.html_to_soup(no_results, parser)))
+            self.assertFalse(PageScraper.check_for_no_results(
+                PageScraper.html_to_soup(has_results, parser)))
+
+    def test_parsers_agree_on_articles(self):
+        data = open_json_file(self.TEST_HTML_FILE)
+        tests = [
+            ('residential_property', PageScraper.scrape_residential_property),
+            ('residential_land', PageScraper.scrape_residential_land),
+            ('house_land_package', PageScraper.scrape_house_land_package),
+            ('rural_property', PageScraper.scrape_rural_property),
+            ('new_apartment_project',
+             PageScraper.scrape_new_apartment_project),
+        ]
+
+        for key, scrape in tests:
+            expected = scrape(PageScraper.html_to_soup(data[key]))
+            for parser in available_parsers():
+                parsed = scrape(PageScraper.html_to_soup(data[key], parser))
+                self.assertEqual(parsed, expected, '%s - %s' % (key, parser))
+
+    def test_unknown_parser(self):
+        with self.assertRaises(ValueError):
+            PageScraper.html_to_soup('<html></html>', 'not-a-parser')
+
+    def test_iter_scrape_pages(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        expected = SalesScraper.scrape_pages([html, html], quiet=True)
+
+        read = []
+
+        def pages():
+            for i in range(2):
+                read.append(i)
+                yield html
+
+        scrapings = SalesScraper.iter_scrape_pages(pages())
+        self.assertEqual(next(scrapings), expected[0])
+        self.assertEqual(read, [0])
+        self.assertEqual([expected[0]] + list(scrapings), expected)
+        self.assertEqual(read, [0, 1])
+
+    def test_restricted_parse(self):
+        no_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+        has_results = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+        expected = SalesScraper.scrape_pages([has_results], quiet=True)
+
+        for parser in available_parsers():
+            if parser == 'lxml.html':
+                continue
+
+            self.assertTrue(PageScraper.check_for_no_results(
+                PageScraper.html_to_soup(no_results, parser, True)))
+            self.assertFalse(PageScraper.check_for_no_results(
+                PageScraper.html_to_soup(has_results, parser, True)))
+
+            parsed = SalesScraper.scrape_pages(
+                [has_results], quiet=True, parser=parser, restrict=True)
+            for prop, exp in self.zip_eq_len(parsed, expected):
+                self.assert_equal_with_summary(prop, exp)
+
+    def test_pagination_info(self):
+        no_results = open_html_as_soup(
+            self.TEST_DATA_DIR + '/test_no_results.html')
+        has_results = open_html_as_soup(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+
+        self.assertEqual(
+            PageScraper.pagination_info(no_results), PaginationInfo(0, 0, 0))
+        self.assertEqual(PaginationInfo(0, 0, 0).num_pages(), 0)
+
+        info = PageScraper.pagination_info(has_results)
+        self.assertEqual(info, PaginationInfo(1601, 1620, None))
+        self.assertEqual(info.page_num(), 81)
+        self.assertIsNone(info.num_pages())
+
+        tests = [
+            ('Showing 1 - 20 of 345 total results', (20, 1, 18)),
+            ('Showing 21 - 40 of 1,345 total results', (20, 2, 68)),
+            ('Showing 1 - 7 of 7 total results', (7, 1, 1)),
+        ]
+        for text, expected in tests:
+            soup = bs4.BeautifulSoup(
+                '<div id="results"><div id="resultsInfo"><p>%s</p></div>'
+                '</div>' % text, 'html.parser').div
+            info = PageScraper.parse_results_info(soup)
+            self.assertEqual(
+                (info.page_size(), info.page_num(), info.num_pages()),
+                expected)
+
+    def test_classify_sale_text(self):
+        tests = [
+            ('AUCTION 10 Sept 2016', ('auction', [2016])),
+            ('Tenders Thursday 1st September', ('tender', None)),
+            ('Price by negotiation', ('negotiation', None)),
+            ('by Negotation', ('negotiation', None)),
+            ('Contact Agent $500,000', ('contact_agent', [500000])),
+            ('Offers Over $429,000+', (None, [429000])),
+            ('Under Contract', (None, None)),
+        ]
+
+        for string, expected in tests:
+            self.assertEqual(
+                PageScraper.classify_sale_text(string, 1000), expected)
+
+    def test_deduce_sale_types(self):
+        texts = [
+            'Tenders Thursday 1st September', '$4,999,000+', 'AUCTION 10',
+            '995,000', 'Ove $665,000', '$799,990', 'Price by negotiation', '',
+            'Contact Agent', 'Contact Agent $500,000', '99', '',
+            'UnableToFindSaleTypeText', '1,000 or $20,000',
+        ]
+        under_contract = [i % 3 == 0 for i in range(len(texts))]
+        off_plan = [i in (5, 7) for i in range(len(texts))]
+
+        expected = [
+            PageScraper.deduce_sale_type(*x)
+            for x in zip(texts, under_contract, off_plan)
+        ]
+        for batch in (texts, texts + ['a\x00b']):
+            codes, prices = PageScraper.deduce_sale_types(
+                batch, under_contract, off_plan)
+            self.assertEqual(
+                PageScraper.sale_types_from_codes(codes, prices), expected)
+
+        self.assertEqual(
+            PageScraper.deduce_sale_types([], [], []), (array.array('B'), []))
+
+    def test_classify_sale_texts(self):
+        texts = ['AUCTION 10 Sept 2016', 'Offers Over $429,000+', '',
+                 'by Negotation', '2000']
+        for batch in (texts, texts + ['\x00 Auction']):
+            categories, prices = PageScraper.classify_sale_texts(batch, 1000)
+            self.assertEqual(
+                list(zip(categories, prices)),
+                [(PageScraper.SALE_TEXT_CATEGORY_CODES[category], x)
+                 for category, x in (
+                     PageScraper.classify_sale_text(text, 1000)
+                     for text in batch)]
+            )
+
+    def test_content_type_registry(self):
+        articles = bs4.BeautifulSoup(
+            '<article data-content-type="commercial"></article>'
+            '<article data-content-type="commercial"></article>'
+            '<article data-content-type="business"></article>',
+            'html.parser'
+        ).find_all('article')
+
+        PageScraper.CONTENT_TYPES.reset_counts()
+        properties = PageScraper.create_properties(articles)
+        self.assertEqual(
+            properties,
+            [rep.DataContentTypeNotSupported('commercial')] * 2 +
+            [rep.DataContentTypeNotSupported('business')]
+        )
+        self.assertEqual(
+            PageScraper.unsupported_counts()['data-content-type'],
+            {'commercial': 2, 'business': 1}
+        )
+
+        PageScraper.register_content_type(
+            'commercial', lambda article: [article, article], many=True)
+        try:
+            properties = PageScraper.create_properties(articles)
+        finally:
+            PageScraper.CONTENT_TYPES.unregister('commercial')
+        self.assertEqual(properties[:4], [articles[0]] * 2 + [articles[1]] * 2)
+        self.assertEqual(len(properties), 5)
+
+    def test_property_type_registry(self):
+        soup = bs4.BeautifulSoup(
+            '<a href="/property-warehouse-act-hume-1"></a>', 'html.parser').a
+
+        PageScraper.PROPERTY_TYPES.reset_counts()
+        self.assertIs(
+            type(PageScraper.extract_property_type(soup)),
+            rep.PropertyTypeNotSupported
+        )
+        self.assertEqual(
+            PageScraper.unsupported_counts()['property-type'],
+            {'warehouse': 1}
+        )
+
+        PageScraper.register_property_type('warehouse', rep.NotSpecified)
+        try:
+            property_type = PageScraper.extract_property_type(soup)
+        finally:
+            PageScraper.PROPERTY_TYPES.unregister('warehouse')
+        self.assertEqual(property_type, rep.NotSpecified())
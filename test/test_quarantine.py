@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from scraper.page_cache import PageCache
+from scraper.page_pool import PageScrapeFailed
+from scraper.page_scraper import PageScraper
+from scraper.quarantine import ArticleScrapeFailed, Quarantine
+from scraper.sales_scraper import SalesScraper
+from scraper.test.test_stream_extractor import stream_parsers
+from scraper.test.test_page_scraper import open_test_html
+
+
+def broken_scrape(article):
+    raise RuntimeError('Could not find address text.')
+
+
+class TestQuarantine(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+    NOT_UNDERSTOOD = '<html><body><p>Down for maintenance</p></body></html>'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.quarantine = Quarantine(self.temp_dir.name)
+        self.html = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+        self.expected = SalesScraper.scrape_pages([self.html], quiet=True)
+        self.residential = PageScraper.CONTENT_TYPES.lookup('residential')
+
+    def tearDown(self):
+        PageScraper.register_content_type('residential', *self.residential)
+        self.temp_dir.cleanup()
+
+    def test_articles_isolated_and_replayed(self):
+        PageScraper.register_content_type('residential', broken_scrape)
+        properties = SalesScraper.scrape_pages(
+            [self.html], quiet=True, quarantine=self.quarantine)
+
+        failed = [
+            p for p in properties if isinstance(p, ArticleScrapeFailed)]
+        good = [
+            p for p in properties if not isinstance(p, ArticleScrapeFailed)]
+        self.assertGreater(len(failed), 0)
+        self.assertGreater(len(good), 0)
+        for p in failed:
+            self.assertEqual(
+                (p.data_content_type, p.error_type),
+                ('residential', 'RuntimeError'))
+            self.assertIn('broken_scrape', p.trace)
+        for p in good:
+            self.assertIn(p, self.expected)
+
+        items = self.quarantine.items()
+        self.assertEqual(
+            sorted(x['listing_id'] for x in items),
+            sorted(p.listing_id for p in failed))
+
+        # Still broken, so the items stay.
+        self.assertCountEqual(self.quarantine.replay(SalesScraper), failed)
+        self.assertEqual(len(self.quarantine.items()), len(failed))
+
+        PageScraper.register_content_type('residential', *self.residential)
+        replayed = self.quarantine.replay(SalesScraper)
+        self.assertEqual(self.quarantine.items(), [])
+        self.assertEqual(len(good) + len(replayed), len(self.expected))
+        for p in replayed:
+            self.assertIn(p, self.expected)
+
+    def test_stream_parsers(self):
+        for parser in stream_parsers():
+            PageScraper.register_content_type('residential', broken_scrape)
+            properties = SalesScraper.scrape_pages(
+                [self.html], quiet=True, parser=parser,
+                quarantine=self.quarantine)
+            failed = [
+                p for p in properties if isinstance(p, ArticleScrapeFailed)]
+            self.assertGreater(len(failed), 0, parser)
+            for info in self.quarantine.items():
+                html = self.quarantine.read_html(info['item_id'])
+                self.assertTrue(html.startswith('<article'), parser)
+                self.assertTrue(html.endswith('</article>'), parser)
+
+            PageScraper.register_content_type('residential', *self.residential)
+            replayed = self.quarantine.replay(SalesScraper, parser)
+            self.assertEqual(self.quarantine.items(), [], parser)
+            self.assertEqual(len(replayed), len(failed), parser)
+            for p in replayed:
+                self.assertIn(p, self.expected)
+
+    def test_failures_not_cached(self):
+        PageScraper.register_content_type('residential', broken_scrape)
+        cache = PageCache(os.path.join(self.temp_dir.name, 'cache.sqlite'))
+        first = SalesScraper.scrape_pages(
+            [self.html], quiet=True, cache=cache, quarantine=self.quarantine)
+        self.assertEqual(cache.stats()['stores'], 0)
+
+        with self.assertRaises(RuntimeError):
+            SalesScraper.scrape_pages([self.html], quiet=True, cache=cache)
+
+        for info in self.quarantine.items():
+            self.quarantine.remove(info['item_id'])
+        again = SalesScraper.scrape_pages(
+            [self.html], quiet=True, cache=cache, quarantine=self.quarantine)
+        self.assertEqual(again, first)
+        self.assertGreater(len(self.quarantine.items()), 0)
+        cache.close()
+
+    def test_pages_isolated(self):
+        properties = SalesScraper.scrape_pages(
+            [self.NOT_UNDERSTOOD, self.html], quiet=True,
+            quarantine=self.quarantine)
+
+        self.assertEqual(type(properties[0]), PageScrapeFailed)
+        self.assertEqual(properties[0].page_num, 0)
+        self.assertEqual(properties[1:], self.expected)
+        items = self.quarantine.items()
+        self.assertEqual(
+            [(x['kind'], x['page_num']) for x in items], [('page', 0)])
+        self.assertEqual(
+            self.quarantine.read_html(items[0]['item_id']),
+            self.NOT_UNDERSTOOD)
+
+    def test_pages_isolated_by_workers(self):
+        properties = SalesScraper.scrape_pages(
+            [self.html, self.NOT_UNDERSTOOD], quiet=True, workers=2,
+            quarantine=self.quarantine)
+
+        self.assertEqual(properties[:-1], self.expected)
+        self.assertEqual(properties[-1].page_num, 1)
+        self.assertEqual(len(self.quarantine.items()), 1)
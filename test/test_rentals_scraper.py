@@ -6,6 +6,7 @@ import real_estate.real_estate_property as rep
 from scraper.test.open_json import open_json_file
 
 from scraper.test.test_page_scraper import populate_state_and_postcode
+from scraper.test.test_page_scraper import available_parsers
 
 
 class TestRentalsScraper(unittest.TestCase):
@@ -51,6 +52,19 @@ class TestRentalsScraper(unittest.TestCase):
             self.assertIs(type(parsed), type(expected))
             self.assert_equal_with_summary(parsed, expected)
 
+    def test_deduce_rental_types(self):
+        texts = ['$750 per week', '$300', 'Under Application', '20',
+                 'Price by negotiation', '400', 'Contact Agent']
+        under_application = [False, True, True, False, True, False, False]
+
+        codes, prices = RentalsScraper.deduce_rental_types(
+            texts, under_application)
+        self.assertEqual(
+            RentalsScraper.rental_types_from_codes(codes, prices, texts),
+            [RentalsScraper.deduce_rental_type(*x)
+             for x in zip(texts, under_application)]
+        )
+
     def test_rental_property(self):
         state = 'nsw'
         pc = 1000
@@ -83,3 +97,13 @@ class TestRentalsScraper(unittest.TestCase):
             sale_type_text = PageScraper.find_sale_type_text(property_stats)
             self.assertEqual(sale_type_text, expected,
                              'property_stats - %s' % test)
+
+    def test_parsers_agree_on_rental_property(self):
+        article = open_json_file(self.TEST_HTML_FILE)['rental_property']
+        expected = RentalsScraper.scrape_rental_property(
+            PageScraper.html_to_soup(article))
+
+        for parser in available_parsers():
+            rental = RentalsScraper.scrape_rental_property(
+                PageScraper.html_to_soup(article, parser))
+            self.assert_equal_with_summary(rental, expected)
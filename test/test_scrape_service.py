@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from scraper.page_pool import PageScrapeFailed
+from scraper.sales_scraper import SalesScraper
+from scraper.scrape_service import JobQueue, QueueFull, ScrapeWorker
+from scraper.test.test_page_scraper import open_test_html
+
+
+class TestScrapeService(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.temp_dir.name, 'queue.sqlite')
+        self.queue = JobQueue(self.file_path)
+        self.html = open_test_html(
+            self.TEST_DATA_DIR + '/test_has_results.html')
+
+    def tearDown(self):
+        self.queue.close()
+        self.temp_dir.cleanup()
+
+    def expected(self, state, postcode):
+        return SalesScraper.populate_state_and_postcode(
+            SalesScraper.scrape_pages([self.html], quiet=True),
+            state, postcode)
+
+    def test_scrape_jobs(self):
+        self.queue.put('sales', self.html, 'act', 2600, 1)
+        self.queue.put('sales', self.html, 'act', 2601, 2)
+        self.queue.put('sales', '<html></html>', 'act', 2602, 1)
+
+        worker = ScrapeWorker(self.queue, batch_size=2)
+        self.assertEqual(worker.run(exit_when_idle=True), 3)
+        self.assertEqual(self.queue.counts(),
+                         {'pending': 0, 'claimed': 0, 'results': 3})
+
+        results = self.queue.take_results()
+        self.assertEqual(
+            [(x.state, x.postcode, x.page_num) for x in results],
+            [('act', 2600, 1), ('act', 2601, 2), ('act', 2602, 1)])
+        self.assertEqual(results[0].properties, self.expected('act', 2600))
+        self.assertEqual(results[1].properties, self.expected('act', 2601))
+        self.assertEqual(len(results[2].properties), 1)
+        self.assertIs(type(results[2].properties[0]), PageScrapeFailed)
+        self.assertEqual(self.queue.take_results(), [])
+
+    def test_unpicklable_property(self):
+        self.queue.put('sales', self.html, 'act', 2600, 2)
+        job, = self.queue.claim('a', 1)
+        self.queue.complete([(job, ['a', lambda: None, 'b'])])
+
+        properties = self.queue.take_results()[0].properties
+        self.assertEqual(properties[::2], ['a', 'b'])
+        self.assertIs(type(properties[1]), PageScrapeFailed)
+        self.assertEqual(properties[1].page_num, 2)
+
+    def test_unknown_scraper(self):
+        with self.assertRaises(ValueError):
+            self.queue.put('auctions', self.html, 'act', 2600)
+
+    def test_queue_backpressure(self):
+        queue = JobQueue(self.file_path, max_jobs=2)
+        queue.put('sales', self.html, 'act', 2600)
+        queue.put('sales', self.html, 'act', 2600, 2)
+        with self.assertRaises(QueueFull):
+            queue.put('sales', self.html, 'act', 2600, 3, timeout=0)
+
+        ScrapeWorker(queue, batch_size=1).run_batch(queue.claim('a', 1))
+        queue.put('sales', self.html, 'act', 2600, 3, timeout=0)
+        queue.close()
+
+    def test_results_backpressure(self):
+        queue = JobQueue(self.file_path, max_results=1)
+        for page_num in range(1, 4):
+            queue.put('sales', self.html, 'act', 2600, page_num)
+
+        worker = ScrapeWorker(queue, batch_size=1)
+        self.assertEqual(worker.run(exit_when_idle=True), 1)
+        self.assertEqual(len(queue.take_results()), 1)
+        self.assertEqual(worker.run(exit_when_idle=True), 1)
+        queue.close()
+
+    def test_drain(self):
+        for page_num in range(1, 4):
+            self.queue.put('sales', self.html, 'act', 2600, page_num)
+
+        worker = ScrapeWorker(self.queue, batch_size=3)
+        scrape = worker.scrape
+
+        def scrape_then_stop(job):
+            worker.stop()
+            return scrape(job)
+
+        worker.scrape = scrape_then_stop
+        self.assertEqual(worker.run(), 1)
+        self.assertEqual(self.queue.counts(),
+                         {'pending': 2, 'claimed': 0, 'results': 1})
+        self.assertEqual(
+            [x.attempts for x in self.queue.claim('b', 3)], [1, 1])
+
+    def test_stale_claims(self):
+        queue = JobQueue(self.file_path, claim_timeout=0)
+        queue.put('sales', self.html, 'act', 2600)
+        lost = queue.claim('a', 1)
+        self.assertEqual(queue.requeue_stale(), 1)
+
+        worker = ScrapeWorker(queue)
+        self.assertEqual(worker.run(exit_when_idle=True), 1)
+        self.assertEqual(queue.complete([(lost[0], [])]), 0)
+        self.assertEqual(
+            queue.take_results()[0].properties, self.expected('act', 2600))
+        queue.close()
+
+    def test_too_many_attempts(self):
+        queue = JobQueue(self.file_path, claim_timeout=0)
+        queue.put('sales', self.html, 'act', 2600)
+        for _ in range(ScrapeWorker.MAX_ATTEMPTS):
+            queue.claim('a', 1)
+            queue.requeue_stale()
+
+        ScrapeWorker(queue).run(exit_when_idle=True)
+        failed = queue.take_results()[0].properties[0]
+        self.assertEqual(failed.error_type, 'TooManyAttempts')
+        queue.close()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from scraper.page_pool import PageScrapeFailed
+from scraper.sales_scraper import SalesScraper
+from scraper.snapshot_index import ListingChange, SnapshotIndex
+import real_estate.real_estate_property as rep
+from scraper.test.test_page_scraper import open_test_html
+
+
+def listing(address, sale_type):
+    p = rep.Property(
+        sale_type, rep.Details(rep.House(), 3, 1, 1, None, None),
+        rep.AddressText(address))
+    p.state_and_postcode = rep.StateAndPostcode('act', 2600)
+    return p
+
+
+class TestSnapshotIndex(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index = SnapshotIndex(
+            os.path.join(self.temp_dir.name, 'snapshot.sqlite'))
+
+    def tearDown(self):
+        self.index.close()
+        self.temp_dir.cleanup()
+
+    def changes(self, properties, search='sales/act/2600'):
+        return list(self.index.iter_changes(properties, search))
+
+    def key(self, address):
+        return (address, 'act', 2600, 'House')
+
+    def test_changes(self):
+        first = [
+            listing('1 Main Road', rep.PrivateTreaty([500000])),
+            listing('2 Main Road', rep.Auction()),
+            listing('3 Main Road', rep.Auction()),
+        ]
+        self.assertEqual(
+            [(x.kind, x.key) for x in self.changes(first)],
+            [('added', self.key(a))
+             for a in ('1 Main Road', '2 Main Road', '3 Main Road')])
+        self.assertEqual(self.changes(first), [])
+
+        second = [
+            listing('1 Main Road', rep.PrivateTreaty([480000])),
+            listing('2 Main Road', rep.Auction(True)),
+            listing('4 Main Road', rep.Auction()),
+        ]
+        self.assertEqual(self.changes(second), [
+            ListingChange('price_changed', self.key('1 Main Road'), None,
+                          ('PrivateTreaty', [500000])),
+            ListingChange('status_changed', self.key('2 Main Road'), None,
+                          ('Auction', None)),
+            ListingChange('added', self.key('4 Main Road'), None, None),
+            ListingChange('removed', self.key('3 Main Road'), None,
+                          ('Auction', None)),
+        ])
+        self.assertEqual(self.index.count(), 3)
+
+    def test_searches_are_separate(self):
+        self.changes([listing('1 Main Road', rep.Auction())])
+        self.assertEqual(
+            [x.kind for x in self.changes([], 'sales/act/2601')], [])
+        self.assertEqual(self.index.count('sales/act/2600'), 1)
+
+    def test_no_removals_after_failures(self):
+        self.changes([listing('1 Main Road', rep.Auction())])
+        failed = PageScrapeFailed(1, 'RuntimeError', 'HTML not understood.',
+                                  '')
+        self.assertEqual(self.changes([failed]), [])
+        self.assertEqual(self.index.count(), 1)
+
+    def test_abandoned_run(self):
+        changes = self.index.iter_changes(
+            [listing('1 Main Road', rep.Auction())], 'sales/act/2600')
+        next(changes)
+        changes.close()
+        self.assertEqual(self.index.count(), 0)
+
+    def test_scrape_changes(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        added = list(self.index.scrape_changes(
+            SalesScraper, [html], 'act', 2600))
+
+        self.assertGreater(len(added), 0)
+        self.assertEqual(set(x.kind for x in added), {'added'})
+        self.assertEqual(added[0].property.state_and_postcode,
+                         rep.StateAndPostcode('act', 2600))
+        self.assertEqual(list(self.index.scrape_changes(
+            SalesScraper, [html], 'act', 2600)), [])
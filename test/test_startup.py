@@ -0,0 +1,25 @@
+import unittest
+from scraper.benchmark.startup import StartupBenchmark
+
+
+class TestStartup(unittest.TestCase):
+    def test_deferred_imports(self):
+        for module in StartupBenchmark.MODULES:
+            times = StartupBenchmark.import_times(module)
+            self.assertIn(module, times)
+            for deferred in StartupBenchmark.DEFERRED:
+                self.assertNotIn(deferred, times, module)
+
+    def test_import_budget(self):
+        for module in StartupBenchmark.MODULES:
+            times = StartupBenchmark.measure(module)
+            self.assertLess(
+                times[module][1], StartupBenchmark.BUDGET, module)
+
+    def test_lazy_modules_load_on_use(self):
+        from scraper.page_scraper import PageScraper
+        from scraper.page_scraper import rep
+        soup = PageScraper.html_to_soup('<p>x</p>')
+        self.assertEqual(soup.p.get_text(), 'x')
+        self.assertIs(
+            PageScraper.PROPERTY_TYPES.lookup('house'), rep.House)
@@ -0,0 +1,104 @@
+import unittest
+from scraper.article_fields import ArticleFields
+from scraper.page_scraper import PageScraper
+from scraper.rentals_scraper import RentalsScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.stream_extractor import StreamExtractor
+from scraper.test.test_page_scraper import available_parsers
+from scraper.test.test_page_scraper import open_json_file
+from scraper.test.test_page_scraper import open_test_html
+
+
+def stream_parsers():
+    parsers = ['stream']
+    if 'lxml.html' in available_parsers():
+        parsers.append('stream.lxml')
+    return parsers
+
+
+class TestStreamExtractor(unittest.TestCase):
+    TEST_DATA_DIR = 'scraper/test/data'
+    TEST_HTML_FILE = TEST_DATA_DIR + '/test_html.json'
+
+    def test_agrees_on_results_page(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_has_results.html')
+        expected = SalesScraper.scrape_pages([html], quiet=True)
+        for parser in stream_parsers():
+            self.assertEqual(
+                SalesScraper.scrape_pages([html], quiet=True, parser=parser),
+                expected, parser)
+            soup = PageScraper.html_to_soup(html, parser)
+            self.assertFalse(PageScraper.check_for_no_results(soup))
+            self.assertEqual(
+                PageScraper.pagination_info(soup).__dict__,
+                PageScraper.pagination_info(
+                    PageScraper.html_to_soup(html)).__dict__)
+
+    def test_no_results(self):
+        html = open_test_html(self.TEST_DATA_DIR + '/test_no_results.html')
+        for parser in stream_parsers():
+            soup = PageScraper.html_to_soup(html, parser)
+            self.assertTrue(PageScraper.check_for_no_results(soup))
+            self.assertEqual(
+                PageScraper.pagination_info(soup).num_pages(), 0)
+
+            with self.assertRaises(RuntimeError):
+                PageScraper.check_for_no_results(
+                    PageScraper.html_to_soup('<html></html>', parser))
+
+    def test_agrees_on_articles(self):
+        data = open_json_file(self.TEST_HTML_FILE)
+        tests = [
+            ('residential_property', PageScraper.scrape_residential_property),
+            ('residential_land', PageScraper.scrape_residential_land),
+            ('house_land_package', PageScraper.scrape_house_land_package),
+            ('rural_property', PageScraper.scrape_rural_property),
+            ('new_apartment_project',
+             PageScraper.scrape_new_apartment_project),
+            ('rental_property', RentalsScraper.scrape_rental_property),
+        ]
+
+        for key, scrape in tests:
+            expected = scrape(PageScraper.html_to_soup(data[key]))
+            for parser in stream_parsers():
+                articles = StreamExtractor.parse(
+                    data[key], parser, fragment=True).articles
+                self.assertEqual(len(articles), 1)
+                self.assertEqual(
+                    scrape(articles[0]), expected, '%s - %s' % (key, parser))
+
+    def test_article_markup(self):
+        html = open_json_file(self.TEST_HTML_FILE)['residential_property']
+        article = StreamExtractor.parse(
+            'x' + html + '<p>after</p>', fragment=True).articles[0]
+        self.assertEqual(str(article), html)
+        self.assertEqual(article['data-content-type'], 'residential')
+
+    def test_unclosed_tags(self):
+        html = (
+            '<article data-content-type="residential">'
+            '<div class="listingInfo rui-clearfix"><div class="propertyStats">'
+            '<p class="priceText"><b>$500,000</p></div>'
+            '<p class="type">Under Contract</p></div></article>'
+        )
+        for parser in stream_parsers():
+            article = StreamExtractor.parse(
+                html, parser, fragment=True).articles[0]
+            fields = ArticleFields.extract(article, ArticleFields.LISTING)
+            self.assertEqual(fields['price_text'].get_text(), '$500,000')
+            self.assertIsNone(fields['type_text'])
+            self.assertIsNone(fields['any_type_text'])
+
+    def test_only_kept_parts(self):
+        html = open_json_file(self.TEST_HTML_FILE)['residential_property']
+        article = StreamExtractor.parse(html, fragment=True).articles[0]
+        fields = ArticleFields.extract(article, ArticleFields.LISTING)
+
+        with self.assertRaises(ValueError):
+            ArticleFields.extract(article, ArticleFields.PROJECT)
+        with self.assertRaises(ValueError):
+            fields['listing_info'].get_text()
+        with self.assertRaises(ValueError):
+            fields['features'].find_all('span')
+        with self.assertRaises(ValueError):
+            PageScraper.html_to_soup(html, 'stream', restrict=True)
@@ -0,0 +1,50 @@
+import unittest
+from scraper.benchmark.synthetic import SyntheticPages
+from scraper.benchmark.suite import BenchmarkSuite, Scenario
+from scraper.page_scraper import PageScraper
+from scraper.sales_scraper import SalesScraper
+from scraper.rentals_scraper import RentalsScraper
+import real_estate.real_estate_property as rep
+
+
+class TestSyntheticPages(unittest.TestCase):
+    def test_sales_page(self):
+        pages = SyntheticPages(project_children=3)
+        html = pages.page({
+            'residential_property': 1, 'residential_land': 1,
+            'house_land_package': 1, 'rural_property': 1,
+            'new_apartment_project': 1,
+        }, 30, page_num=2)
+
+        soup = PageScraper.html_to_soup(html)
+        info = PageScraper.pagination_info(soup)
+        self.assertEqual((info.first, info.last), (31, 60))
+
+        articles = PageScraper.find_articles(soup)
+        self.assertEqual(len(set(x['id'] for x in articles)), 30)
+        projects = sum(
+            x['data-content-type'] == 'new apartment project'
+            for x in articles)
+        properties = SalesScraper.scrape_page(soup)
+        self.assertEqual(len(properties), 30 + projects * 2)
+        for p in properties:
+            self.assertIs(type(p), rep.Property)
+
+    def test_rentals_pages(self):
+        htmls = SyntheticPages().pages({'rental_property': 1}, 5, 3)
+        properties = RentalsScraper.scrape_pages(htmls, quiet=True)
+        self.assertEqual(len(properties), 15)
+        self.assertEqual(properties[0].sale_type, rep.Rental([300], False))
+
+    def test_suite_run_and_compare(self):
+        scenario = Scenario(
+            'tiny', SalesScraper, {'residential_property': 1}, 2, 2)
+        run = BenchmarkSuite.run([scenario], ['html.parser'], repeats=1)
+
+        self.assertEqual(
+            [r['stage'] for r in run['results']],
+            list(BenchmarkSuite.STAGES))
+        for r in run['results']:
+            self.assertEqual((r['pages'], r['articles']), (2, 4))
+        self.assertEqual(
+            [x[3] for x in BenchmarkSuite.compare(run, run)], [1.0] * 4)
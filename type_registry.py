@@ -0,0 +1,43 @@
+import collections
+
+
+class TypeRegistry(object):
+    # Maps a type string from the page, e.g. a data-content-type or an href
+    # property type slug, to whatever handles it. Lookups that miss are
+    # counted per type string. The counts are per process, so with the
+    # worker pool each worker keeps its own.
+
+    def __init__(self, entries={}):
+        # entries can also be a function returning them, called on first
+        # use, for entries from a module that is imported lazily.
+        if callable(entries):
+            self.load_entries = entries
+            self.loaded_entries = None
+        else:
+            self.load_entries = None
+            self.loaded_entries = dict(entries)
+        self.unsupported = collections.Counter()
+
+    @property
+    def entries(self):
+        if self.loaded_entries is None:
+            self.loaded_entries = dict(self.load_entries())
+        return self.loaded_entries
+
+    def register(self, type_text, entry):
+        self.entries[type_text] = entry
+
+    def unregister(self, type_text):
+        del self.entries[type_text]
+
+    def lookup(self, type_text):
+        entry = self.entries.get(type_text)
+        if entry is None:
+            self.unsupported[type_text] += 1
+        return entry
+
+    def unsupported_counts(self):
+        return dict(self.unsupported)
+
+    def reset_counts(self):
+        self.unsupported.clear()